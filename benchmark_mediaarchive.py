@@ -0,0 +1,110 @@
+import argparse
+import os
+import tempfile
+from datetime import datetime
+import benchmark_utils
+import mediaarchive_csvjson_utils
+from mediaarchive_to_csvjson import process_media_archive
+
+# The strptime-based date inference kept as a baseline to compare the compiled classifier against
+def legacy_infer_date_from_filename(filename, folder_date):
+    date_formats = [
+        "%Y-%m-%d",
+        "%Y%m%d",
+        "%Y-%m-%d %H.%M.%S",
+    ]
+
+    for date_format in date_formats:
+        try:
+            file_date = datetime.strptime(filename[:10], date_format).date()
+            if file_date.year == int(folder_date[:4]):
+                return file_date.strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+
+    return folder_date
+
+# The rescanning find_available_day kept as a baseline for the month-occupancy index
+def legacy_find_available_day(entries, year, month):
+    days_in_month = (datetime(int(year), int(month) % 12 + 1, 1) - datetime(int(year), int(month), 1)).days
+    day_counts = {str(day).zfill(2): 0 for day in range(1, days_in_month + 1)}
+
+    for entry in entries:
+        entry_date = datetime.strptime(entry['date'], "%Y-%m-%d")
+        if entry_date.year == int(year) and entry_date.month == int(month):
+            day_counts[str(entry_date.day).zfill(2)] += 1
+
+    return min(day_counts, key=day_counts.get)
+
+def collect_filename_samples(root_dir):
+    samples = []
+    for folder, files in mediaarchive_csvjson_utils.scan_media_archive(root_dir):
+        folder_date = mediaarchive_csvjson_utils.infer_date_from_path(folder, root_dir)
+        samples.extend((file, folder_date) for file in files)
+    return samples
+
+def classify_all(infer, samples):
+    return [infer(file, folder_date) for file, folder_date in samples]
+
+def place_undated_legacy(entries, placements):
+    placed = list(entries)
+    for year, month in placements:
+        day = legacy_find_available_day(placed, year, month)
+        placed.append({'date': f"{year}-{month}-{day}"})
+    return placed
+
+def place_undated_indexed(entries, placements):
+    occupancy = mediaarchive_csvjson_utils.build_month_occupancy(entries)
+    for year, month in placements:
+        day = mediaarchive_csvjson_utils.find_available_day(None, year, month, occupancy)
+        mediaarchive_csvjson_utils.add_to_month_occupancy(occupancy, f"{year}-{month}-{day}")
+    return occupancy
+
+def scan_and_sort(root_dir, entries_file, index):
+    return list(process_media_archive(root_dir, entries_file, index))
+
+def report(label, baseline_seconds, optimized_seconds, count):
+    speedup = baseline_seconds / optimized_seconds if optimized_seconds else float('inf')
+    print(f"{label}: baseline {baseline_seconds:.4f}s, optimized {optimized_seconds:.4f}s "
+          f"({count / optimized_seconds:,.0f}/s, {speedup:.1f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark media archive date assignment on a synthetic tree")
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--folders-per-year', type=int, default=40)
+    parser.add_argument('--files-per-folder', type=int, default=100)
+    parser.add_argument('--placements', type=int, default=2000, help="Number of undated items to place")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root_dir = os.path.join(temp_dir, 'mediaarchive')
+        file_count = benchmark_utils.generate_media_archive_tree(
+            root_dir, args.years, args.folders_per_year, args.files_per_folder, args.seed)
+        print(f"Generated {file_count:,} files under {root_dir}")
+
+        samples = collect_filename_samples(root_dir)
+        baseline, expected = benchmark_utils.time_call(
+            classify_all, legacy_infer_date_from_filename, samples, repeat=args.repeat)
+        optimized, actual = benchmark_utils.time_call(
+            classify_all, mediaarchive_csvjson_utils.infer_date_from_filename, samples, repeat=args.repeat,
+            setup=mediaarchive_csvjson_utils._classify_filename_prefix.cache_clear)
+        if expected != actual:
+            raise SystemExit("Compiled date classifier disagrees with the strptime baseline")
+        report("Filename date inference", baseline, optimized, len(samples))
+
+        entries_file = os.path.join(temp_dir, 'mediaarchive_entries.jsonl')
+        entries = list(process_media_archive(root_dir, entries_file))
+        placements = [(str(2001 + i % args.years), str(1 + i % 11).zfill(2)) for i in range(args.placements)]
+        baseline, _ = benchmark_utils.time_call(place_undated_legacy, entries, placements, repeat=1)
+        optimized, _ = benchmark_utils.time_call(place_undated_indexed, entries, placements, repeat=args.repeat)
+        report("Undated item placement", baseline, optimized, len(placements))
+
+        index = mediaarchive_csvjson_utils.new_media_index(root_dir)
+        cold, _ = benchmark_utils.time_call(scan_and_sort, root_dir, entries_file, index, repeat=1)
+        warm, _ = benchmark_utils.time_call(scan_and_sort, root_dir, entries_file, index, repeat=args.repeat)
+        report("Archive scan (cold vs warm index)", cold, warm, file_count)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import argparse
+import gc
+import json
+import math
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+import benchmark_utils
+import blog_csvjson_utils
+import mediaarchive_csvjson_utils
+import mythredz_csvjson_utils
+import serialization_utils
+import table_record_utils
+from mediaarchive_to_csvjson import process_media_archive
+
+DEFAULT_SCALES = [10_000, 100_000, 1_000_000, 10_000_000]
+DEFAULT_TIMEOUT = 600
+RESULTS_DIR = 'exported_data/benchmarks'
+
+# Each setup function builds seeded input for one stage at the given scale and returns
+# (function to time, number of rows it processes). Setup time is not measured.
+def setup_process_events(scale, seed, temp_dir):
+    events, megalogs, images = benchmark_utils.generate_blog_tables(scale, seed)
+    return lambda: blog_csvjson_utils.process_events(events, megalogs, images), len(events)
+
+def setup_process_mythredz_posts(scale, seed, temp_dir):
+    threds, posts = benchmark_utils.generate_mythredz_tables(scale, seed)
+    return lambda: mythredz_csvjson_utils.process_mythredz_posts(posts, threds), len(posts)
+
+def setup_combine_and_sort_entries(scale, seed, temp_dir):
+    threds, posts = benchmark_utils.generate_mythredz_tables(scale, seed)
+    entries = mythredz_csvjson_utils.process_mythredz_posts(posts, threds)
+    random.Random(seed).shuffle(entries)
+    return lambda: mythredz_csvjson_utils.combine_and_sort_entries(entries), len(entries)
+
+def setup_process_media_archive(scale, seed, temp_dir):
+    root_dir = os.path.join(temp_dir, 'mediaarchive')
+    files_per_folder = min(100, scale)
+    years = 10
+    folders_per_year = max(1, math.ceil(scale / files_per_folder / years))
+    file_count = benchmark_utils.generate_media_archive_tree(root_dir, years, folders_per_year, files_per_folder, seed)
+    entries_file = os.path.join(temp_dir, 'mediaarchive_entries.jsonl')
+    return lambda: list(process_media_archive(root_dir, entries_file)), file_count
+
+def setup_save_events_to_csv(scale, seed, temp_dir):
+    events = benchmark_utils.generate_processed_events(scale, seed)
+    return lambda: blog_csvjson_utils.save_events_to_csv(events, os.path.join(temp_dir, 'events.csv')), len(events)
+
+def setup_save_events_to_json(scale, seed, temp_dir):
+    events = benchmark_utils.generate_processed_events(scale, seed)
+    return lambda: blog_csvjson_utils.save_events_to_json(events, os.path.join(temp_dir, 'events.json')), len(events)
+
+def setup_save_mythredz_entries_to_csv(scale, seed, temp_dir):
+    threds, posts = benchmark_utils.generate_mythredz_tables(scale, seed)
+    entries = mythredz_csvjson_utils.process_mythredz_posts(posts, threds)
+    return lambda: mythredz_csvjson_utils.save_entries_to_csv(entries, os.path.join(temp_dir, 'entries.csv')), len(entries)
+
+def setup_save_mythredz_entries_to_json(scale, seed, temp_dir):
+    threds, posts = benchmark_utils.generate_mythredz_tables(scale, seed)
+    entries = mythredz_csvjson_utils.process_mythredz_posts(posts, threds)
+    return lambda: mythredz_csvjson_utils.save_entries_to_json(entries, os.path.join(temp_dir, 'entries.json')), len(entries)
+
+def setup_save_media_entries(scale, seed, temp_dir):
+    entries = benchmark_utils.generate_media_entries(scale, seed)
+    json_path = os.path.join(temp_dir, 'media.json')
+    csv_path = os.path.join(temp_dir, 'media.csv')
+    return lambda: mediaarchive_csvjson_utils.save_entries(entries, json_path=json_path, csv_path=csv_path), len(entries)
+
+def _write_event_table(file_path, scale, seed, batch_size=10_000):
+    # Written in batches so generating the input does not inflate the measured process's peak RSS
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for start in range(0, scale, batch_size):
+            events, _, _ = benchmark_utils.generate_blog_tables(min(batch_size, scale - start), seed + start)
+            for offset, event in enumerate(events):
+                event['eventid'] = start + offset + 1
+                f.write(',\n' if start or offset else '\n')
+                f.write(json.dumps(event, indent=4))
+        f.write('\n]')
+
+def setup_load_event_table_json(scale, seed, temp_dir):
+    file_path = os.path.join(temp_dir, 'event.json')
+    _write_event_table(file_path, scale, seed)
+    return lambda: blog_csvjson_utils.load_json(file_path), scale
+
+def setup_load_event_table_records(scale, seed, temp_dir):
+    file_path = os.path.join(temp_dir, 'event.json')
+    _write_event_table(file_path, scale, seed)
+    return lambda: table_record_utils.load_table(file_path, 'event'), scale
+
+BENCHMARK_STAGES = {
+    'process_events': setup_process_events,
+    'process_mythredz_posts': setup_process_mythredz_posts,
+    'combine_and_sort_entries': setup_combine_and_sort_entries,
+    'process_media_archive': setup_process_media_archive,
+    'save_events_to_csv': setup_save_events_to_csv,
+    'save_events_to_json': setup_save_events_to_json,
+    'save_mythredz_entries_to_csv': setup_save_mythredz_entries_to_csv,
+    'save_mythredz_entries_to_json': setup_save_mythredz_entries_to_json,
+    'save_media_entries': setup_save_media_entries,
+    'load_event_table_json': setup_load_event_table_json,
+    'load_event_table_records': setup_load_event_table_records
+}
+
+def run_measurement(stage_name, scale, seed, result_queue):
+    # Runs in a fresh process so peak RSS belongs to this one stage and scale
+    try:
+        with tempfile.TemporaryDirectory(prefix='journal_benchmark_') as temp_dir:
+            run, rows = BENCHMARK_STAGES[stage_name](scale, seed, temp_dir)
+            gc.collect()
+            input_rss_mb = benchmark_utils.peak_rss_mb()
+            cpu_started = time.process_time()
+            started = time.perf_counter()
+            run()
+            seconds = time.perf_counter() - started
+            cpu_seconds = time.process_time() - cpu_started
+            result_queue.put({
+                'status': 'ok',
+                'rows': rows,
+                'seconds': round(seconds, 6),
+                'cpu_seconds': round(cpu_seconds, 6),
+                'rows_per_sec': round(rows / seconds, 1) if seconds else None,
+                'input_rss_mb': round(input_rss_mb, 1) if input_rss_mb is not None else None,
+                'peak_rss_mb': round(benchmark_utils.peak_rss_mb(), 1) if input_rss_mb is not None else None
+            })
+    except Exception as e:
+        result_queue.put({'status': 'error', 'error': repr(e)})
+
+def measure(stage_name, scale, seed, timeout):
+    context = multiprocessing.get_context('spawn')
+    result_queue = context.Queue()
+    process = context.Process(target=run_measurement, args=(stage_name, scale, seed, result_queue))
+    process.start()
+    try:
+        result = result_queue.get(timeout=timeout)
+    except queue.Empty:
+        process.terminate()
+        result = {'status': 'timeout', 'error': f"exceeded {timeout}s"}
+    process.join()
+    return dict({'stage': stage_name, 'scale': scale}, **result)
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(baseline_path, results):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(result['stage'], result['scale']): result for result in json.load(f)['results']}
+    print(f"\nComparison with {baseline_path}:")
+    for result in results:
+        previous = baseline.get((result['stage'], result['scale']))
+        if not previous or previous.get('status') != 'ok' or result.get('status') != 'ok':
+            continue
+        speedup = previous['seconds'] / result['seconds'] if result['seconds'] else float('inf')
+        print(f"  {result['stage']:<32} {result['scale']:>12,}  {previous['seconds']:>10.3f}s -> "
+              f"{result['seconds']:>10.3f}s  ({speedup:.2f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every transform and writer stage on seeded synthetic data")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help="Row counts to run each stage at")
+    parser.add_argument('--stages', nargs='+', choices=sorted(BENCHMARK_STAGES), default=list(BENCHMARK_STAGES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT, help="Seconds allowed per stage and scale")
+    parser.add_argument('--output', help="Results file (default: exported_data/benchmarks/benchmark_results_<timestamp>.json)")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    parser.add_argument('--json-backend', choices=serialization_utils.JSON_BACKENDS,
+                        help="JSON encoder for the writer stages (sets JOURNAL_JSON_BACKEND for the measured processes)")
+    parser.add_argument('--compact', action='store_true', help="Write compact JSON (sets JOURNAL_JSON_COMPACT)")
+    args = parser.parse_args()
+
+    # Measurements run in spawned processes, which inherit the environment
+    if args.json_backend:
+        os.environ['JOURNAL_JSON_BACKEND'] = args.json_backend
+    if args.compact:
+        os.environ['JOURNAL_JSON_COMPACT'] = '1'
+
+    results = []
+    for stage_name in args.stages:
+        for scale in sorted(args.scales):
+            result = measure(stage_name, scale, args.seed, args.timeout)
+            results.append(result)
+            if result['status'] == 'ok':
+                print(f"{stage_name:<32} {scale:>12,} rows  {result['seconds']:>10.3f}s  "
+                      f"{result['rows_per_sec']:>14,.0f} rows/s  peak RSS {result['peak_rss_mb']} MB")
+            else:
+                print(f"{stage_name:<32} {scale:>12,} rows  {result['status']}: {result['error']}")
+                # Larger scales of a stage that already timed out or failed would only do the same
+                break
+
+    output_file = args.output or os.path.join(RESULTS_DIR, f"benchmark_results_{datetime.now().strftime('%Y%m%d%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'json_backend': serialization_utils.json_backend(),
+            'json_compact': serialization_utils.json_compact(),
+            'results': results
+        }, f, indent=2)
+    print(f"\nResults saved to {output_file}")
+
+    if args.compare:
+        compare_results(args.compare, results)
+
+if __name__ == "__main__":
+    main()
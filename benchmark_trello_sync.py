@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import benchmark_utils
+import trello_emulator
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = 'exported_data/benchmarks'
+SYNC_SCRIPTS = {
+    'blog': 'blog_to_trello.py',
+    'mythredz': 'mythredz_to_trello.py'
+}
+
+# Function to lay out synthetic source data the way the sync scripts expect to find it in their working directory
+def prepare_sync_workspace(work_dir, events, posts, attachment_bytes, seed):
+    rng = random.Random(seed)
+    export_dir = os.path.join(work_dir, 'mysql_data_exported')
+    os.makedirs(os.path.join(export_dir, 'mythredz'), exist_ok=True)
+
+    blog_events, megalogs, images = benchmark_utils.generate_blog_tables(events, seed)
+    threds, mythredz_posts = benchmark_utils.generate_mythredz_tables(posts, seed)
+    tables = {
+        'event.json': blog_events,
+        'megalog.json': megalogs,
+        'image.json': images,
+        os.path.join('mythredz', 'thred.json'): threds,
+        os.path.join('mythredz', 'post.json'): mythredz_posts
+    }
+    for file_name, rows in tables.items():
+        with open(os.path.join(export_dir, file_name), 'w') as f:
+            json.dump(rows, f)
+
+    if attachment_bytes:
+        upload_dir = os.path.join(work_dir, 'source_data/joeregercomlivedata/uploadimages/files/50')
+        for image in images:
+            image_path = os.path.join(upload_dir, image['filename'].replace('\\', os.path.sep))
+            os.makedirs(os.path.dirname(image_path), exist_ok=True)
+            with open(image_path, 'wb') as f:
+                f.write(rng.randbytes(attachment_bytes))
+
+    with open(os.path.join(work_dir, 'api_keys_and_tokens.txt'), 'w') as f:
+        f.write("trello_api_key=benchmark-key\ntrello_token=benchmark-token\ntrello_test_board_id=none\n")
+
+# Function to run one sync script against the emulator and collect its request statistics
+def run_sync(script, work_dir, server, timeout):
+    # Each sync starts with fresh statistics and an empty rate-limit window
+    with server.state['lock']:
+        server.state['stats'] = trello_emulator.new_emulator_stats()
+        server.state['request_times'].clear()
+    env = dict(os.environ, TRELLO_API_BASE_URL=server.base_url,
+               PYTHONPATH=os.pathsep.join(filter(None, [REPO_DIR, os.environ.get('PYTHONPATH')])))
+    log_path = os.path.join(work_dir, f"{os.path.splitext(script)[0]}.log")
+    started = time.perf_counter()
+    with open(log_path, 'w') as log_file:
+        try:
+            result = subprocess.run([sys.executable, os.path.join(REPO_DIR, script)], cwd=work_dir, env=env,
+                                    stdout=log_file, stderr=subprocess.STDOUT, timeout=timeout)
+            status = 'ok' if result.returncode == 0 else f"exit code {result.returncode}"
+        except subprocess.TimeoutExpired:
+            status = 'timeout'
+    seconds = time.perf_counter() - started
+
+    with server.state['lock']:
+        stats = json.loads(json.dumps(server.state['stats']))
+    return {
+        'script': script,
+        'status': status,
+        'seconds': round(seconds, 3),
+        'requests': stats['requests'],
+        'requests_per_sec': round(stats['requests'] / seconds, 1) if seconds else None,
+        'rate_limited': stats['rate_limited'],
+        'injected_errors': stats['injected_errors'],
+        'bytes_uploaded': stats['bytes_uploaded'],
+        'requests_by_endpoint': stats['requests_by_endpoint'],
+        'log': log_path
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Trello sync scripts offline against trello_emulator.py")
+    parser.add_argument('--syncs', nargs='+', choices=sorted(SYNC_SCRIPTS), default=sorted(SYNC_SCRIPTS))
+    parser.add_argument('--events', type=int, default=500, help="Synthetic blog events (only those after the blog sync start date are pushed)")
+    parser.add_argument('--posts', type=int, default=50, help="Synthetic mythredz posts")
+    parser.add_argument('--attachment-bytes', type=int, default=2048, help="Size of each synthetic image file (0 skips image files)")
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--token-limit', type=int, default=trello_emulator.DEFAULT_TOKEN_LIMIT)
+    parser.add_argument('--key-limit', type=int, default=trello_emulator.DEFAULT_KEY_LIMIT)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=int, default=3600, help="Seconds allowed per sync")
+    parser.add_argument('--output', help="Results file (default: exported_data/benchmarks/trello_sync_<timestamp>.json)")
+    args = parser.parse_args()
+
+    server = trello_emulator.start_emulator(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                            token_limit=args.token_limit, key_limit=args.key_limit,
+                                            error_rate=args.error_rate, seed=args.seed)
+    results = []
+    with tempfile.TemporaryDirectory(prefix='journal_trello_benchmark_') as work_dir:
+        prepare_sync_workspace(work_dir, args.events, args.posts, args.attachment_bytes, args.seed)
+        for sync in args.syncs:
+            result = run_sync(SYNC_SCRIPTS[sync], work_dir, server, args.timeout)
+            results.append(result)
+            print(f"{result['script']}: {result['status']} in {result['seconds']:.1f}s, {result['requests']} requests "
+                  f"({result['requests_per_sec']}/s), {result['rate_limited']} rate limited, "
+                  f"{result['bytes_uploaded']:,} bytes uploaded")
+            for endpoint, count in sorted(result['requests_by_endpoint'].items(), key=lambda item: -item[1]):
+                print(f"    {count:>8}  {endpoint}")
+            # The workspace is deleted afterwards, so the log path is only useful while running
+            del result['log']
+    server.shutdown()
+
+    output_file = args.output or os.path.join(RESULTS_DIR, f"trello_sync_{datetime.now().strftime('%Y%m%d%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({'created_at': datetime.now().isoformat(timespec='seconds'), 'settings': vars(args), 'results': results}, f, indent=2)
+    print(f"\nResults saved to {output_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import os
+import random
+import sys
+import time
+
+MEDIA_FILE_EXTENSIONS = ['.jpg', '.JPG', '.jpeg', '.png', '.gif', '.mp4', '.mov', '.avi', '.txt']
+
+# Function to build a seeded synthetic media archive tree of empty files
+def generate_media_archive_tree(root_dir, years=10, folders_per_year=50, files_per_folder=100, seed=0, start_year=2001):
+    rng = random.Random(seed)
+    file_count = 0
+    for year in range(start_year, start_year + years):
+        year_path = os.path.join(root_dir, str(year))
+        os.makedirs(year_path, exist_ok=True)
+        for folder_number in range(folders_per_year):
+            month = rng.randint(1, 12)
+            day = rng.randint(1, 28)
+            # Mix the folder layouts found in the real archive: dated folders, month folders and plain names
+            layout = rng.random()
+            if layout < 0.5:
+                folder_path = os.path.join(year_path, f"{year}-{month:02d}-{day:02d}-Folder {folder_number}")
+            elif layout < 0.8:
+                folder_path = os.path.join(year_path, str(month), f"Folder {folder_number}")
+            else:
+                folder_path = os.path.join(year_path, f"Folder {folder_number}")
+            os.makedirs(folder_path, exist_ok=True)
+
+            for file_number in range(files_per_folder):
+                prefix_type = rng.random()
+                if prefix_type < 0.4:
+                    prefix = f"{year}-{month:02d}-{rng.randint(1, 28):02d} "
+                elif prefix_type < 0.5:
+                    prefix = f"{year}{month:02d}{day:02d}_"
+                else:
+                    prefix = "IMG_"
+                extension = rng.choice(MEDIA_FILE_EXTENSIONS)
+                open(os.path.join(folder_path, f"{prefix}{file_number:05d}{extension}"), 'w').close()
+                file_count += 1
+    return file_count
+
+# Function to time a call, returning the best wall time over several repeats and the last result
+def time_call(func, *args, repeat=3, setup=None, **kwargs):
+    best = None
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - started
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+BENCHMARK_WORDS = ['morning', 'run', 'coffee', 'meeting', 'trip', 'dinner', 'project', 'garden', 'book', 'rain',
+                   'family', 'code', 'walk', 'beach', 'idea', 'weekend', 'photo', 'music', 'friends', 'snow']
+
+def _random_text(rng, min_words, max_words):
+    return ' '.join(rng.choice(BENCHMARK_WORDS) for _ in range(rng.randint(min_words, max_words)))
+
+def _random_timestamp(rng, start_year=2001, end_year=2024):
+    # Same shape as the datetime columns written by mysql_dump.py
+    return (f"{rng.randint(start_year, end_year)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            f"T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}")
+
+# Function to generate seeded event, megalog and image tables shaped like the blog MySQL export
+def generate_blog_tables(event_count, seed=0, megalog_count=40, images_per_event=0.5):
+    rng = random.Random(seed)
+    megalogs = [{'logid': logid, 'name': f"Log {logid} {rng.choice(BENCHMARK_WORDS).title()}"}
+                for logid in range(1, megalog_count + 1)]
+    image_count = int(event_count * images_per_event)
+
+    events = []
+    for eventid in range(1, event_count + 1):
+        comments = _random_text(rng, 20, 200)
+        if image_count and rng.random() < 0.1:
+            comments += f' <$image id="{rng.randint(1, image_count)}"$> ' + _random_text(rng, 5, 20)
+        events.append({
+            'eventid': eventid,
+            # A few rows point at unknown logs or other accounts, like the real data
+            'logid': rng.randint(1, megalog_count + 2),
+            'accountid': 50 if rng.random() < 0.95 else 51,
+            'date': _random_timestamp(rng),
+            'title': _random_text(rng, 2, 8).title(),
+            'comments': comments
+        })
+
+    images = [{
+        'imageid': imageid,
+        'eventid': rng.randint(1, event_count) if event_count else 0,
+        'filename': f"{rng.randint(2001, 2024)}\\img_{imageid:07d}.jpg",
+        'description': _random_text(rng, 0, 10) if rng.random() < 0.7 else None,
+        'imageorder': rng.randint(0, 10)
+    } for imageid in range(1, image_count + 1)]
+
+    return events, megalogs, images
+
+# Function to generate seeded thred and post tables shaped like the mythredz MySQL export
+def generate_mythredz_tables(post_count, seed=0, thred_count=60):
+    rng = random.Random(seed)
+    threds = [{'thredid': thredid, 'userid': 1 if rng.random() < 0.8 else rng.randint(2, 50),
+               'name': f"{rng.choice(BENCHMARK_WORDS).title()} {thredid}"}
+              for thredid in range(1, thred_count + 1)]
+    posts = [{'postid': postid, 'thredid': rng.randint(1, thred_count), 'date': _random_timestamp(rng, 2008, 2024),
+              'contents': _random_text(rng, 1, 30)}
+             for postid in range(1, post_count + 1)]
+    return threds, posts
+
+# Function to generate rows shaped like the output of blog_csvjson_utils.process_events
+def generate_processed_events(event_count, seed=0):
+    rng = random.Random(seed)
+    return [{
+        'date': _random_timestamp(rng),
+        'category': f"Log {rng.randint(1, 40)}",
+        'title': _random_text(rng, 2, 8).title(),
+        'body': _random_text(rng, 20, 200),
+        'datablogging.eventid': eventid,
+        'datablogging.logid': rng.randint(1, 40),
+        'images': ''
+    } for eventid in range(1, event_count + 1)]
+
+# Function to generate entries shaped like the output of process_media_archive
+def generate_media_entries(entry_count, seed=0):
+    rng = random.Random(seed)
+    entries = []
+    for number in range(entry_count):
+        date = _random_timestamp(rng)[:10]
+        title = f"Folder {number}"
+        files = [f"source_data/mediaarchive/{date[:4]}/{title}/IMG_{i:05d}.jpg" for i in range(rng.randint(1, 20))]
+        entries.append({'id': f"{date}-{title.replace(' ', '_')}", 'date': date, 'title': title, 'body': '',
+                        'images': files, 'videos': []})
+    return entries
+
+# Function to report the peak resident set size of the current process in megabytes
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
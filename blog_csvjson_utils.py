@@ -1,6 +1,10 @@
-import csv
 import json
 import re
+import serialization_utils
+import sharded_output_utils
+import sqlite_export_utils
+
+EVENT_FIELDNAMES = ['date', 'category', 'title', 'body', 'datablogging.eventid', 'datablogging.logid', 'images']
 
 # Function to load JSON data from a file
 def load_json(file_path):
@@ -18,17 +22,19 @@ def clean_description(desc):
 
 # Function to save events to CSV
 def save_events_to_csv(events, file_path):
-    fieldnames = ['date', 'category', 'title', 'body', 'datablogging.eventid', 'datablogging.logid', 'images']
-    with open(file_path, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
-        writer.writeheader()
-        for event in events:
-            writer.writerow(event)
+    serialization_utils.save_csv(events, file_path, EVENT_FIELDNAMES, encoding=None)
 
 # Function to save events to JSON
 def save_events_to_json(events, file_path):
-    with open(file_path, 'w') as jsonfile:
-        json.dump(events, jsonfile, indent=4)
+    serialization_utils.save_json(events, file_path, indent=4)
+
+# Function to save events to an indexed SQLite database with full-text search
+def save_events_to_sqlite(events, file_path):
+    return sqlite_export_utils.save_entries_to_sqlite(events, file_path)
+
+# Function to save events as per-year JSON and CSV shards with a manifest
+def save_events_to_shards(events, output_dir, compress=False):
+    return sharded_output_utils.save_sharded_entries(events, output_dir, 'JoeregercomBlog', csv_fieldnames=EVENT_FIELDNAMES, compress=compress)
 
 # Function to process events and prepare data for CSV and JSON
 def process_events(events, megalogs, images):
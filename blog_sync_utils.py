@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+from html import unescape
+from termcolor import colored
+import blog_trello_utils
+import metrics_utils
+from export_tables_utils import ExportTables
+from trello_board_utils import board_for_date, calculate_pos, list_name_for_date
+
+# Events before this date are not pushed to Trello
+START_DATE = datetime(2014, 6, 16, 0, 0)
+
+EXPORT_DIR = 'mysql_data_exported'
+UPLOAD_DIR = 'source_data/joeregercomlivedata/uploadimages/files/50'
+
+# Longer card descriptions are split onto "...CONTINUED" cards
+MAX_DESC_LENGTH = 13000
+
+IMAGE_TAG_PATTERN = re.compile(r'<\$image id=', re.IGNORECASE)
+HTML_TAG_PATTERN = re.compile('<.*?>')
+
+# Function to clean and format the card title
+def format_card_title(megalog_name, title, logid):
+    # Allow standard characters including dashes and apostrophes
+    clean_title = re.sub(r'[^a-zA-Z0-9\s\-\']', '', title)  # Allow dashes and apostrophes
+    clean_title = re.sub(r'<.*?>', '', clean_title).strip()
+    clean_title = unescape(clean_title)
+    if logid == 1:  # If the logid is 1, do not prepend the megalog name
+        return clean_title
+    else:
+        return f"{megalog_name}: {clean_title}"
+
+# Function to remove special formatting from comments
+def clean_comments(comments):
+    comments = comments.replace("\r\n", " ").replace("\n", " ").strip()
+    return comments
+
+# Function to remove HTML tags from a string
+def remove_html_tags(text):
+    return re.sub(HTML_TAG_PATTERN, '', text)
+
+# Function to clean image descriptions
+def clean_image_description(description):
+    if description is None:
+        return ''
+    return description.replace("\r\n", " ").replace("\n", " ").strip()
+
+class BlogData(ExportTables):
+    # The blog tables and their lookups: events oldest first, megalog names, and images by id and by event
+    TABLES = {'events': ('event.json', 'event'), 'megalogs': ('megalog.json', 'megalog'), 'images': ('image.json', 'image')}
+
+    def __init__(self, export_dir=EXPORT_DIR):
+        super().__init__(export_dir)
+
+    def _build_indexes(self):
+        with metrics_utils.stage_timer('build_indexes'):
+            # Sort events by date (oldest to newest)
+            events = sorted(self.tables['events'], key=lambda x: datetime.fromisoformat(x['date']))
+            megalog_names = {}
+            for megalog in self.tables['megalogs']:
+                megalog_names.setdefault(megalog['logid'], megalog['name'])
+            images_by_id = {}
+            images_by_event = {}
+            for image in self.tables['images']:
+                images_by_id.setdefault(image['imageid'], image)
+                images_by_event.setdefault(image['eventid'], []).append(image)
+            for event_images in images_by_event.values():
+                event_images.sort(key=lambda x: x['imageorder'])
+            self.indexes = {'events': events, 'megalog_names': megalog_names,
+                            'images_by_id': images_by_id, 'images_by_event': images_by_event}
+
+    @property
+    def events(self):
+        self._ensure_loaded()
+        return self.indexes['events']
+
+    def megalog_name(self, logid):
+        self._ensure_loaded()
+        return self.indexes['megalog_names'].get(logid)
+
+    def image(self, imageid):
+        self._ensure_loaded()
+        return self.indexes['images_by_id'].get(imageid)
+
+    def event_images(self, eventid):
+        self._ensure_loaded()
+        return self.indexes['images_by_event'].get(eventid, [])
+
+# Function to work out what an event looks like on Trello: its board, list and position, the
+# title and description of each card (the first and any "...CONTINUED" ones) and the images to attach.
+# Returns None when the event's megalog is unknown.
+def plan_event_cards(event, data):
+    event_date = datetime.fromisoformat(event['date'])
+    board_name, base_date, total_units = board_for_date(event_date)
+
+    megalog_name = data.megalog_name(event['logid'])
+    if not megalog_name:
+        return None
+    card_title = format_card_title(megalog_name, event['title'], event['logid'])
+
+    # Identify image tags and clean the description
+    card_description = clean_comments(event['comments'])
+    attachments = []
+    comments_parts = IMAGE_TAG_PATTERN.split(card_description)
+    card_description = comments_parts[0]
+    for part in comments_parts[1:]:
+        try:
+            image = data.image(int(part.split("$>")[0].replace('"', '').strip()))
+            if image is not None:
+                attachments.append(image)
+                card_description += part.split("$>")[1]
+        except Exception as e:
+            continue
+
+    # After identifying all image tags, remove HTML tags from the description
+    card_description = remove_html_tags(card_description)
+
+    # Add source and event details
+    card_description += f"\n\nEvent Date: {event['date']}\nSource: joereger.com blog\nEvent ID: {event['eventid']}\nLog ID: {event['logid']}"
+
+    # Add any additional attachments based on eventid, in imageorder
+    for image in data.event_images(event['eventid']):
+        if image not in attachments:
+            attachments.append(image)
+
+    # Split description if it exceeds the maximum length
+    description_chunks = [card_description[i:i+MAX_DESC_LENGTH] for i in range(0, len(card_description), MAX_DESC_LENGTH)]
+    cards = [(card_title if i == 0 else f"{card_title} ...CONTINUED", chunk) for i, chunk in enumerate(description_chunks)]
+
+    return {
+        'board_name': board_name,
+        'list_name': list_name_for_date(event_date),
+        'pos': calculate_pos(event_date, base_date, total_units),
+        'cards': cards,
+        'attachments': attachments
+    }
+
+# Function to fingerprint an event's card plan, so a resident sync can tell which events changed
+def plan_fingerprint(plan):
+    content = json.dumps([plan['board_name'], plan['list_name'], plan['cards'],
+                          [(image['imageid'], image.get('filename'), image.get('description')) for image in plan['attachments']]])
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+
+# Function to list the events to push, oldest first, as (event id, event)
+def sync_units(data, start_date=START_DATE):
+    return [(event['eventid'], event) for event in data.events if datetime.fromisoformat(event['date']) >= start_date]
+
+# Function to push one event to Trello through the mirror: its list, its cards and, on the first card,
+# its images and their descriptions as comments. Each request is made once, as it is needed.
+def sync_event(event, data, mirror, plan=None, upload_dir=UPLOAD_DIR):
+    plan = plan or plan_event_cards(event, data)
+    if plan is None:
+        print(colored(f"Error: Could not find megalog name for logid {event['logid']}", 'red', 'on_white'))
+        return False
+
+    board_id = mirror.board_id(plan['board_name'])
+
+    # Create the list, or move it to its position
+    list_id = mirror.list_id(board_id, plan['list_name'], plan['pos'], update_pos=True)
+
+    # Create cards for each description chunk
+    for i, (title, chunk) in enumerate(plan['cards']):
+        # Clean and truncate the description if it exceeds the maximum length
+        desc = blog_trello_utils.clean_description(chunk)[:MAX_DESC_LENGTH]
+        if title in mirror.cards(list_id):
+            card_id = mirror.update_card(list_id, title, desc)
+        else:
+            card_id = mirror.create_card(list_id, title, desc)
+
+        # Log the actions
+        print(f"Event Date: {event['date']} | Event ID: {event['eventid']}")
+        print(f"Board: {plan['board_name']} | List: {plan['list_name']} | Card Title: {title}")
+
+        # Upload attachments and add comments only to the first card
+        if i == 0:
+            for attachment in plan['attachments']:
+                print(f"Attachment: {attachment['filename']}")
+                print(f"Attachment Comment: {clean_image_description(attachment['description'])}")
+            print("="*40)
+
+            for attachment in plan['attachments']:
+                # Check if filename is not None
+                if attachment['filename']:
+                    attachment_path = os.path.join(upload_dir, attachment['filename'].replace('\\', os.path.sep))
+                    if not os.path.exists(attachment_path):
+                        print(colored(f"Error: File not found - {attachment_path}", 'red', 'on_white'))
+                        continue
+                    if (os.path.basename(attachment_path), os.path.getsize(attachment_path)) not in mirror.attachments(card_id):
+                        mirror.upload_attachment(card_id, attachment_path)
+                        cleaned_description = clean_image_description(attachment['description'])
+                        if cleaned_description:
+                            mirror.add_comment(card_id, cleaned_description)
+
+    return True
@@ -2,28 +2,49 @@ import json
 import re
 from datetime import datetime
 import blog_csvjson_utils
+import metrics_utils
+import table_record_utils
+import sharded_output_utils
 
 # Set the start date for processing events
 start_date = datetime(2001, 10, 22, 0, 0)
 
-# Load event, megalog, and image data
-events = blog_csvjson_utils.load_json('mysql_data_exported/event.json')
-megalogs = blog_csvjson_utils.load_json('mysql_data_exported/megalog.json')
-images = blog_csvjson_utils.load_json('mysql_data_exported/image.json')
+# Load event, megalog, and image data as compact records with only the columns used here
+with metrics_utils.stage_timer('load_tables'):
+    events = table_record_utils.load_table('mysql_data_exported/event.json', 'event')
+    megalogs = table_record_utils.load_table('mysql_data_exported/megalog.json', 'megalog')
+    images = table_record_utils.load_table('mysql_data_exported/image.json', 'image')
 
 # Sort events by date (oldest to newest)
-events.sort(key=lambda x: datetime.fromisoformat(x['date']))
+with metrics_utils.stage_timer('sort_events'):
+    events.sort(key=lambda x: datetime.fromisoformat(x['date']))
 
 # Process events to prepare data for CSV and JSON
-processed_events = blog_csvjson_utils.process_events(events, megalogs, images)
+with metrics_utils.stage_timer('process_events'):
+    processed_events = blog_csvjson_utils.process_events(events, megalogs, images)
 
 # Add a datestamp to the filenames
 datestamp = datetime.now().strftime('%Y%m%d%H%M%S')
 csv_filename = f'exported_data/JoeregercomBlog_{datestamp}.csv'
 json_filename = f'exported_data/JoeregercomBlog_{datestamp}.json'
+sqlite_filename = f'exported_data/JoeregercomBlog_{datestamp}.sqlite'
 
 # Save processed events to CSV and JSON
-blog_csvjson_utils.save_events_to_csv(processed_events, csv_filename)
-blog_csvjson_utils.save_events_to_json(processed_events, json_filename)
+# JOURNAL_OUTPUT_SHARDS=plain or gzip writes per-year shards with a manifest instead of the single CSV and JSON files
+shard_mode = sharded_output_utils.sharded_output_mode()
+shard_dir = f'exported_data/JoeregercomBlog_{datestamp}'
 
-print(f"Finished processing and saving events to {csv_filename} and {json_filename}")
+with metrics_utils.stage_timer('save_output'):
+    if shard_mode:
+        blog_csvjson_utils.save_events_to_shards(processed_events, shard_dir, compress=shard_mode == 'gzip')
+    else:
+        blog_csvjson_utils.save_events_to_csv(processed_events, csv_filename)
+        blog_csvjson_utils.save_events_to_json(processed_events, json_filename)
+    blog_csvjson_utils.save_events_to_sqlite(processed_events, sqlite_filename)
+
+if shard_mode:
+    print(f"Finished processing and saving events to {shard_dir} and {sqlite_filename}")
+else:
+    print(f"Finished processing and saving events to {csv_filename}, {json_filename} and {sqlite_filename}")
+
+metrics_utils.dump_metrics('blog_to_csvjson')
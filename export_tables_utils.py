@@ -0,0 +1,48 @@
+import os
+import metrics_utils
+import table_record_utils
+
+class ExportTables:
+    # Export tables and the lookups built from them, loaded on first use. refresh() reloads only the
+    # tables whose export files changed, so a long-running process keeps them warm between syncs.
+    # Subclasses list their tables in TABLES as {name: (file name, table)} and build their lookups in _build_indexes.
+    TABLES = {}
+
+    def __init__(self, export_dir):
+        self.export_dir = export_dir
+        self.tables = {}
+        self.signatures = {}
+        self.indexes = None
+
+    def _signature(self, file_name):
+        stat = os.stat(os.path.join(self.export_dir, file_name))
+        return stat.st_size, stat.st_mtime_ns
+
+    def refresh(self):
+        # Returns the names of the tables that were (re)loaded. A file that cannot be read, for example
+        # because an export is rewriting it, keeps its previously loaded table and is retried next time.
+        reloaded = []
+        for name, (file_name, table) in self.TABLES.items():
+            try:
+                signature = self._signature(file_name)
+                if self.signatures.get(name) == signature:
+                    continue
+                with metrics_utils.stage_timer(f"load_{name}"):
+                    self.tables[name] = table_record_utils.load_table(os.path.join(self.export_dir, file_name), table)
+            except (OSError, ValueError) as e:
+                if name not in self.tables:
+                    raise
+                print(f"Keeping the previously loaded {name} table; could not reload {file_name}: {e}")
+                continue
+            self.signatures[name] = signature
+            reloaded.append(name)
+        if reloaded or self.indexes is None:
+            self._build_indexes()
+        return reloaded
+
+    def _build_indexes(self):
+        raise NotImplementedError
+
+    def _ensure_loaded(self):
+        if self.indexes is None:
+            self.refresh()
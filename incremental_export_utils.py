@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+import serialization_utils
+
+# Bump when the index layout changes; an index with another version triggers a full rewrite
+INCREMENTAL_INDEX_VERSION = 1
+
+def incremental_export_enabled():
+    # JOURNAL_INCREMENTAL_EXPORT=1 merges into stable, un-timestamped export files instead of writing new ones
+    return os.environ.get('JOURNAL_INCREMENTAL_EXPORT', '').strip().lower() in ('1', 'true', 'yes')
+
+def entry_key(entry):
+    # Mythredz posts are identified by postid and blog events by eventid; anything else by its date and title
+    postid = entry.get('post.postid')
+    if postid not in (None, ''):
+        return f"post:{postid}"
+    eventid = entry.get('datablogging.eventid')
+    if eventid not in (None, ''):
+        return f"event:{eventid}"
+    return f"entry:{entry.get('date')}:{entry.get('title')}"
+
+def entry_hash(entry):
+    return hashlib.sha1(json.dumps(entry, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()[:16]
+
+def _sort_key(entry):
+    return datetime.fromisoformat(entry['date'])
+
+def load_export_index(index_path):
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        return None
+    return index if index.get('version') == INCREMENTAL_INDEX_VERSION else None
+
+def _save_export_index(index, index_path):
+    with open(f"{index_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(f"{index_path}.tmp", index_path)
+
+def _files_match_index(index, json_path, csv_path):
+    # The recorded sizes catch files that were edited or replaced behind the index's back
+    try:
+        return os.path.getsize(json_path) == index['json_size'] and os.path.getsize(csv_path) == index['csv_size']
+    except OSError:
+        return False
+
+def _unique_entries(entries):
+    # Later entries win, so freshly processed rows replace copies carried over in older exports
+    unique = {}
+    for entry in entries:
+        key = entry_key(entry)
+        unique.pop(key, None)
+        unique[key] = entry
+    return unique
+
+def _format_json_entry(entry):
+    # Same layout as json.dump(entries, indent=4) produces for one list item
+    return '    ' + serialization_utils.dumps(entry, indent=4, ensure_ascii=False).replace('\n', '\n    ')
+
+def _rewrite(entries, json_path, csv_path, fieldnames):
+    entries = sorted(entries, key=_sort_key)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        f.write('[\n' + ',\n'.join(map(_format_json_entry, entries)) + '\n]' if entries else '[]')
+    serialization_utils.save_csv(entries, csv_path, fieldnames)
+    return entries
+
+def _append(entries, json_path, csv_path, fieldnames):
+    # Replace the closing bracket of the JSON array with the new items, and add rows to the end of the CSV
+    with open(json_path, 'r+b') as f:
+        f.seek(-2, os.SEEK_END)
+        if f.read(2) != b'\n]':
+            raise ValueError(f"{json_path} does not end like an indented JSON array")
+        f.seek(-2, os.SEEK_END)
+        f.truncate()
+        f.write((',\n' + ',\n'.join(map(_format_json_entry, entries)) + '\n]').encode('utf-8'))
+    with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+        serialization_utils.write_csv_rows(f, entries, fieldnames, header=False)
+
+# Function to merge entries into a stable JSON/CSV export pair, keeping a key index next to it.
+# New entries dated at or after the newest exported entry are appended in place; only when an entry changed
+# or arrives out of date order are the files rewritten. Returns (written entries, whether the files were rewritten).
+def merge_entries_incrementally(entries, json_path, csv_path, index_path, fieldnames):
+    index = load_export_index(index_path)
+    if index is not None and not _files_match_index(index, json_path, csv_path):
+        print(f"{json_path} no longer matches {index_path}; rewriting it in full")
+        index = None
+    known = index['keys'] if index else {}
+
+    pending = []
+    changed = False
+    for key, entry in _unique_entries(entries).items():
+        digest = entry_hash(entry)
+        previous = known.get(key)
+        if previous is None:
+            pending.append((key, digest, entry))
+        elif previous[0] != digest:
+            changed = True
+            pending.append((key, digest, entry))
+
+    if index and not pending:
+        return [], False
+
+    pending.sort(key=lambda item: _sort_key(item[2]))
+    in_order = index and index['last_date'] and all(
+        _sort_key(entry) >= datetime.fromisoformat(index['last_date']) for _, _, entry in pending)
+
+    if index and not changed and (in_order or index['count'] == 0):
+        new_entries = [entry for _, _, entry in pending]
+        if index['count'] == 0:
+            _rewrite(new_entries, json_path, csv_path, fieldnames)
+        else:
+            _append(new_entries, json_path, csv_path, fieldnames)
+        rewritten = False
+    else:
+        # Changed or back-dated entries have to land in the middle of the files, so merge with what is there
+        existing = []
+        if index:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                existing = json.load(f)
+        updates = {key: entry for key, _, entry in pending}
+        merged = [entry for entry in existing if entry_key(entry) not in updates] + list(updates.values())
+        _rewrite(merged, json_path, csv_path, fieldnames)
+        index = {'keys': {entry_key(entry): [entry_hash(entry), entry['date']] for entry in existing},
+                 'last_date': max((entry['date'] for entry in existing), key=datetime.fromisoformat, default=None)}
+        rewritten = True
+
+    for key, digest, entry in pending:
+        index['keys'][key] = [digest, entry['date']]
+    # pending is in date order, so its last entry is its newest
+    last_dates = [date for date in (index.get('last_date'), pending[-1][2]['date'] if pending else None) if date]
+    index.update({
+        'version': INCREMENTAL_INDEX_VERSION,
+        'count': len(index['keys']),
+        'last_date': max(last_dates, key=datetime.fromisoformat, default=None),
+        'json_size': os.path.getsize(json_path),
+        'csv_size': os.path.getsize(csv_path)
+    })
+    _save_export_index(index, index_path)
+    return [entry for _, _, entry in pending], rewritten
@@ -0,0 +1,235 @@
+import json
+import os
+import re
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+CAPTURE_DATE_WORKERS = 16
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+QUICKTIME_EXTENSIONS = ('.mp4', '.mov')
+
+# EXIF tags holding capture dates, in order of preference
+EXIF_IFD_POINTER_TAG = 0x8769
+EXIF_DATE_TIME_ORIGINAL_TAG = 0x9003
+EXIF_DATE_TIME_DIGITIZED_TAG = 0x9004
+TIFF_DATE_TIME_TAG = 0x0132
+
+EXIF_DATE_PATTERN = re.compile(rb'(\d{4}):(\d{2}):(\d{2})')
+QUICKTIME_EPOCH = datetime(1904, 1, 1)
+
+def _format_date(year, month, day):
+    # Cameras with unset clocks write zeroes or 1904/1970 epochs; treat those as missing
+    if year < 1971:
+        return None
+    try:
+        return date(year, month, day).strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+def _read_jpeg_exif_segment(f):
+    # Walk the JPEG marker segments up to the first APP1 Exif segment, seeking past everything else.
+    # Only segment headers and the EXIF block itself (at most 64 KB) are ever read.
+    if f.read(2) != b'\xff\xd8':
+        return None
+    while True:
+        header = f.read(2)
+        if len(header) < 2 or header[0] != 0xFF:
+            return None
+        marker = header[1]
+        while marker == 0xFF:
+            fill = f.read(1)
+            if not fill:
+                return None
+            marker = fill[0]
+        # Start of scan or end of image: compressed data follows, EXIF always comes before it
+        if marker in (0xD9, 0xDA):
+            return None
+        # Standalone markers carry no length
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0]
+        if length < 2:
+            return None
+        if marker == 0xE1:
+            segment = f.read(length - 2)
+            if segment.startswith(b'Exif\x00\x00'):
+                return segment[6:]
+        else:
+            f.seek(length - 2, os.SEEK_CUR)
+
+def _read_ifd(tiff, offset, byte_order):
+    # Return {tag: (type, count, value_field_offset)} for one TIFF image file directory
+    entries = {}
+    if offset + 2 > len(tiff):
+        return entries
+    count = struct.unpack_from(byte_order + 'H', tiff, offset)[0]
+    for i in range(count):
+        entry_offset = offset + 2 + i * 12
+        if entry_offset + 12 > len(tiff):
+            break
+        tag, value_type, value_count = struct.unpack_from(byte_order + 'HHI', tiff, entry_offset)
+        entries[tag] = (value_type, value_count, entry_offset + 8)
+    return entries
+
+def _read_ifd_ascii(tiff, entry, byte_order):
+    value_type, value_count, field_offset = entry
+    if value_type != 2:
+        return None
+    if value_count > 4:
+        field_offset = struct.unpack_from(byte_order + 'I', tiff, field_offset)[0]
+    return tiff[field_offset:field_offset + value_count]
+
+def parse_exif_capture_date(tiff):
+    # Parse DateTimeOriginal, DateTimeDigitized or DateTime from a TIFF-structured EXIF block
+    if len(tiff) < 8:
+        return None
+    byte_order = {b'II': '<', b'MM': '>'}.get(tiff[:2])
+    if byte_order is None:
+        return None
+    try:
+        ifd0 = _read_ifd(tiff, struct.unpack_from(byte_order + 'I', tiff, 4)[0], byte_order)
+        candidates = []
+        if EXIF_IFD_POINTER_TAG in ifd0:
+            exif_offset = struct.unpack_from(byte_order + 'I', tiff, ifd0[EXIF_IFD_POINTER_TAG][2])[0]
+            exif_ifd = _read_ifd(tiff, exif_offset, byte_order)
+            candidates.extend(exif_ifd[tag] for tag in (EXIF_DATE_TIME_ORIGINAL_TAG, EXIF_DATE_TIME_DIGITIZED_TAG) if tag in exif_ifd)
+        if TIFF_DATE_TIME_TAG in ifd0:
+            candidates.append(ifd0[TIFF_DATE_TIME_TAG])
+
+        for entry in candidates:
+            value = _read_ifd_ascii(tiff, entry, byte_order)
+            match = EXIF_DATE_PATTERN.match(value or b'')
+            if match:
+                capture_date = _format_date(*(int(group) for group in match.groups()))
+                if capture_date:
+                    return capture_date
+    except struct.error:
+        return None
+    return None
+
+def _read_atom_header(f, offset, end):
+    # Return (atom type, header size, atom size) for the atom at offset, or None past the end
+    if offset + 8 > end:
+        return None
+    f.seek(offset)
+    header = f.read(8)
+    if len(header) < 8:
+        return None
+    size, atom_type = struct.unpack('>I4s', header)
+    header_size = 8
+    if size == 1:
+        large_size = f.read(8)
+        if len(large_size) < 8:
+            return None
+        size = struct.unpack('>Q', large_size)[0]
+        header_size = 16
+    elif size == 0:
+        size = end - offset
+    if size < header_size:
+        return None
+    return atom_type, header_size, size
+
+def _find_atom(f, atom_type, offset, end):
+    # Hop from atom header to atom header, seeking over payloads such as multi-gigabyte mdat atoms
+    while True:
+        atom = _read_atom_header(f, offset, end)
+        if atom is None:
+            return None
+        found_type, header_size, size = atom
+        if found_type == atom_type:
+            return offset + header_size, offset + size
+        offset += size
+
+def read_quicktime_capture_date(f, file_size):
+    # Read the creation time from the moov/mvhd atom of an MP4 or MOV file
+    moov = _find_atom(f, b'moov', 0, file_size)
+    if moov is None:
+        return None
+    mvhd = _find_atom(f, b'mvhd', *moov)
+    if mvhd is None:
+        return None
+    f.seek(mvhd[0])
+    version = f.read(4)[:1]
+    if version == b'\x01':
+        data = f.read(8)
+        if len(data) < 8:
+            return None
+        seconds = struct.unpack('>Q', data)[0]
+    else:
+        data = f.read(4)
+        if len(data) < 4:
+            return None
+        seconds = struct.unpack('>I', data)[0]
+    if not seconds:
+        return None
+    try:
+        created = QUICKTIME_EPOCH + timedelta(seconds=seconds)
+    except OverflowError:
+        return None
+    return _format_date(created.year, created.month, created.day)
+
+def read_jpeg_capture_date(f):
+    tiff = _read_jpeg_exif_segment(f)
+    if tiff is None:
+        return None
+    return parse_exif_capture_date(tiff)
+
+def read_capture_date(file_path, file_size=None):
+    # Read the capture date from a media file's header bytes only; returns YYYY-MM-DD or None
+    lower_path = file_path.lower()
+    try:
+        with open(file_path, 'rb') as f:
+            if lower_path.endswith(JPEG_EXTENSIONS):
+                return read_jpeg_capture_date(f)
+            if lower_path.endswith(QUICKTIME_EXTENSIONS):
+                if file_size is None:
+                    file_size = os.fstat(f.fileno()).st_size
+                return read_quicktime_capture_date(f, file_size)
+    except OSError as e:
+        print(f"Error reading capture date from {file_path}: {e}")
+    return None
+
+def load_capture_date_cache(file_path):
+    if not os.path.exists(file_path):
+        return {}
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable capture date cache {file_path}: {e}")
+        return {}
+
+def save_capture_date_cache(cache, file_path):
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(temp_path, file_path)
+
+def _cached_capture_date(file_path, cache):
+    # Cache entries are [size, mtime_ns, date] and are reused only while size and mtime are unchanged
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    cached = cache.get(file_path)
+    if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+    capture_date = read_capture_date(file_path, stat.st_size)
+    cache[file_path] = [stat.st_size, stat.st_mtime_ns, capture_date]
+    return capture_date
+
+def read_capture_dates(file_paths, cache=None, executor=None, max_workers=CAPTURE_DATE_WORKERS):
+    # Read capture dates for many files across a thread pool, returning {path: date or None}
+    if cache is None:
+        cache = {}
+    readable_paths = [path for path in file_paths if path.lower().endswith(JPEG_EXTENSIONS + QUICKTIME_EXTENSIONS)]
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=max_workers) as own_executor:
+            dates = list(own_executor.map(lambda path: _cached_capture_date(path, cache), readable_paths))
+    else:
+        dates = list(executor.map(lambda path: _cached_capture_date(path, cache), readable_paths))
+    return dict(zip(readable_paths, dates))
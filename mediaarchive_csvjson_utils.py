@@ -1,33 +1,157 @@
 import json
 import csv
-from datetime import datetime
+import calendar
+import heapq
+import sys
+import tempfile
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date, datetime
+from functools import lru_cache
+from operator import itemgetter
 import os
 import re
+import serialization_utils
+import sharded_output_utils
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi')
+MEDIA_EXTENSIONS = IMAGE_EXTENSIONS + VIDEO_EXTENSIONS
+SCAN_WORKERS = 16
+CSV_FIELDNAMES = ['id', 'date', 'title', 'body', 'images', 'videos']
+
+# External sort settings: the in-memory budget before spilling a sorted run to disk,
+# the estimated per-entry bookkeeping overhead, and how many runs are merged at once
+SORT_MEMORY_BUDGET = 64 * 1024 * 1024
+SORT_ITEM_OVERHEAD = 120
+SORT_MERGE_FAN_IN = 64
+
+# Bump when grouping or the index layout changes so old indexes are rebuilt
+MEDIA_INDEX_VERSION = 5
+
+# Of the strptime formats "%Y-%m-%d", "%Y%m%d" and "%Y-%m-%d %H.%M.%S", only "%Y-%m-%d"
+# can consume exactly a ten-character filename prefix, so this one anchored pattern
+# accepts the same prefixes strptime did
+FILENAME_DATE_PATTERN = re.compile(r'(\d{4})-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01]| [1-9])')
+
+def _csv_row(entry):
+    return {
+        'id': entry['id'],
+        'date': entry['date'],
+        'title': entry['title'],
+        'body': entry['body'],
+        'images': '|'.join(entry['images']),
+        'videos': '|'.join(entry['videos'])
+    }
+
+def save_entries(entries, json_path=None, csv_path=None):
+    # Stream entries into the JSON and/or CSV output in a single pass over any iterable,
+    # writing the same JSON layout as json.dump(entries, indent=2). Returns the number of entries written.
+    # Encoding goes through serialization_utils, and CSV rows are written in batches.
+    with ExitStack() as stack:
+        json_file = stack.enter_context(open(json_path, 'w', encoding='utf-8')) if json_path else None
+        csv_writer = None
+        if csv_path:
+            csv_file = stack.enter_context(open(csv_path, 'w', newline='', encoding='utf-8'))
+            csv_writer = csv.writer(csv_file)
+            csv_writer.writerow(CSV_FIELDNAMES)
+            csv_values = serialization_utils.row_getter(CSV_FIELDNAMES)
+            csv_batch = []
+
+        count = 0
+        for entry in entries:
+            if json_file:
+                json_file.write('[\n  ' if count == 0 else ',\n  ')
+                json_file.write(serialization_utils.dumps(entry, indent=2, ensure_ascii=False).replace('\n', '\n  '))
+            if csv_writer:
+                csv_batch.append(csv_values(_csv_row(entry)))
+                if len(csv_batch) >= serialization_utils.CSV_BATCH_SIZE:
+                    csv_writer.writerows(csv_batch)
+                    csv_batch.clear()
+            count += 1
+
+        if csv_writer:
+            csv_writer.writerows(csv_batch)
+        if json_file:
+            json_file.write('[]' if count == 0 else '\n]')
+    return count
 
 def save_entries_to_json(entries, file_path):
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(entries, f, ensure_ascii=False, indent=2)
+    save_entries(entries, json_path=file_path)
 
 def save_entries_to_csv(entries, file_path):
-    fieldnames = ['id', 'date', 'title', 'body', 'images', 'videos']
-    with open(file_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
+    save_entries(entries, csv_path=file_path)
+
+def save_entries_to_shards(entries, output_dir, compress=False):
+    # Per-year JSON and CSV shards with a manifest; returns the manifest
+    return sharded_output_utils.save_sharded_entries(entries, output_dir, 'MediaArchive', csv_fieldnames=CSV_FIELDNAMES,
+                                                     csv_row=_csv_row, csv_quoting=csv.QUOTE_MINIMAL, compress=compress)
+
+def _write_sort_run(run, spill_dir):
+    # Sort one buffered run by key (stable, so ties keep input order) and spill it to disk as JSON lines
+    run.sort(key=itemgetter(0))
+    fd, run_path = tempfile.mkstemp(prefix='sort_run_', suffix='.jsonl', dir=spill_dir)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        for _, line in run:
+            f.write(line)
+            f.write('\n')
+    return run_path
+
+def _read_sort_run(run_path):
+    with open(run_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+def _merge_sort_runs(run_paths, key, spill_dir):
+    # Merge consecutive groups of runs until few enough remain to merge in one pass.
+    # heapq.merge prefers earlier runs on ties, so the overall sort stays stable.
+    while len(run_paths) > SORT_MERGE_FAN_IN:
+        merged_paths = []
+        for start in range(0, len(run_paths), SORT_MERGE_FAN_IN):
+            group = run_paths[start:start + SORT_MERGE_FAN_IN]
+            fd, merged_path = tempfile.mkstemp(prefix='sort_run_', suffix='.jsonl', dir=spill_dir)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for entry in heapq.merge(*(_read_sort_run(path) for path in group), key=key):
+                    f.write(json.dumps(entry, ensure_ascii=False))
+                    f.write('\n')
+            for path in group:
+                os.remove(path)
+            merged_paths.append(merged_path)
+        run_paths = merged_paths
+    return heapq.merge(*(_read_sort_run(path) for path in run_paths), key=key)
+
+def external_sort_entries(entries, key=itemgetter('date'), memory_budget=SORT_MEMORY_BUDGET, spill_dir=None):
+    # Sort any iterable of entries while holding at most about memory_budget bytes of them in memory.
+    # Entries are buffered as serialized JSON, spilled to sorted runs on disk whenever the buffer
+    # reaches the budget, and the runs are then merged lazily. Yields entries in sorted order.
+    with tempfile.TemporaryDirectory(prefix='mediaarchive_sort_', dir=spill_dir) as temp_dir:
+        run = []
+        run_bytes = 0
+        run_paths = []
         for entry in entries:
-            row = {
-                'id': entry['id'],
-                'date': entry['date'],
-                'title': entry['title'],
-                'body': entry['body'],
-                'images': '|'.join(entry['images']),
-                'videos': '|'.join(entry['videos'])
-            }
-            writer.writerow(row)
+            line = json.dumps(entry, ensure_ascii=False)
+            run.append((key(entry), line))
+            run_bytes += sys.getsizeof(line) + SORT_ITEM_OVERHEAD
+            if run_bytes >= memory_budget:
+                run_paths.append(_write_sort_run(run, temp_dir))
+                run = []
+                run_bytes = 0
+
+        if not run_paths:
+            # Everything fit in the budget, so no merge is needed
+            run.sort(key=itemgetter(0))
+            for _, line in run:
+                yield json.loads(line)
+            return
+
+        if run:
+            run_paths.append(_write_sort_run(run, temp_dir))
+            run = []
+        yield from _merge_sort_runs(run_paths, key, temp_dir)
 
 def infer_date_from_path(file_path, root_dir):
     parts = file_path.split(os.sep)
-    root_parts = root_dir.split(os.sep)
-    year_index = len(root_parts)
+    year_index = _path_depth(root_dir)
     
     if year_index >= len(parts):
         return datetime.now().strftime("%Y-%m-%d")
@@ -42,46 +166,81 @@ def infer_date_from_path(file_path, root_dir):
         if possible_month.isdigit() and 1 <= int(possible_month) <= 12:
             month = possible_month.zfill(2)
 
-    # Look for date in folder name
+    # Look for date in folder name; only a real YYYY-MM-DD prefix counts, so "2005-Christmas-Party" keeps the year and month
     for part in parts[year_index:]:
         if part.startswith(year):
             date_parts = part.split('-')
-            if len(date_parts) >= 3:
+            if len(date_parts) >= 3 and all(date_part.isdigit() for date_part in date_parts[:3]):
+                try:
+                    date(*(int(date_part) for date_part in date_parts[:3]))
+                except ValueError:
+                    continue
                 year, month, day = date_parts[:3]
                 break
 
     return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
 
+@lru_cache(maxsize=None)
+def _path_depth(root_dir):
+    # The root is the same for every folder, so split it only once
+    return len(root_dir.split(os.sep))
+
+@lru_cache(maxsize=65536)
+def _classify_filename_prefix(prefix, folder_year):
+    # Files in one folder share a handful of prefixes, so each (prefix, year) pair is classified once
+    match = FILENAME_DATE_PATTERN.fullmatch(prefix)
+    if match is None:
+        return None
+    year, month, day = (int(group) for group in match.groups())
+    try:
+        if year != int(folder_year):
+            return None
+        date(year, month, day)
+    except ValueError:
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
 def infer_date_from_filename(filename, folder_date):
-    # Try to find a date in the filename
-    date_formats = [
-        "%Y-%m-%d",
-        "%Y%m%d",
-        "%Y-%m-%d %H.%M.%S",
-    ]
-    
-    for date_format in date_formats:
+    # Try to find a date in the filename, falling back to the folder date
+    return _classify_filename_prefix(filename[:10], folder_date[:4]) or folder_date
+
+def new_month_occupancy():
+    return {}
+
+def add_to_month_occupancy(occupancy, entry_date):
+    # Count one more entry on entry_date in the (year, month) -> per-day counts index
+    try:
+        year, month, day = int(entry_date[:4]), int(entry_date[5:7]), int(entry_date[8:10])
+    except ValueError:
+        return occupancy
+    day_counts = occupancy.get((year, month))
+    if day_counts is None:
         try:
-            file_date = datetime.strptime(filename[:10], date_format).date()
-            if file_date.year == int(folder_date[:4]):
-                return file_date.strftime("%Y-%m-%d")
-        except ValueError:
-            pass
-    
-    # If no date found in filename, use the folder date
-    return folder_date
+            days_in_month = calendar.monthrange(year, month)[1]
+        except (ValueError, calendar.IllegalMonthError):
+            return occupancy
+        day_counts = occupancy[(year, month)] = [0] * days_in_month
+    if 1 <= day <= len(day_counts):
+        day_counts[day - 1] += 1
+    return occupancy
 
-def find_available_day(entries, year, month):
-    days_in_month = (datetime(int(year), int(month) % 12 + 1, 1) - datetime(int(year), int(month), 1)).days
-    day_counts = {str(day).zfill(2): 0 for day in range(1, days_in_month + 1)}
-    
+def build_month_occupancy(entries):
+    occupancy = new_month_occupancy()
     for entry in entries:
-        entry_date = datetime.strptime(entry['date'], "%Y-%m-%d")
-        if entry_date.year == int(year) and entry_date.month == int(month):
-            day_counts[str(entry_date.day).zfill(2)] += 1
-    
+        add_to_month_occupancy(occupancy, entry['date'])
+    return occupancy
+
+def find_available_day(entries, year, month, occupancy=None):
+    # Pass an occupancy index maintained with add_to_month_occupancy to avoid rescanning entries on every lookup
+    if occupancy is None:
+        occupancy = build_month_occupancy(entries)
+    day_counts = occupancy.get((int(year), int(month)))
+    if day_counts is None:
+        return '01'
+
     # Find the day with the least entries
-    return min(day_counts, key=day_counts.get)
+    least_day = min(range(len(day_counts)), key=day_counts.__getitem__)
+    return str(least_day + 1).zfill(2)
 
 def clean_title(title, date):
     # Remove date from the beginning of the title if it matches the entry date
@@ -125,10 +284,186 @@ def process_media_files(entries, date, title, media_files):
         start_idx = (part - 1) * MAX_FILES_PER_POST
         end_idx = min(part * MAX_FILES_PER_POST, len(media_files))
         
-        images = [file for file in media_files[start_idx:end_idx] if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif'))]
-        videos = [file for file in media_files[start_idx:end_idx] if file.lower().endswith(('.mp4', '.mov', '.avi'))]
+        images = [file for file in media_files[start_idx:end_idx] if file.lower().endswith(IMAGE_EXTENSIONS)]
+        videos = [file for file in media_files[start_idx:end_idx] if file.lower().endswith(VIDEO_EXTENSIONS)]
         
         entry = create_entry(date, cleaned_title, images, videos, part, total_parts)
         entries.append(entry)
     
-    return entries
\ No newline at end of file
+    return entries
+
+def new_media_index(root_dir, capture_dates=False):
+    return {'version': MEDIA_INDEX_VERSION, 'root_dir': root_dir, 'capture_dates': capture_dates, 'directories': {}}
+
+def load_media_index(file_path, root_dir, capture_dates=False):
+    # Load the persisted directory index, starting fresh if it is missing or was built for another tree or dating mode
+    if not os.path.exists(file_path):
+        return new_media_index(root_dir, capture_dates)
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable media index {file_path}: {e}")
+        return new_media_index(root_dir, capture_dates)
+    if (index.get('version') != MEDIA_INDEX_VERSION or index.get('root_dir') != root_dir
+            or index.get('capture_dates') != capture_dates):
+        return new_media_index(root_dir, capture_dates)
+    return index
+
+def save_media_index(index, file_path):
+    # Write to a temporary file first so an interrupted run never leaves a truncated index
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(temp_path, file_path)
+
+def read_entry_store(file_path):
+    # Yield the (folder, mtime_ns, groups) records of a folder entry store, one line per folder;
+    # a store that does not exist yet has no records
+    if not os.path.exists(file_path):
+        return
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            yield record['folder'], record['mtime_ns'], record['groups']
+
+def write_entry_store_record(f, folder, mtime_ns, groups):
+    f.write(json.dumps({'folder': folder, 'mtime_ns': mtime_ns, 'groups': groups}, ensure_ascii=False))
+    f.write('\n')
+
+def media_entry_sort_key(entry):
+    # Date first, then folder; the external sort is stable, so entries of one folder and day keep their part order
+    return entry['date'], os.path.dirname((entry['images'] + entry['videos'])[0])
+
+def unique_entry_ids(sorted_entries):
+    # Ids are the date and title, so two folders with the same name (or no title but the date) on one day would
+    # share one; number the repeats _2, _3, ... in sort order. Entries come sorted by date, so only the current
+    # day's ids are kept.
+    day = None
+    seen = set()
+    for entry in sorted_entries:
+        if entry['date'] != day:
+            day = entry['date']
+            seen = set()
+        entry_id, count = entry['id'], 1
+        while entry_id in seen:
+            count += 1
+            entry_id = f"{entry['id']}_{count}"
+        seen.add(entry_id)
+        entry['id'] = entry_id
+        yield entry
+
+def scan_directory(path, cached_mtime_ns=None):
+    # List one directory with os.scandir; DirEntry carries the file type so no extra stat calls are needed.
+    # If the directory mtime still matches the index, skip the listing and return files=None.
+    mtime_ns = os.stat(path).st_mtime_ns
+    if mtime_ns == cached_mtime_ns:
+        return path, mtime_ns, None, None
+
+    files = []
+    subdirs = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir():
+                # Match os.walk: symlinked directories are listed but not descended into
+                if not entry.is_symlink():
+                    subdirs.append(entry.path)
+            else:
+                files.append(entry.name)
+    return path, mtime_ns, files, subdirs
+
+def scan_media_archive(root_dir, index=None, max_workers=SCAN_WORKERS):
+    # Fan out over year directories and their subdirectories with a thread pool,
+    # yielding (folder, files) batches as soon as each changed directory has been listed.
+    # Directories whose mtime matches the index are not re-listed and not yielded;
+    # their cached subdirectories are still checked.
+    if index is None:
+        index = new_media_index(root_dir)
+    directories = index['directories']
+
+    year_paths = []
+    for year_dir in sorted(os.listdir(root_dir)):
+        year_path = os.path.join(root_dir, year_dir)
+        if os.path.isdir(year_path) and year_dir.isdigit():
+            year_paths.append(year_path)
+
+    def submit(executor, path):
+        cached = directories.get(path)
+        return executor.submit(scan_directory, path, cached['mtime_ns'] if cached else None)
+
+    visited = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {submit(executor, path) for path in year_paths}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    folder, mtime_ns, files, subdirs = future.result()
+                except OSError as e:
+                    print(f"Error scanning directory: {e}")
+                    continue
+
+                visited.add(folder)
+                if files is None:
+                    for subdir in directories[folder]['subdirs']:
+                        pending.add(submit(executor, subdir))
+                    continue
+
+                directories[folder] = {'mtime_ns': mtime_ns, 'subdirs': subdirs}
+                for subdir in subdirs:
+                    pending.add(submit(executor, subdir))
+
+                # Skip .thumbnails folders
+                if os.path.basename(folder) == ".thumbnails" or not files:
+                    continue
+
+                yield folder, files
+
+    # Forget directories that no longer exist
+    for folder in list(directories):
+        if folder not in visited:
+            del directories[folder]
+
+def _stat_file(file_path):
+    try:
+        stat = os.stat(file_path)
+    except OSError as e:
+        print(f"Error reading size of {file_path}: {e}")
+        return None, None
+    return stat.st_size, stat.st_mtime_ns
+
+def stat_media_files(file_paths, executor):
+    # Return {path: [size, mtime_ns]} for a folder's files, statted across the executor's threads
+    return {path: list(stat) for path, stat in zip(file_paths, executor.map(_stat_file, file_paths))}
+
+def group_media_folder(folder, files, root_dir, capture_dates=None, file_stats=None):
+    # Group one folder's media files by date, as [{'date', 'title', 'files'}] with each file as [path, size, mtime_ns].
+    # The groups are split into entries by partition_media_groups once duplicates are known.
+    # A capture date read from the file header wins over the filename and folder when it falls in the folder's year.
+    year_dir = os.path.relpath(folder, root_dir).split(os.sep)[0]
+    folder_date = infer_date_from_path(folder, root_dir)
+    folder_name = os.path.basename(folder)
+
+    date_groups = {}
+    for file in files:
+        if file.lower().endswith(MEDIA_EXTENSIONS):
+            file_path = os.path.join(folder, file)
+            file_date = capture_dates.get(file_path) if capture_dates else None
+            if not file_date or file_date[:4] != folder_date[:4]:
+                file_date = infer_date_from_filename(file, folder_date)
+            if file_date not in date_groups:
+                date_groups[file_date] = []
+            date_groups[file_date].append([file_path] + list((file_stats or {}).get(file_path, (None, None))))
+
+    title = folder_name if folder_name != year_dir else "Media"
+    return [{'date': date, 'title': clean_title(title, date), 'files': media_files} for date, media_files in date_groups.items()]
+
+def partition_media_groups(groups, duplicate_paths=frozenset()):
+    # Turn a folder's date groups into entries of at most 100 files, leaving out duplicate copies first so
+    # the parts, their titles and ids are counted from the files that remain; a group left empty has no entry
+    entries = []
+    for group in groups:
+        media_files = [file[0] for file in group['files'] if file[0] not in duplicate_paths]
+        if media_files:
+            entries = process_media_files(entries, group['date'], group['title'], media_files)
+    return entries
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from operator import itemgetter
+from mediaarchive_csvjson_utils import SORT_MEMORY_BUDGET, external_sort_entries
+
+DEDUP_WORKERS = 16
+PARTIAL_HASH_BLOCK_SIZE = 64 * 1024
+FULL_HASH_CHUNK_SIZE = 1024 * 1024
+# Paths hashed per round, so a long stream of paths never queues more work than this at once
+DEDUP_BATCH_SIZE = 4096
+
+def _partial_hash(file_path, size):
+    # Hash only the first and last blocks; for files no larger than two blocks this covers the whole file
+    try:
+        hasher = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            hasher.update(f.read(PARTIAL_HASH_BLOCK_SIZE))
+            if size > PARTIAL_HASH_BLOCK_SIZE:
+                f.seek(max(PARTIAL_HASH_BLOCK_SIZE, size - PARTIAL_HASH_BLOCK_SIZE))
+                hasher.update(f.read(PARTIAL_HASH_BLOCK_SIZE))
+        return hasher.hexdigest()
+    except OSError as e:
+        print(f"Error hashing {file_path}: {e}")
+        return None
+
+def _full_hash(file_path):
+    try:
+        hasher = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(FULL_HASH_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+    except OSError as e:
+        print(f"Error hashing {file_path}: {e}")
+        return None
+
+def _group_colliding(keyed_paths):
+    # Group (key, path) pairs by key, keeping only keys shared by more than one path
+    groups = {}
+    for key, path in keyed_paths:
+        if key is not None:
+            groups.setdefault(key, []).append(path)
+    return {key: paths for key, paths in groups.items() if len(paths) > 1}
+
+def _size_groups(files, memory_budget, spill_dir):
+    # Yield (size, [(path, mtime_ns)]) for every size shared by more than one file. The (size, path, mtime_ns)
+    # triples go through the external sort, so only one size's paths are in memory at a time however many files there are.
+    triples = ([size, path, mtime_ns] for path, size, mtime_ns in files if size)
+    sorted_triples = external_sort_entries(triples, key=itemgetter(0, 1), memory_budget=memory_budget, spill_dir=spill_dir)
+    for size, group in groupby(sorted_triples, key=itemgetter(0)):
+        paths = []
+        for _, path, mtime_ns in group:
+            if not paths or paths[-1][0] != path:
+                paths.append((path, mtime_ns))
+        if len(paths) > 1:
+            yield size, paths
+
+def _cached_hash(cache, slot, hash_file, path, size, mtime_ns):
+    # Cache entries are [size, mtime_ns, partial hash, full hash] and are reused only while size and mtime are unchanged
+    cached = cache.get(path)
+    if not cached or cached[0] != size or cached[1] != mtime_ns:
+        cached = cache[path] = [size, mtime_ns, None, None]
+    if cached[slot] is None:
+        cached[slot] = hash_file()
+    return cached[slot]
+
+def _partial_hash_cached(candidate, cache):
+    size, path, mtime_ns = candidate
+    return _cached_hash(cache, 2, lambda: _partial_hash(path, size), path, size, mtime_ns)
+
+def _full_hash_cached(candidate, cache):
+    size, path, mtime_ns = candidate
+    return _cached_hash(cache, 3, lambda: _full_hash(path), path, size, mtime_ns)
+
+def _hash_size_groups(size_groups, executor, cache):
+    # Narrow same-size groups down to (size, sha256, paths) groups of identical files
+    candidates = [(size, path, mtime_ns) for size, paths in size_groups for path, mtime_ns in paths]
+    partial_hashes = executor.map(lambda candidate: _partial_hash_cached(candidate, cache), candidates)
+    partial_groups = _group_colliding(
+        ((size, digest) if digest else None, (path, mtime_ns)) for (size, path, mtime_ns), digest in zip(candidates, partial_hashes))
+
+    duplicate_groups = []
+    needs_full_hash = []
+    for (size, digest), paths in partial_groups.items():
+        if size <= 2 * PARTIAL_HASH_BLOCK_SIZE:
+            duplicate_groups.append((size, digest, [path for path, _ in paths]))
+        else:
+            needs_full_hash.extend((size, path, mtime_ns) for path, mtime_ns in paths)
+
+    full_hashes = executor.map(lambda candidate: _full_hash_cached(candidate, cache), needs_full_hash)
+    full_groups = _group_colliding(
+        ((size, digest) if digest else None, path) for (size, path, _), digest in zip(needs_full_hash, full_hashes))
+    duplicate_groups.extend((size, digest, paths) for (size, digest), paths in full_groups.items())
+    return duplicate_groups
+
+def find_duplicate_files(files, max_workers=DEDUP_WORKERS, memory_budget=SORT_MEMORY_BUDGET, spill_dir=None, hash_cache=None):
+    # Find files with identical content in three narrowing passes, run in parallel:
+    # group by size, then by a hash of the first and last blocks, and fully hash only what still collides.
+    # files is any iterable of (path, size, mtime_ns), as recorded when the folders were scanned, so nothing is
+    # statted again; grouping by size spills to disk past memory_budget bytes. Files with a unique size are never
+    # opened, and empty or unreadable ones are ignored. Hashes are kept in hash_cache by path, size and mtime,
+    # so unchanged files are not read again on the next run.
+    if hash_cache is None:
+        hash_cache = {}
+    duplicate_groups = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        batch = []
+        batch_paths = 0
+        for size, paths in _size_groups(files, memory_budget, spill_dir):
+            batch.append((size, paths))
+            batch_paths += len(paths)
+            if batch_paths >= DEDUP_BATCH_SIZE:
+                duplicate_groups.extend(_hash_size_groups(batch, executor, hash_cache))
+                batch = []
+                batch_paths = 0
+        duplicate_groups.extend(_hash_size_groups(batch, executor, hash_cache))
+
+    # The lexicographically first path is kept as the canonical copy
+    report = []
+    for size, digest, paths in duplicate_groups:
+        paths = sorted(paths)
+        report.append({'canonical': paths[0], 'duplicates': paths[1:], 'size': size, 'sha256': digest})
+    report.sort(key=lambda group: group['canonical'])
+    return report
+
+def duplicate_paths(duplicate_report):
+    # The non-canonical copies, which are left out when folders are split into entries
+    return {path for group in duplicate_report for path in group['duplicates']}
+
+def save_duplicate_report(duplicate_report, file_path):
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(duplicate_report, f, ensure_ascii=False, indent=2)
+
+def load_hash_cache(file_path):
+    if not os.path.exists(file_path):
+        return {}
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable hash cache {file_path}: {e}")
+        return {}
+
+def save_hash_cache(cache, file_path):
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(temp_path, file_path)
@@ -1,13 +1,46 @@
 import os
 import json
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import metrics_utils
+import sharded_output_utils
 from mediaarchive_csvjson_utils import (
+    save_entries,
     save_entries_to_json,
+    save_entries_to_shards,
+    external_sort_entries,
+    media_entry_sort_key,
+    unique_entry_ids,
+    SORT_MEMORY_BUDGET,
     infer_date_from_path,
     infer_date_from_filename,
     find_available_day,
-    process_media_files
+    process_media_files,
+    scan_media_archive,
+    group_media_folder,
+    partition_media_groups,
+    stat_media_files,
+    MEDIA_EXTENSIONS,
+    new_media_index,
+    load_media_index,
+    save_media_index,
+    read_entry_store,
+    write_entry_store_record
+)
+from mediaarchive_capture_date_utils import (
+    CAPTURE_DATE_WORKERS,
+    read_capture_dates,
+    load_capture_date_cache,
+    save_capture_date_cache
+)
+from mediaarchive_dedup_utils import (
+    find_duplicate_files,
+    duplicate_paths,
+    load_hash_cache,
+    save_hash_cache,
+    save_duplicate_report
 )
 
 def clean_title(title, date):
@@ -25,44 +58,59 @@ def clean_title(title, date):
     
     return title.strip()
 
-def process_media_archive(root_dir):
-    entries = []
-    
-    for year_dir in sorted(os.listdir(root_dir)):
-        year_path = os.path.join(root_dir, year_dir)
-        if not os.path.isdir(year_path) or not year_dir.isdigit():
-            continue
-
-        for subdir, _, files in os.walk(year_path):
-            # Skip .thumbnails folders
-            if os.path.basename(subdir) == ".thumbnails":
-                continue
-
-            if not files:
-                continue
-
-            folder_date = infer_date_from_path(subdir, root_dir)
-            folder_name = os.path.basename(subdir)
-            
-            # Group files by date
-            date_groups = {}
-            for file in files:
-                if file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.mp4', '.mov', '.avi')):
-                    file_date = infer_date_from_filename(file, folder_date)
-                    if file_date not in date_groups:
-                        date_groups[file_date] = []
-                    date_groups[file_date].append(os.path.join(subdir, file))
-
-            # Process each date group
-            for date, media_files in date_groups.items():
-                title = folder_name if folder_name != year_dir else "Media"
-                title = clean_title(title, date)
-                entries = process_media_files(entries, date, title, media_files)
-
-    # Sort entries by date
-    entries.sort(key=lambda x: x['date'])
-
-    return entries
+def update_media_archive_index(root_dir, entries_file, index=None, capture_date_cache=None):
+    # Regroup only the folders the scanner reports as changed. Each folder's date groups, with every file's size
+    # and mtime, are kept in entries_file, one line per folder, not in the index: changed folders are written as
+    # soon as they are grouped and every other folder's line is copied over from the previous file, so at most
+    # one folder's files are in memory. Passing a capture date cache turns on dating files from their EXIF/mvhd headers.
+    use_capture_dates = capture_date_cache is not None
+    if index is None:
+        index = new_media_index(root_dir, use_capture_dates)
+    if index.get('capture_dates') != use_capture_dates or not os.path.exists(entries_file):
+        # Cached folders were grouped under the other dating mode, or their entries are gone
+        index['capture_dates'] = use_capture_dates
+        index['directories'] = {}
+    directories = index['directories']
+
+    regrouped = set()
+    with open(f"{entries_file}.tmp", 'w', encoding='utf-8') as store:
+        with ThreadPoolExecutor(max_workers=CAPTURE_DATE_WORKERS) as executor:
+            for folder, files in scan_media_archive(root_dir, index):
+                capture_dates = None
+                if use_capture_dates:
+                    capture_dates = read_capture_dates(
+                        [os.path.join(folder, file) for file in files], capture_date_cache, executor)
+                file_stats = stat_media_files(
+                    [os.path.join(folder, file) for file in files if file.lower().endswith(MEDIA_EXTENSIONS)], executor)
+                write_entry_store_record(store, folder, directories[folder]['mtime_ns'],
+                                         group_media_folder(folder, files, root_dir, capture_dates, file_stats))
+                regrouped.add(folder)
+
+        # A line whose mtime no longer matches the index is for a folder that was relisted or removed
+        for folder, mtime_ns, groups in read_entry_store(entries_file):
+            cached = directories.get(folder)
+            if folder not in regrouped and cached is not None and cached['mtime_ns'] == mtime_ns:
+                write_entry_store_record(store, folder, mtime_ns, groups)
+    os.replace(f"{entries_file}.tmp", entries_file)
+
+    return index
+
+def iter_media_archive_files(entries_file):
+    # Yield (path, size, mtime_ns) for every media file in the entry store
+    for _, _, groups in read_entry_store(entries_file):
+        for group in groups:
+            yield from group['files']
+
+def iter_media_archive_entries(entries_file, duplicates=frozenset()):
+    # Yield the archive's entries unsorted, splitting one folder at a time into entries without the duplicate copies
+    for _, _, groups in read_entry_store(entries_file):
+        yield from partition_media_groups(groups, duplicates)
+
+def process_media_archive(root_dir, entries_file, index=None, capture_date_cache=None, memory_budget=SORT_MEMORY_BUDGET):
+    # Yields the archive's entries sorted by date, through the external sort
+    update_media_archive_index(root_dir, entries_file, index, capture_date_cache)
+    return unique_entry_ids(external_sort_entries(iter_media_archive_entries(entries_file), key=media_entry_sort_key,
+                                                  memory_budget=memory_budget, spill_dir=os.path.dirname(entries_file) or None))
 
 def main():
     root_dir = "source_data/mediaarchive"
@@ -71,24 +119,85 @@ def main():
         print(f"Error: The directory '{root_dir}' does not exist.")
         return
 
-    entries = process_media_archive(root_dir)
+    # The directory index lives alongside the output; delete it to force a full rescan
+    index_file = "exported_data/mediaarchive_index.json"
+    os.makedirs(os.path.dirname(index_file), exist_ok=True)
+    index = load_media_index(index_file, root_dir, capture_dates=True)
+    # Each folder's entries, kept on disk so they are streamed rather than held in memory
+    entries_file = "exported_data/mediaarchive_entries.jsonl"
+
+    # Capture dates are cached by path, size and mtime so headers are only read once per file
+    capture_date_cache_file = "exported_data/mediaarchive_capture_dates.json"
+    capture_date_cache = load_capture_date_cache(capture_date_cache_file)
 
-    # Generate output filename with timestamp in the format YYYY-MM-DD-HHMMam/pm
+    scan_started = time.perf_counter()
+    with metrics_utils.stage_timer('scan_archive'):
+        update_media_archive_index(root_dir, entries_file, index, capture_date_cache)
+    print(f"Scanned media archive in {time.perf_counter() - scan_started:.2f} seconds.")
+
+    save_media_index(index, index_file)
+    save_capture_date_cache(capture_date_cache, capture_date_cache_file)
+
+    # Generate output filenames with timestamp in the format YYYY-MM-DD-HHMMam/pm
     timestamp = datetime.now().strftime("%Y-%m-%d-%I%M%p").lower()
     output_file = f"exported_data/MediaArchive_output_{timestamp}.json"
+    csv_output_file = f"exported_data/MediaArchive_output_{timestamp}.csv"
+    duplicates_file = f"exported_data/MediaArchive_duplicates_{timestamp}.json"
+    # JOURNAL_OUTPUT_SHARDS=plain or gzip writes per-year shards with a manifest instead of the single JSON and CSV files
+    shard_mode = sharded_output_utils.sharded_output_mode()
+    shard_dir = f"exported_data/MediaArchive_output_{timestamp}"
 
     # Ensure the output directory exists
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
-    # Save entries to JSON file
-    save_entries_to_json(entries, output_file)
-
-    print(f"Processed {len(entries)} entries.")
-    print(f"Output saved to: {output_file}")
+    # Both the duplicate search and the sort hold at most about this much in memory, spilling the rest to disk
+    memory_budget = int(os.environ.get('MEDIAARCHIVE_SORT_MEMORY_MB', '64')) * 1024 * 1024
+    spill_dir = os.path.dirname(output_file)
+
+    # Keep one canonical copy of files that were copied into several folders. Sizes come from the entry store and
+    # hashes are cached by path, size and mtime, so a re-export reads no file it has hashed before.
+    hash_cache_file = "exported_data/mediaarchive_hashes.json"
+    hash_cache = load_hash_cache(hash_cache_file)
+    with metrics_utils.stage_timer('find_duplicates'):
+        duplicate_report = find_duplicate_files(iter_media_archive_files(entries_file), memory_budget=memory_budget,
+                                                spill_dir=spill_dir, hash_cache=hash_cache)
+    save_hash_cache(hash_cache, hash_cache_file)
+    save_duplicate_report(duplicate_report, duplicates_file)
+    duplicate_count = sum(len(group['duplicates']) for group in duplicate_report)
+    print(f"Removed {duplicate_count} duplicate files in {len(duplicate_report)} groups. Report saved to: {duplicates_file}")
+
+    # Stream entries from the entry store, split into parts after the duplicates are left out, through a
+    # bounded-memory external sort straight into the JSON and CSV files, keeping the first few aside to print.
+    # Ids are made unique after the sort, since the Trello sync keys its cards and progress by them.
+    entries = iter_media_archive_entries(entries_file, duplicate_paths(duplicate_report))
+    sorted_entries = unique_entry_ids(external_sort_entries(entries, key=media_entry_sort_key, memory_budget=memory_budget, spill_dir=spill_dir))
+
+    sample_entries = []
+    def keep_sample(entries):
+        for entry in entries:
+            if len(sample_entries) < 5:
+                sample_entries.append(entry)
+            yield entry
+
+    with metrics_utils.stage_timer('sort_and_save'):
+        if shard_mode:
+            manifest = save_entries_to_shards(keep_sample(sorted_entries), shard_dir, compress=shard_mode == 'gzip')
+            entry_count = manifest['count']
+        else:
+            entry_count = save_entries(keep_sample(sorted_entries), json_path=output_file, csv_path=csv_output_file)
+    metrics_utils.increment('entries_saved', entry_count)
+
+    print(f"Processed {entry_count} entries.")
+    if shard_mode:
+        print(f"Output saved to {len(manifest['shards'])} shards in: {shard_dir}")
+    else:
+        print(f"Output saved to: {output_file} and {csv_output_file}")
 
     # Print the first few entries to console for verification
     print("\nSample entries:")
-    print(json.dumps(entries[:5], indent=2))
+    print(json.dumps(sample_entries, indent=2))
+
+    metrics_utils.dump_metrics('mediaarchive_to_csvjson')
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
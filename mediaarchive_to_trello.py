@@ -0,0 +1,160 @@
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+import mediaarchive_trello_utils
+import metrics_utils
+import trello_board_utils
+import trello_client_utils
+import trello_mirror_utils
+
+# Per-entry progress lives here so an interrupted sync resumes where it stopped
+SYNC_STATE_FILE = 'exported_data/mediaarchive_trello_state.json'
+
+# Save the state after this many uploads within an entry, so a crash loses little work
+STATE_SAVE_EVERY = 10
+
+def card_name(entry):
+    # Titles repeat when folders share a name, so the card carries the entry's unique id as well
+    return f"{entry['title']} [{entry['id']}]"
+
+def find_entry_card(cards, entry):
+    # Returns the id of the entry's card, or None. Cards synced before names carried the id are named by title
+    # alone; one of those is the entry's card only if its description names the entry.
+    card = cards.get(card_name(entry))
+    if card is None:
+        card = cards.get(entry['title'])
+        if card is None or f"Entry ID: {entry['id']}" not in card['desc'].splitlines():
+            return None
+    return card['id']
+
+def format_card_description(entry, file_count):
+    description = f"Date: {entry['date']}\nSource: media archive\nEntry ID: {entry['id']}\nFiles: {file_count}"
+    if entry.get('body'):
+        description = f"{entry['body']}\n\n{description}"
+    return description
+
+# Function to sync one media entry: find or create its card, then upload its missing files concurrently.
+# Returns (uploaded, skipped, failed) file counts.
+def sync_entry(entry, entry_date, entry_state, mirror, executor, save_state):
+    board_name, base_date, total_units = trello_board_utils.board_for_date(entry_date)
+    board_id = mirror.board_id(board_name)
+    list_name = trello_board_utils.list_name_for_date(entry_date)
+    list_id = mirror.list_id(board_id, list_name, trello_board_utils.calculate_pos(entry_date, base_date, total_units))
+
+    files = entry['images'] + entry['videos']
+    if not entry_state.get('card_id'):
+        entry_state['card_id'] = find_entry_card(mirror.cards(list_id), entry)
+        if entry_state['card_id'] is None:
+            entry_state['card_id'] = mirror.create_card(list_id, card_name(entry), format_card_description(entry, len(files)))
+        # Record the card before uploading so a crash does not create a second card for the entry
+        save_state()
+    card_id = entry_state['card_id']
+
+    uploaded = set(entry_state.setdefault('uploaded', []))
+    # A card that existed before this run may already hold files uploaded without a state file; the mirror
+    # reads its attachments once, and knows a card it just created has none
+    attached = mirror.attachments(card_id)
+
+    to_upload = []
+    skipped = 0
+    for file_path in files:
+        if file_path in uploaded:
+            skipped += 1
+            continue
+        if not os.path.exists(file_path):
+            print(f"Error: File not found - {file_path}")
+            continue
+        size = os.path.getsize(file_path)
+        if (os.path.basename(file_path), size) in attached:
+            entry_state['uploaded'].append(file_path)
+            skipped += 1
+            continue
+        if size > mediaarchive_trello_utils.TRELLO_MAX_ATTACHMENT_BYTES:
+            print(f"Skipping {file_path}: {size:,} bytes is over Trello's attachment limit")
+            continue
+        to_upload.append(file_path)
+
+    futures = {executor.submit(mirror.upload_attachment, card_id, file_path): file_path for file_path in to_upload}
+    done = failed = 0
+    for future in as_completed(futures):
+        file_path = futures[future]
+        try:
+            future.result()
+        except (requests.RequestException, OSError) as e:
+            print(f"Upload failed for {file_path}: {e}")
+            failed += 1
+            continue
+        entry_state['uploaded'].append(file_path)
+        done += 1
+        if done % STATE_SAVE_EVERY == 0:
+            save_state()
+
+    entry_state['done'] = failed == 0
+    save_state()
+    return done, skipped, failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Push media archive entries to the yearly Trello boards, uploading each entry's files concurrently")
+    parser.add_argument('--input', help="Media archive export (JSON file or shard directory; default: the newest in exported_data)")
+    parser.add_argument('--workers', type=int, default=mediaarchive_trello_utils.UPLOAD_WORKERS, help="Concurrent uploads")
+    parser.add_argument('--start-date', help="Skip entries before this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    input_path = args.input or mediaarchive_trello_utils.find_latest_media_export()
+    if not input_path:
+        print("Error: No media archive export found. Run mediaarchive_to_csvjson.py first.")
+        return
+
+    api_keys = trello_client_utils.load_api_keys('api_keys_and_tokens.txt')
+
+    with metrics_utils.stage_timer('load_entries'):
+        entries = mediaarchive_trello_utils.load_media_entries(input_path)
+    if args.start_date:
+        entries = [entry for entry in entries if entry['date'] >= args.start_date]
+    print(f"Loaded {len(entries)} entries from {input_path}")
+
+    state = mediaarchive_trello_utils.load_sync_state(SYNC_STATE_FILE)
+    save_state = lambda: mediaarchive_trello_utils.save_sync_state(state, SYNC_STATE_FILE)
+    # Board, list and card ids are fetched once and reused, so each entry costs no lookups once its day list is known
+    mirror = trello_mirror_utils.TrelloMirror(trello_client_utils.make_request, trello_client_utils.TRELLO_API_BASE_URL,
+                                              api_keys['trello_api_key'], api_keys['trello_token'])
+
+    totals = {'entries': 0, 'complete': 0, 'invalid': 0, 'failed_entries': 0, 'uploaded': 0, 'skipped': 0, 'failed': 0}
+    progress = metrics_utils.start_progress('mediaarchive_to_trello', len(entries))
+    with metrics_utils.stage_timer('sync_entries'), ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for entry in entries:
+            metrics_utils.update_progress(progress)
+            entry_state = state['entries'].setdefault(entry['id'], {})
+            if entry_state.get('done'):
+                totals['complete'] += 1
+                continue
+            entry_date = mediaarchive_trello_utils.parse_entry_date(entry['date'])
+            if entry_date is None:
+                print(f"Skipping {entry['id']}: no usable date in {entry['date']!r}")
+                totals['invalid'] += 1
+                continue
+            try:
+                uploaded, skipped, failed = sync_entry(entry, entry_date, entry_state, mirror, executor, save_state)
+            except requests.RequestException as e:
+                # The entry stays incomplete in the state, so the next run tries it again
+                print(f"Sync failed for {entry['id']}: {e}")
+                totals['failed_entries'] += 1
+                continue
+            totals['entries'] += 1
+            totals['uploaded'] += uploaded
+            totals['skipped'] += skipped
+            totals['failed'] += failed
+            print(f"{entry['date']} {entry['title']}: {uploaded} uploaded, {skipped} already attached, {failed} failed")
+    metrics_utils.update_progress(progress, done=0, force=True)
+
+    print(f"Synced {totals['entries']} entries ({totals['complete']} already complete): {totals['uploaded']} files uploaded, "
+          f"{totals['skipped']} already attached, {totals['failed']} failed")
+    if totals['invalid'] or totals['failed_entries']:
+        print(f"Skipped {totals['invalid']} entries without a usable date; {totals['failed_entries']} entries could not be synced")
+    if totals['failed'] or totals['failed_entries']:
+        print("Run again to retry the failed uploads.")
+    metrics_utils.dump_metrics('mediaarchive_to_trello')
+
+if __name__ == "__main__":
+    main()
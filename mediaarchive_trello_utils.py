@@ -0,0 +1,50 @@
+import glob
+import json
+import os
+from datetime import datetime
+import sharded_output_utils
+
+# Files uploaded at once per card; uploads are mostly waiting on the network, so threads overlap them.
+# They all go through the one Trello client, sharing its rate budget and connection pool.
+UPLOAD_WORKERS = 8
+
+# Trello rejects attachments above this size (250 MB on paid workspaces)
+TRELLO_MAX_ATTACHMENT_BYTES = 250 * 1024 * 1024
+
+# Function to find the newest media archive export, either a single JSON file or a shard directory
+def find_latest_media_export(export_dir='exported_data'):
+    candidates = glob.glob(os.path.join(export_dir, 'MediaArchive_output_*.json'))
+    candidates += [os.path.dirname(path) for path in glob.glob(os.path.join(export_dir, 'MediaArchive_output_*', sharded_output_utils.MANIFEST_NAME))]
+    return max(candidates, key=os.path.getmtime, default=None)
+
+# Function to load media archive entries from a JSON export or a shard directory
+def load_media_entries(path):
+    if os.path.isdir(path):
+        return list(sharded_output_utils.iter_sharded_entries(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+# Function to read an entry's date, falling back to the first of its month or year when the full date is not
+# valid (older exports dated folders like "2005-Christmas-Party" as is); None when not even the year is usable
+def parse_entry_date(entry_date):
+    for length, date_format in ((10, '%Y-%m-%d'), (7, '%Y-%m'), (4, '%Y')):
+        try:
+            return datetime.strptime(entry_date[:length], date_format)
+        except ValueError:
+            continue
+    return None
+
+# Function to load the sync state: per entry id, its card id, uploaded files and whether it is complete
+def load_sync_state(file_path):
+    if not os.path.exists(file_path):
+        return {'entries': {}}
+    with open(file_path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    state.setdefault('entries', {})
+    return state
+
+def save_sync_state(state, file_path):
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    with open(f"{file_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(f"{file_path}.tmp", file_path)
@@ -0,0 +1,280 @@
+import cProfile
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlsplit
+
+METRICS_DIR = 'exported_data/metrics'
+PROFILE_DIR = 'exported_data/profiles'
+PROGRESS_INTERVAL = 30  # seconds between progress lines
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Trello ids are 24 hex digits; they are collapsed so requests group by endpoint
+TRELLO_ID_PATTERN = re.compile(r'/[0-9a-fA-F]{24}(?=/|$)')
+
+_lock = threading.Lock()
+
+def _new_metrics():
+    return {
+        'started_at': time.time(),
+        'stages': {},
+        'requests': {},
+        'rate_limit': {'waits': 0, 'wait_seconds': 0.0},
+        'retries': 0,
+        'bytes_uploaded': 0,
+        'sleeps': {},
+        'counters': {}
+    }
+
+_metrics = _new_metrics()
+
+def reset_metrics():
+    global _metrics
+    with _lock:
+        _metrics = _new_metrics()
+
+def endpoint_label(method, url):
+    path = TRELLO_ID_PATTERN.sub('/{id}', urlsplit(url).path.rstrip('/'))
+    return f"{method.upper()} {path}"
+
+def retry_count(response):
+    # urllib3 keeps the Retry object that produced the response; its history has one item per retry
+    retries = getattr(getattr(response, 'raw', None), 'retries', None)
+    return len(getattr(retries, 'history', ()) or ())
+
+def upload_size(files):
+    # Size of the file objects passed to requests as files={...}
+    total = 0
+    for value in (files or {}).values():
+        file_obj = value[1] if isinstance(value, tuple) else value
+        try:
+            total += os.fstat(file_obj.fileno()).st_size
+        except (AttributeError, OSError, ValueError):
+            continue
+    return total
+
+def record_request(method, url, seconds, status=None, retries=0, bytes_uploaded=0):
+    # status is None when the request failed without a response
+    label = endpoint_label(method, url)
+    with _lock:
+        endpoint = _metrics['requests'].get(label)
+        if endpoint is None:
+            endpoint = _metrics['requests'][label] = {
+                'count': 0, 'errors': 0, 'seconds': 0.0, 'statuses': {}, 'buckets': [0] * (len(LATENCY_BUCKETS) + 1)}
+        endpoint['count'] += 1
+        endpoint['seconds'] += seconds
+        status_key = str(status) if status is not None else 'error'
+        endpoint['statuses'][status_key] = endpoint['statuses'].get(status_key, 0) + 1
+        if status is None or status >= 400:
+            endpoint['errors'] += 1
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+        endpoint['buckets'][bucket] += 1
+        _metrics['retries'] += retries
+        _metrics['bytes_uploaded'] += bytes_uploaded
+
+def record_rate_limit_wait(seconds):
+    with _lock:
+        _metrics['rate_limit']['waits'] += 1
+        _metrics['rate_limit']['wait_seconds'] += seconds
+
+def increment(name, amount=1):
+    with _lock:
+        _metrics['counters'][name] = _metrics['counters'].get(name, 0) + amount
+
+def timed_sleep(seconds, reason='sleep'):
+    # time.sleep that is accounted for in the metrics under its reason
+    time.sleep(seconds)
+    with _lock:
+        _metrics['sleeps'][reason] = _metrics['sleeps'].get(reason, 0.0) + seconds
+
+def _profile_modes(name):
+    # JOURNAL_PROFILE=cprofile, tracemalloc or both (comma separated) turns profiling on;
+    # JOURNAL_PROFILE_STAGES limits it to the named stages
+    modes = {mode.strip() for mode in os.environ.get('JOURNAL_PROFILE', '').lower().split(',') if mode.strip()}
+    if 'all' in modes:
+        modes = {'cprofile', 'tracemalloc'}
+    stages = {stage.strip() for stage in os.environ.get('JOURNAL_PROFILE_STAGES', '').split(',') if stage.strip()}
+    if stages and name not in stages:
+        return set()
+    return modes
+
+@contextmanager
+def profile_stage(name, modes=None):
+    # Wrap a block in cProfile and/or tracemalloc, saving the profile and top allocations under exported_data/profiles
+    modes = _profile_modes(name) if modes is None else set(modes)
+    if not modes:
+        yield
+        return
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base_path = os.path.join(PROFILE_DIR, f"{name}_{datetime.now().strftime('%Y%m%d%H%M%S')}")
+    profiler = cProfile.Profile() if 'cprofile' in modes else None
+    started_tracemalloc = 'tracemalloc' in modes and not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start(25)
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(f"{base_path}.prof")
+            print(f"[{name}] cProfile stats saved to {base_path}.prof")
+        if 'tracemalloc' in modes and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            with open(f"{base_path}.tracemalloc.txt", 'w', encoding='utf-8') as f:
+                f.write(f"current {current / 1024 / 1024:.1f} MB, peak {peak / 1024 / 1024:.1f} MB\n\n")
+                for stat in snapshot.statistics('lineno')[:50]:
+                    f.write(f"{stat}\n")
+            if started_tracemalloc:
+                tracemalloc.stop()
+            print(f"[{name}] tracemalloc top allocations saved to {base_path}.tracemalloc.txt")
+
+def start_stage(name):
+    # Start timing a named stage (and profiling it, if enabled); pair with finish_stage.
+    # Useful around loops at script top level, where a with block would re-indent the whole loop.
+    profiler = profile_stage(name)
+    profiler.__enter__()
+    return {'name': name, 'wall_started': time.perf_counter(), 'cpu_started': time.process_time(), 'profiler': profiler}
+
+def finish_stage(stage):
+    wall = time.perf_counter() - stage['wall_started']
+    cpu = time.process_time() - stage['cpu_started']
+    stage['profiler'].__exit__(None, None, None)
+    with _lock:
+        totals = _metrics['stages'].setdefault(stage['name'], {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+        totals['calls'] += 1
+        totals['wall_seconds'] += wall
+        totals['cpu_seconds'] += cpu
+
+@contextmanager
+def stage_timer(name):
+    # Accumulate wall and CPU time for a named stage; also applies the opt-in profiler hook
+    stage = start_stage(name)
+    try:
+        yield
+    finally:
+        finish_stage(stage)
+
+def snapshot():
+    with _lock:
+        data = json.loads(json.dumps(_metrics))
+    data['elapsed_seconds'] = time.time() - data['started_at']
+    data['latency_buckets'] = list(LATENCY_BUCKETS)
+    return data
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+def start_progress(label, total, interval=PROGRESS_INTERVAL):
+    return {'label': label, 'total': total, 'done': 0, 'interval': interval,
+            'started': time.perf_counter(), 'last_report': time.perf_counter()}
+
+def update_progress(progress, done=1, force=False):
+    # Count finished items and print a progress line with rate, ETA and request totals at most once per interval
+    progress['done'] += done
+    now = time.perf_counter()
+    if not force and now - progress['last_report'] < progress['interval']:
+        return
+    progress['last_report'] = now
+    elapsed = now - progress['started']
+    rate = progress['done'] / elapsed if elapsed else 0
+    remaining = progress['total'] - progress['done']
+    eta = _format_duration(remaining / rate) if rate and remaining > 0 else '-'
+    percent = progress['done'] / progress['total'] * 100 if progress['total'] else 100
+    with _lock:
+        requests = sum(endpoint['count'] for endpoint in _metrics['requests'].values())
+        rate_limit_wait = _metrics['rate_limit']['wait_seconds']
+        sleeps = sum(_metrics['sleeps'].values())
+    print(f"[{progress['label']}] {progress['done']:,}/{progress['total']:,} ({percent:.1f}%) {rate:.2f}/s "
+          f"elapsed {_format_duration(elapsed)} ETA {eta} | {requests:,} requests, "
+          f"rate-limit wait {_format_duration(rate_limit_wait)}, sleeps {_format_duration(sleeps)}")
+
+def _prometheus_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+def format_prometheus(data):
+    # Render a snapshot in the Prometheus text exposition format
+    lines = [
+        '# TYPE journal_stage_wall_seconds_total counter',
+        '# TYPE journal_stage_cpu_seconds_total counter',
+        '# TYPE journal_stage_calls_total counter'
+    ]
+    for name, stage in sorted(data['stages'].items()):
+        label = f'stage="{_prometheus_label(name)}"'
+        lines.append(f"journal_stage_wall_seconds_total{{{label}}} {stage['wall_seconds']:.6f}")
+        lines.append(f"journal_stage_cpu_seconds_total{{{label}}} {stage['cpu_seconds']:.6f}")
+        lines.append(f"journal_stage_calls_total{{{label}}} {stage['calls']}")
+
+    lines.append('# TYPE journal_requests_total counter')
+    lines.append('# TYPE journal_request_errors_total counter')
+    lines.append('# TYPE journal_request_duration_seconds histogram')
+    for name, endpoint in sorted(data['requests'].items()):
+        method, _, path = name.partition(' ')
+        label = f'method="{method}",endpoint="{_prometheus_label(path)}"'
+        for status, count in sorted(endpoint['statuses'].items()):
+            lines.append(f"journal_requests_total{{{label},status=\"{status}\"}} {count}")
+        lines.append(f"journal_request_errors_total{{{label}}} {endpoint['errors']}")
+        cumulative = 0
+        for bound, count in zip(list(data['latency_buckets']) + ['+Inf'], endpoint['buckets']):
+            cumulative += count
+            lines.append(f"journal_request_duration_seconds_bucket{{{label},le=\"{bound}\"}} {cumulative}")
+        lines.append(f"journal_request_duration_seconds_sum{{{label}}} {endpoint['seconds']:.6f}")
+        lines.append(f"journal_request_duration_seconds_count{{{label}}} {endpoint['count']}")
+
+    lines.append('# TYPE journal_rate_limit_wait_seconds_total counter')
+    lines.append(f"journal_rate_limit_wait_seconds_total {data['rate_limit']['wait_seconds']:.6f}")
+    lines.append('# TYPE journal_rate_limit_waits_total counter')
+    lines.append(f"journal_rate_limit_waits_total {data['rate_limit']['waits']}")
+    lines.append('# TYPE journal_request_retries_total counter')
+    lines.append(f"journal_request_retries_total {data['retries']}")
+    lines.append('# TYPE journal_bytes_uploaded_total counter')
+    lines.append(f"journal_bytes_uploaded_total {data['bytes_uploaded']}")
+    lines.append('# TYPE journal_sleep_seconds_total counter')
+    for reason, seconds in sorted(data['sleeps'].items()):
+        lines.append(f"journal_sleep_seconds_total{{reason=\"{_prometheus_label(reason)}\"}} {seconds:.6f}")
+    lines.append('# TYPE journal_events_total counter')
+    for name, value in sorted(data['counters'].items()):
+        lines.append(f"journal_events_total{{name=\"{_prometheus_label(name)}\"}} {value}")
+    lines.append('# TYPE journal_elapsed_seconds gauge')
+    lines.append(f"journal_elapsed_seconds {data['elapsed_seconds']:.3f}")
+    return '\n'.join(lines) + '\n'
+
+def print_summary(data):
+    print(f"Elapsed {_format_duration(data['elapsed_seconds'])}")
+    for name, stage in sorted(data['stages'].items(), key=lambda item: -item[1]['wall_seconds']):
+        print(f"  stage {name}: {stage['wall_seconds']:.2f}s wall, {stage['cpu_seconds']:.2f}s CPU, {stage['calls']} calls")
+    for name, endpoint in sorted(data['requests'].items(), key=lambda item: -item[1]['seconds']):
+        average = endpoint['seconds'] / endpoint['count'] * 1000 if endpoint['count'] else 0
+        print(f"  {name}: {endpoint['count']:,} requests, {endpoint['errors']} errors, {endpoint['seconds']:.1f}s total, {average:.0f} ms avg")
+    print(f"  rate-limit wait {data['rate_limit']['wait_seconds']:.1f}s, {data['retries']} retries, "
+          f"{data['bytes_uploaded']:,} bytes uploaded, sleeps {sum(data['sleeps'].values()):.1f}s")
+
+def dump_metrics(name, output_dir=METRICS_DIR):
+    # Write the collected metrics as <name>_<timestamp>.json and .prom, print a summary and return the JSON path
+    data = snapshot()
+    os.makedirs(output_dir, exist_ok=True)
+    base_path = os.path.join(output_dir, f"{name}_{datetime.now().strftime('%Y%m%d%H%M%S')}")
+    with open(f"{base_path}.json", 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    with open(f"{base_path}.prom", 'w', encoding='utf-8') as f:
+        f.write(format_prometheus(data))
+    print_summary(data)
+    print(f"Metrics saved to {base_path}.json and {base_path}.prom")
+    return f"{base_path}.json"
@@ -1,14 +1,21 @@
 import mysql.connector
-import json
 import os
-import csv
 from datetime import datetime
+import metrics_utils
+import serialization_utils
 
 # Database credentials
 USER = "root"
 PASSWORD = "password"
 DATABASE = "mythredz"
-OUTPUT_DIR = "/Users/joereger/Dropbox (Personal)/JoeregerJournalDataTool/mysql_data_exported/mythredz"
+# Relative to the project root, where the export and sync scripts read it from
+OUTPUT_DIR = "mysql_data_exported/mythredz"
+
+# Escapes applied to string values in the CSV export, done in one str.translate pass per value
+CSV_ESCAPES = str.maketrans({'\n': '\\n', '\r': '\\r', '"': '""'})
+
+# Set on any error, so the script exits non-zero and the pipeline runner sees a failed dump
+failed = False
 
 try:
     # Connect to the database
@@ -28,38 +35,35 @@ try:
         raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
 
     def escape_special_characters(row):
-        for key, value in row.items():
-            if isinstance(value, str):
-                row[key] = value.replace('\n', '\\n').replace('\r', '\\r').replace('"', '""')
-        return row
+        return {key: value.translate(CSV_ESCAPES) if isinstance(value, str) else value for key, value in row.items()}
 
     # Export each table to JSON and CSV
     for table in tables:
-        cursor.execute(f"SELECT * FROM {table}")
-        rows = cursor.fetchall()
+        with metrics_utils.stage_timer(f'query_{table}'):
+            cursor.execute(f"SELECT * FROM {table}")
+            rows = cursor.fetchall()
+        metrics_utils.increment('rows_exported', len(rows))
 
         try:
             # Export to JSON
             json_output_file = os.path.join(OUTPUT_DIR, f"{table}.json")
-            with open(json_output_file, 'w') as json_outfile:
-                json.dump(rows, json_outfile, indent=4, default=convert_datetime)
+            serialization_utils.save_json(rows, json_output_file, indent=4, default=convert_datetime)
 
             # Export to CSV
             csv_output_file = os.path.join(OUTPUT_DIR, f"{table}.csv")
             if rows:
-                with open(csv_output_file, 'w', newline='', encoding='utf-8') as csv_outfile:
-                    writer = csv.DictWriter(csv_outfile, fieldnames=rows[0].keys(), quoting=csv.QUOTE_ALL)
-                    writer.writeheader()
-                    for row in rows:
-                        escaped_row = escape_special_characters(row)
-                        writer.writerow(escaped_row)
+                serialization_utils.save_csv(rows, csv_output_file, list(rows[0].keys()), transform=escape_special_characters)
+            metrics_utils.increment('tables_exported')
         except IOError as e:
             print(f"Error writing file for table {table}: {e}")
+            failed = True
 
 except mysql.connector.Error as err:
     print(f"Database error: {err}")
+    failed = True
 except Exception as e:
     print(f"An error occurred: {e}")
+    failed = True
 finally:
     # Close the cursor and connection
     if 'cursor' in locals():
@@ -67,4 +71,9 @@ finally:
     if 'conn' in locals():
         conn.close()
 
-print("Export completed.")
\ No newline at end of file
+print("Export failed." if failed else "Export completed.")
+
+metrics_utils.dump_metrics('mysql_dump')
+
+if failed:
+    raise SystemExit(1)
\ No newline at end of file
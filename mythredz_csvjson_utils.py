@@ -1,7 +1,12 @@
-import csv
 import json
 import re
 from datetime import datetime
+import incremental_export_utils
+import serialization_utils
+import sharded_output_utils
+import sqlite_export_utils
+
+ENTRY_FIELDNAMES = ['date', 'category', 'title', 'body', 'datablogging.eventid', 'datablogging.logid', 'images', 'source', 'thred.thredid', 'thred.name', 'post.postid']
 
 def load_json(file_path):
     with open(file_path, 'r') as file:
@@ -14,22 +19,34 @@ def clean_description(desc):
     return desc.replace("\r\n", " ").replace("\n", " ")
 
 def save_entries_to_csv(entries, file_path):
-    fieldnames = ['date', 'category', 'title', 'body', 'datablogging.eventid', 'datablogging.logid', 'images', 'source', 'thred.thredid', 'thred.name', 'post.postid']
-    with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
-        writer.writeheader()
-        for entry in entries:
-            writer.writerow(entry)
+    serialization_utils.save_csv(entries, file_path, ENTRY_FIELDNAMES)
 
 def save_entries_to_json(entries, file_path):
-    with open(file_path, 'w', encoding='utf-8') as jsonfile:
-        json.dump(entries, jsonfile, indent=4, ensure_ascii=False)
+    serialization_utils.save_json(entries, file_path, indent=4, ensure_ascii=False, encoding='utf-8')
+
+def save_entries_to_sqlite(entries, file_path):
+    return sqlite_export_utils.save_entries_to_sqlite(entries, file_path)
+
+def upsert_entries_to_sqlite(entries, file_path):
+    return sqlite_export_utils.upsert_entries_to_sqlite(entries, file_path)
+
+def merge_entries_incrementally(entries, json_path, csv_path, index_path):
+    return incremental_export_utils.merge_entries_incrementally(entries, json_path, csv_path, index_path, ENTRY_FIELDNAMES)
+
+def save_entries_to_shards(entries, output_dir, prefix, compress=False):
+    return sharded_output_utils.save_sharded_entries(entries, output_dir, prefix, csv_fieldnames=ENTRY_FIELDNAMES, compress=compress)
 
 def process_mythredz_posts(posts, threds):
     processed_posts = []
     
+    # First thred per id owned by user 1, looked up by id instead of scanning every thred for every post
+    threds_by_id = {}
+    for t in threds:
+        if t['userid'] == 1:
+            threds_by_id.setdefault(t['thredid'], t)
+
     for post in posts:
-        thred = next((t for t in threds if t['thredid'] == post['thredid'] and t['userid'] == 1), None)
+        thred = threds_by_id.get(post['thredid'])
         if not thred:
             continue
 
@@ -0,0 +1,131 @@
+import hashlib
+import json
+from datetime import datetime
+import metrics_utils
+import mythredz_trello_utils
+from export_tables_utils import ExportTables
+from trello_board_utils import board_for_date, calculate_pos
+
+# Posts before this date are not pushed to Trello
+START_DATE = datetime(2008, 6, 14, 0, 0)
+
+EXPORT_DIR = 'mysql_data_exported/mythredz'
+
+# Only the first this many posts (oldest first) are pushed
+POST_LIMIT = 50000
+
+class MythredzData(ExportTables):
+    # The mythredz tables and their lookups: user 1's threds, their names, and their posts oldest first
+    TABLES = {'threds': ('thred.json', 'thred'), 'posts': ('post.json', 'post')}
+
+    def __init__(self, export_dir=EXPORT_DIR):
+        super().__init__(export_dir)
+
+    def _build_indexes(self):
+        with metrics_utils.stage_timer('build_indexes'):
+            threds_dict = {thred['thredid']: thred for thred in self.tables['threds'] if thred['userid'] == 1}
+            posts = [post for post in self.tables['posts'] if post['thredid'] in threds_dict]
+            posts.sort(key=lambda x: datetime.fromisoformat(x['date']))
+            self.indexes = {'threds': threds_dict, 'thred_names': {thredid: thred['name'] for thredid, thred in threds_dict.items()},
+                            'posts': posts}
+
+    @property
+    def posts(self):
+        # Posts of user 1's threds, oldest first
+        self._ensure_loaded()
+        return self.indexes['posts']
+
+    @property
+    def thred_names(self):
+        self._ensure_loaded()
+        return self.indexes['thred_names']
+
+# Function to list what gets a card of its own, oldest first, as (key, posts): each post, or in
+# consolidated mode each day (or day and thred) with its posts
+def sync_units(data, mode, start_date=START_DATE):
+    posts = [post for post in data.posts[:POST_LIMIT] if datetime.fromisoformat(post['date']) >= start_date]
+    if mode == 'off':
+        return [(f"post:{post['postid']}", [post]) for post in posts]
+    return [(f"{mode}:" + ':'.join(map(str, key)), group) for key, group in mythredz_trello_utils.group_posts(posts, mode).items()]
+
+# Function to work out the board, list, position and cards for a unit. Cards are (name, description, post ids);
+# post ids are given for consolidated cards, whose updates are decided by the set of post ids they list.
+def plan_unit_cards(posts, data, mode):
+    post_date = datetime.fromisoformat(posts[0]['date'])
+    board_name, base_date, total_units = board_for_date(post_date)
+    if mode == 'off':
+        post = posts[0]
+        card_title = f"{data.thred_names[post['thredid']]}: {post['contents']}"
+        card_description = f"Date: {post['date']}\nSource: mythredz app\nThred ID: {post['thredid']}\nPost ID: {post['postid']}"
+        cards = [(card_title, card_description, None)]
+    else:
+        cards = mythredz_trello_utils.format_consolidated_cards(posts, posts[0]['date'][:10], data.thred_names,
+                                                                per_thred=(mode == 'thred'))
+    return {
+        'board_name': board_name,
+        'list_name': post_date.strftime('%a %b').upper() + f" {post_date.day}",
+        'pos': calculate_pos(post_date, base_date, total_units),
+        'cards': cards
+    }
+
+# Function to fingerprint a unit's card plan, so a resident sync can tell which units changed
+def plan_fingerprint(plan):
+    content = json.dumps([plan['board_name'], plan['list_name'], [(name, desc) for name, desc, _ in plan['cards']]])
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+
+# Function to find a consolidated unit's leftover cards: ones no longer planned that are a "(part N)" of the
+# unit's first card, or that hold any of the unit's posts (for example a card named before a thred was renamed,
+# or the per-post cards made before consolidation was turned on)
+def stale_consolidated_cards(plan, existing_cards):
+    planned_names = {name for name, _, _ in plan['cards']}
+    part_prefix = f"{plan['cards'][0][0]} (part "
+    unit_post_ids = {int(post_id) for _, _, post_ids in plan['cards'] for post_id in post_ids}
+    stale = []
+    for name, card in existing_cards.items():
+        card_post_ids = mythredz_trello_utils.card_post_ids(card['desc'])
+        if name in planned_names or card_post_ids is None:
+            continue
+        if name.startswith(part_prefix) or card_post_ids & unit_post_ids:
+            stale.append(name)
+    return stale
+
+# Function to push one unit to Trello through the mirror. Returns {'created', 'updated', 'unchanged', 'archived'}
+# card counts; a consolidated unit that shrank or was split differently has its leftover cards archived.
+def sync_unit(posts, data, mirror, mode, plan=None):
+    plan = plan or plan_unit_cards(posts, data, mode)
+    counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'archived': 0}
+
+    board_id = mirror.board_id(plan['board_name'])
+    list_id = mirror.list_id(board_id, plan['list_name'], plan['pos'])
+    existing_cards = mirror.cards(list_id)
+
+    for card_name, card_description, post_ids in plan['cards']:
+        existing_card = existing_cards.get(card_name)
+        if existing_card is None:
+            card_id = mirror.create_card(list_id, card_name, card_description)
+            counts['created'] += 1
+            action = "Created new card"
+        elif (existing_card['desc'] != card_description if post_ids is None else
+              mythredz_trello_utils.parse_post_ids(existing_card['desc']) != {int(post_id) for post_id in post_ids}):
+            card_id = mirror.update_card(list_id, card_name, card_description)
+            counts['updated'] += 1
+            action = "Updated existing card"
+        else:
+            card_id = existing_card['id']
+            counts['unchanged'] += 1
+            action = "Card already exists and is up to date"
+        if mode == 'off':
+            print(f"{action}: {card_name} (ID: {card_id})")
+            print(f"Board: {plan['board_name']}")
+            print(f"List: {plan['list_name']}")
+            print(f"List Position: {plan['pos']}")
+            print(f"Card Description:")
+            print(card_description)
+            print("=" * 40)
+    if mode != 'off':
+        for card_name in stale_consolidated_cards(plan, existing_cards):
+            card_id = mirror.archive_card(list_id, card_name)
+            counts['archived'] += 1
+            print(f"Archived leftover card: {card_name} (ID: {card_id})")
+        print(f"{plan['board_name']} / {plan['list_name']}: {len(posts)} posts")
+    return counts
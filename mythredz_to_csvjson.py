@@ -1,42 +1,95 @@
 import json
+import os
 from datetime import datetime
 import mythredz_csvjson_utils
+import incremental_export_utils
+import metrics_utils
+import table_record_utils
+import sharded_output_utils
 
 # Load mythredz data
-threds = mythredz_csvjson_utils.load_json('mysql_data_exported/mythredz/thred.json')
-posts = mythredz_csvjson_utils.load_json('mysql_data_exported/mythredz/post.json')
+with metrics_utils.stage_timer('load_tables'):
+    threds = table_record_utils.load_table('mysql_data_exported/mythredz/thred.json', 'thred')
+    posts = table_record_utils.load_table('mysql_data_exported/mythredz/post.json', 'post')
 
-# Load existing combined data
-existing_combined_data = mythredz_csvjson_utils.load_json('exported_data/joeregerposts_20240721105155.json')
+    # Load existing combined data
+    existing_combined_data = mythredz_csvjson_utils.load_json('exported_data/joeregerposts_20240721105155.json')
 
 # Process mythredz posts
-processed_mythredz_posts = mythredz_csvjson_utils.process_mythredz_posts(posts, threds)
+with metrics_utils.stage_timer('process_posts'):
+    processed_mythredz_posts = mythredz_csvjson_utils.process_mythredz_posts(posts, threds)
 
-# Combine and sort all entries
-all_entries = existing_combined_data + processed_mythredz_posts
-all_entries = mythredz_csvjson_utils.combine_and_sort_entries(all_entries)
+# JOURNAL_OUTPUT_SHARDS=plain or gzip writes per-year shards with a manifest instead of the single CSV and JSON files
+shard_mode = sharded_output_utils.sharded_output_mode()
 
-# Sort mythredz entries
-sorted_mythredz_posts = mythredz_csvjson_utils.combine_and_sort_entries(processed_mythredz_posts)
+# JOURNAL_INCREMENTAL_EXPORT=1 merges into stable, un-timestamped files, appending only new or changed entries
+incremental = incremental_export_utils.incremental_export_enabled()
+if incremental and shard_mode:
+    print("JOURNAL_INCREMENTAL_EXPORT does not apply to sharded output; writing a full sharded export")
+    incremental = False
 
-# Add a datestamp to the filenames
-datestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+if incremental:
+    combined_base = 'exported_data/Combined_JoeregercomBlog-and-Mythredz'
+    mythredz_base = 'exported_data/Mythredz'
 
-# Combined files
-combined_csv_filename = f'exported_data/Combined_JoeregercomBlog-and-Mythredz_{datestamp}.csv'
-combined_json_filename = f'exported_data/Combined_JoeregercomBlog-and-Mythredz_{datestamp}.json'
+    with metrics_utils.stage_timer('merge_entries'):
+        # Posts come after the older combined data, so a post that is in both is taken from mysql_data_exported
+        combined_written, combined_rewritten = mythredz_csvjson_utils.merge_entries_incrementally(
+            existing_combined_data + processed_mythredz_posts, f'{combined_base}.json', f'{combined_base}.csv', f'{combined_base}.index.json')
+        mythredz_written, mythredz_rewritten = mythredz_csvjson_utils.merge_entries_incrementally(
+            processed_mythredz_posts, f'{mythredz_base}.json', f'{mythredz_base}.csv', f'{mythredz_base}.index.json')
+        if os.path.exists(f'{combined_base}.sqlite'):
+            mythredz_csvjson_utils.upsert_entries_to_sqlite(combined_written, f'{combined_base}.sqlite')
+        else:
+            # combined_written only holds this run's new or changed entries, so a missing database is rebuilt from the full merged file
+            mythredz_csvjson_utils.save_entries_to_sqlite(mythredz_csvjson_utils.load_json(f'{combined_base}.json'), f'{combined_base}.sqlite')
+    metrics_utils.increment('entries_merged', len(combined_written))
 
-# Mythredz-only files
-mythredz_csv_filename = f'exported_data/Mythredz_{datestamp}.csv'
-mythredz_json_filename = f'exported_data/Mythredz_{datestamp}.json'
+    print(f"{'Rewrote' if combined_rewritten else 'Appended'} {len(combined_written)} new or changed combined entries in {combined_base}.json, .csv and .sqlite")
+    print(f"{'Rewrote' if mythredz_rewritten else 'Appended'} {len(mythredz_written)} new or changed mythredz-only entries in {mythredz_base}.json and .csv")
+else:
+    with metrics_utils.stage_timer('sort_entries'):
+        # Combine and sort all entries
+        all_entries = existing_combined_data + processed_mythredz_posts
+        all_entries = mythredz_csvjson_utils.combine_and_sort_entries(all_entries)
 
-# Save combined entries to CSV and JSON
-mythredz_csvjson_utils.save_entries_to_csv(all_entries, combined_csv_filename)
-mythredz_csvjson_utils.save_entries_to_json(all_entries, combined_json_filename)
+        # Sort mythredz entries
+        sorted_mythredz_posts = mythredz_csvjson_utils.combine_and_sort_entries(processed_mythredz_posts)
 
-# Save mythredz-only entries to CSV and JSON
-mythredz_csvjson_utils.save_entries_to_csv(sorted_mythredz_posts, mythredz_csv_filename)
-mythredz_csvjson_utils.save_entries_to_json(sorted_mythredz_posts, mythredz_json_filename)
+    # Add a datestamp to the filenames
+    datestamp = datetime.now().strftime('%Y%m%d%H%M%S')
 
-print(f"Finished processing and saving combined entries to {combined_csv_filename} and {combined_json_filename}")
-print(f"Finished processing and saving mythredz-only entries to {mythredz_csv_filename} and {mythredz_json_filename}")
\ No newline at end of file
+    # Combined files
+    combined_csv_filename = f'exported_data/Combined_JoeregercomBlog-and-Mythredz_{datestamp}.csv'
+    combined_json_filename = f'exported_data/Combined_JoeregercomBlog-and-Mythredz_{datestamp}.json'
+    combined_sqlite_filename = f'exported_data/Combined_JoeregercomBlog-and-Mythredz_{datestamp}.sqlite'
+
+    # Mythredz-only files
+    mythredz_csv_filename = f'exported_data/Mythredz_{datestamp}.csv'
+    mythredz_json_filename = f'exported_data/Mythredz_{datestamp}.json'
+
+    combined_shard_dir = f'exported_data/Combined_JoeregercomBlog-and-Mythredz_{datestamp}'
+    mythredz_shard_dir = f'exported_data/Mythredz_{datestamp}'
+
+    with metrics_utils.stage_timer('save_output'):
+        if shard_mode:
+            mythredz_csvjson_utils.save_entries_to_shards(all_entries, combined_shard_dir, 'Combined_JoeregercomBlog-and-Mythredz', compress=shard_mode == 'gzip')
+            mythredz_csvjson_utils.save_entries_to_shards(sorted_mythredz_posts, mythredz_shard_dir, 'Mythredz', compress=shard_mode == 'gzip')
+        else:
+            # Save combined entries to CSV and JSON
+            mythredz_csvjson_utils.save_entries_to_csv(all_entries, combined_csv_filename)
+            mythredz_csvjson_utils.save_entries_to_json(all_entries, combined_json_filename)
+
+            # Save mythredz-only entries to CSV and JSON
+            mythredz_csvjson_utils.save_entries_to_csv(sorted_mythredz_posts, mythredz_csv_filename)
+            mythredz_csvjson_utils.save_entries_to_json(sorted_mythredz_posts, mythredz_json_filename)
+        mythredz_csvjson_utils.save_entries_to_sqlite(all_entries, combined_sqlite_filename)
+
+    if shard_mode:
+        print(f"Finished processing and saving combined entries to {combined_shard_dir} and {combined_sqlite_filename}")
+        print(f"Finished processing and saving mythredz-only entries to {mythredz_shard_dir}")
+    else:
+        print(f"Finished processing and saving combined entries to {combined_csv_filename}, {combined_json_filename} and {combined_sqlite_filename}")
+        print(f"Finished processing and saving mythredz-only entries to {mythredz_csv_filename} and {mythredz_json_filename}")
+
+metrics_utils.dump_metrics('mythredz_to_csvjson')
@@ -1,94 +1,39 @@
-import json
-from datetime import datetime
+import metrics_utils
+import mythredz_sync_utils
 import mythredz_trello_utils
-import time
-
-start_date = datetime(2008, 6, 14, 0, 0)
-
-def load_json(file_path):
-    with open(file_path, 'r') as file:
-        return json.load(file)
-
-api_keys = mythredz_trello_utils.load_api_keys('api_keys_and_tokens.txt')
-api_key = api_keys['trello_api_key']
-token = api_keys['trello_token']
-
-threds = load_json('mysql_data_exported/mythredz/thred.json')
-posts = load_json('mysql_data_exported/mythredz/post.json')
-
-threds_dict = {thred['thredid']: thred for thred in threds if thred['userid'] == 1}
-filtered_posts = [post for post in posts if post['thredid'] in threds_dict]
-filtered_posts.sort(key=lambda x: datetime.fromisoformat(x['date']))
-
-def calculate_pos(event_date, base_date, total_units):
-    days_since_start = (event_date - base_date).days
-    return (1 - (days_since_start / total_units)) * 1000
-
-for post in filtered_posts[:50000]:
-    post_date = datetime.fromisoformat(post['date'])
-    if post_date < start_date:
-        continue
-
-    if post_date.year < 2000:
-        if post_date.year < 1980:
-            board_name = "Out with the Old 1970s Edition"
-            base_date = datetime(1970, 1, 1)
-        elif post_date.year < 1990:
-            board_name = "Out with the Old 1980s Edition"
-            base_date = datetime(1980, 1, 1)
-        else:
-            board_name = "Out with the Old 1990s Edition"
-            base_date = datetime(1990, 1, 1)
-        total_units = (datetime(base_date.year + 10, 1, 1) - base_date).days
-    else:
-        board_name = f"Out with the Old {post_date.year} Edition"
-        base_date = datetime(post_date.year, 1, 1)
-        total_units = (datetime(post_date.year + 1, 1, 1) - base_date).days
-
-    print(f"Processing post for board: {board_name}")
-
-    board_id = mythredz_trello_utils.get_board_id(board_name, api_key, token)
-    if board_id is None:
-        board = mythredz_trello_utils.create_board(board_name, api_key, token)
-        board_id = board['id']
-        print(f"Created new board: {board_name} (ID: {board_id})")
-    else:
-        print(f"Using existing board: {board_name} (ID: {board_id})")
-
-    list_name = post_date.strftime('%a %b').upper() + f" {post_date.day}"
-    pos = calculate_pos(post_date, base_date, total_units)
-
-    list_id, _ = mythredz_trello_utils.create_or_get_list(board_id, list_name, pos, api_key, token)
-    print(f"Using list: {list_name} (ID: {list_id})")
-
-    thred_name = threds_dict[post['thredid']]['name']
-    card_title = f"{thred_name}: {post['contents']}"
-    card_description = f"Date: {post['date']}\nSource: mythredz app\nThred ID: {post['thredid']}\nPost ID: {post['postid']}"
-
-    print(f"Attempting to create or update card: {card_title}")
-
-    existing_cards = mythredz_trello_utils.get_list_cards(list_id, api_key, token)
-    
-    if card_title in existing_cards:
-        existing_card = existing_cards[card_title]
-        if existing_card['desc'] != card_description:
-            card_id = mythredz_trello_utils.update_card(existing_card['id'], card_description, api_key, token)
-            print(f"Updated existing card: {card_title} (ID: {card_id})")
-        else:
-            print(f"Card already exists and is up to date: {card_title} (ID: {existing_card['id']})")
-    else:
-        card_id = mythredz_trello_utils.create_card(list_id, card_title, card_description, api_key, token)
-        print(f"Created new card: {card_title} (ID: {card_id})")
-
-    time.sleep(1)  # Wait for 1 second
-    existing_cards = mythredz_trello_utils.get_list_cards(list_id, api_key, token)  # Refresh the list of cards
-
-    print(f"Board: {board_name}")
-    print(f"List: {list_name}")
-    print(f"List Position: {pos}")
-    print(f"Card Title: {card_title}")
-    print(f"Card Description:")
-    print(card_description)
-    print("=" * 40)
-
-print("Finished processing posts")
\ No newline at end of file
+import trello_client_utils
+import trello_mirror_utils
+
+def main():
+    # MYTHREDZ_TRELLO_CONSOLIDATE=day or thred puts a day's posts on one card instead of one card per post
+    mode = mythredz_trello_utils.consolidation_mode()
+
+    data = mythredz_sync_utils.MythredzData()
+    data.refresh()
+
+    api_keys = trello_client_utils.load_api_keys('api_keys_and_tokens.txt')
+    mirror = trello_mirror_utils.TrelloMirror(trello_client_utils.make_request, trello_client_utils.TRELLO_API_BASE_URL,
+                                              api_keys['trello_api_key'], api_keys['trello_token'])
+
+    units = mythredz_sync_utils.sync_units(data, mode)
+    totals = {'created': 0, 'updated': 0, 'unchanged': 0, 'archived': 0}
+
+    # Print a progress line with ETA periodically
+    progress = metrics_utils.start_progress('mythredz_to_trello', len(units))
+    with metrics_utils.stage_timer('sync_posts' if mode == 'off' else 'sync_consolidated'):
+        for key, posts in units:
+            metrics_utils.update_progress(progress)
+            counts = mythredz_sync_utils.sync_unit(posts, data, mirror, mode)
+            for name, count in counts.items():
+                totals[name] += count
+    metrics_utils.update_progress(progress, done=0, force=True)
+
+    post_count = sum(len(posts) for key, posts in units)
+    print(f"Synced {post_count} posts as {len(units)} {'posts' if mode == 'off' else 'groups'}: {totals['created']} cards created, "
+          f"{totals['updated']} updated, {totals['unchanged']} unchanged, {totals['archived']} archived")
+    print("Finished processing posts")
+
+    metrics_utils.dump_metrics('mythredz_to_trello')
+
+if __name__ == "__main__":
+    main()
@@ -1,86 +1,78 @@
-import requests
 import os
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from ratelimit import limits, sleep_and_retry
+import re
 
-TRELLO_RATE_LIMIT = 100
-TRELLO_RATE_LIMIT_PERIOD = 10
+# Trello rejects card descriptions longer than this; a consolidated day that does not fit spills onto further cards
+TRELLO_MAX_DESC_LENGTH = 16384
 
-def create_session_with_retries():
-    session = requests.Session()
-    retries = Retry(total=5, backoff_factor=1, status_forcelist=[500, 502, 503, 504], allowed_methods=["HEAD", "GET", "OPTIONS", "POST", "PUT"])
-    session.mount('https://', HTTPAdapter(max_retries=retries))
-    session.mount('http://', HTTPAdapter(max_retries=retries))
-    return session
+# MYTHREDZ_TRELLO_CONSOLIDATE groups posts into one card per day ('day') or per day and thred ('thred');
+# 'off' (the default) keeps one card per post
+CONSOLIDATION_MODES = ('off', 'day', 'thred')
+CONSOLIDATED_CARD_NAME = 'Mythredz posts'
+POST_IDS_PATTERN = re.compile(r'^Post IDs: ([\d,]*)$', re.MULTILINE)
+# Per-post cards end with the one post they hold
+POST_ID_PATTERN = re.compile(r'^Post ID: (\d+)$', re.MULTILINE)
 
-session = create_session_with_retries()
+def consolidation_mode():
+    mode = os.environ.get('MYTHREDZ_TRELLO_CONSOLIDATE', 'off').strip().lower() or 'off'
+    if mode not in CONSOLIDATION_MODES:
+        raise ValueError(f"MYTHREDZ_TRELLO_CONSOLIDATE must be one of {', '.join(CONSOLIDATION_MODES)}, not {mode!r}")
+    return mode
 
-@sleep_and_retry
-@limits(calls=TRELLO_RATE_LIMIT, period=TRELLO_RATE_LIMIT_PERIOD)
-def make_request(method, url, **kwargs):
-    response = session.request(method, url, **kwargs)
-    response.raise_for_status()
-    return response
+# Function to group date-sorted posts by day, or by day and thred, keeping their order within each group
+def group_posts(posts, mode):
+    groups = {}
+    for post in posts:
+        key = (post['date'][:10], post['thredid']) if mode == 'thred' else (post['date'][:10],)
+        groups.setdefault(key, []).append(post)
+    return groups
 
-def load_api_keys(file_path):
-    api_keys = {}
-    with open(file_path, 'r') as file:
-        for line in file:
-            key, value = line.strip().split('=')
-            api_keys[key] = value
-    return api_keys
+def _post_line(post, thred_name):
+    contents = ' '.join(str(post['contents']).split())
+    time_of_day = post['date'][11:16]
+    return f"{time_of_day} {thred_name}: {contents}" if thred_name else f"{time_of_day} {contents}"
 
-def get_board_id(board_name, api_key, token):
-    url = f"https://api.trello.com/1/members/me/boards"
-    query = {'key': api_key, 'token': token, 'fields': 'name,id'}
-    response = make_request('GET', url, params=query)
-    boards = response.json()
-    return next((board['id'] for board in boards if board['name'] == board_name), None)
+def _consolidated_desc(day, lines, post_ids):
+    return (f"Date: {day}\nSource: mythredz app\nPosts: {len(post_ids)}\n\n" + '\n'.join(lines) +
+            f"\n\nPost IDs: {','.join(map(str, post_ids))}")
 
-def create_board(board_name, api_key, token):
-    url = f"https://api.trello.com/1/boards/"
-    query = {'key': api_key, 'token': token, 'name': board_name, 'defaultLists': 'false', 'prefs_permissionLevel': 'private'}
-    response = make_request('POST', url, params=query)
-    return response.json()
+# Function to render a group of posts into cards as [(name, description, post ids)]. Posts go into the
+# description one line each; a group too long for one description continues on "(part N)" cards, and so does
+# a post too long for half a description, split into "(continued)" pieces so nothing is cut off. A card lists
+# the id of every post it holds any of. The description ends with the post ids, which is what update detection
+# compares. Per-thred cards carry the thred id in their name, since two threds can share a name.
+def format_consolidated_cards(posts, day, thred_names, per_thred=False):
+    thredid = posts[0]['thredid']
+    base_name = f"{thred_names[thredid]} (thred {thredid})" if per_thred else CONSOLIDATED_CARD_NAME
+    piece_length = TRELLO_MAX_DESC_LENGTH // 2
+    cards = []
+    lines, post_ids = [], []
+    for post in posts:
+        line = _post_line(post, None if per_thred else thred_names[post['thredid']])
+        pieces = [line[:piece_length]] + [f"(continued) {line[start:start + piece_length]}"
+                                         for start in range(piece_length, len(line), piece_length)]
+        for piece in pieces:
+            piece_ids = post_ids if post_ids and post_ids[-1] == post['postid'] else post_ids + [post['postid']]
+            if lines and len(_consolidated_desc(day, lines + [piece], piece_ids)) > TRELLO_MAX_DESC_LENGTH:
+                cards.append((lines, post_ids))
+                lines, post_ids = [], []
+            lines.append(piece)
+            if not post_ids or post_ids[-1] != post['postid']:
+                post_ids.append(post['postid'])
+    cards.append((lines, post_ids))
+    return [(base_name if part == 1 else f"{base_name} (part {part})", _consolidated_desc(day, part_lines, part_ids), part_ids)
+            for part, (part_lines, part_ids) in enumerate(cards, start=1)]
 
-def get_board_lists(board_id, api_key, token):
-    url = f"https://api.trello.com/1/boards/{board_id}/lists"
-    query = {'key': api_key, 'token': token, 'fields': 'name,id'}
-    response = make_request('GET', url, params=query)
-    return {lst['name']: lst['id'] for lst in response.json()}
+# Function to read the post ids recorded on a consolidated card, or None for a card without them
+def parse_post_ids(desc):
+    match = POST_IDS_PATTERN.search(desc or '')
+    if match is None:
+        return None
+    return {int(post_id) for post_id in match.group(1).split(',') if post_id}
 
-def create_or_get_list(board_id, list_name, pos, api_key, token):
-    existing_lists = get_board_lists(board_id, api_key, token)
-    if list_name in existing_lists:
-        return existing_lists[list_name], None
-    url = f"https://api.trello.com/1/lists"
-    query = {'key': api_key, 'token': token, 'name': list_name, 'idBoard': board_id, 'pos': pos}
-    response = make_request('POST', url, params=query)
-    return response.json()['id'], ('POST', url, {'params': query}, None)
-
-def get_list_cards(list_id, api_key, token):
-    url = f"https://api.trello.com/1/lists/{list_id}/cards"
-    query = {'key': api_key, 'token': token, 'fields': 'name,desc,id', 'limit': 1000}
-    response = make_request('GET', url, params=query)
-    cards = response.json()
-    while len(cards) % 1000 == 0 and len(cards) > 0:
-        query['before'] = cards[-1]['id']
-        response = make_request('GET', url, params=query)
-        new_cards = response.json()
-        if not new_cards:
-            break
-        cards.extend(new_cards)
-    return {card['name']: card for card in cards}
-
-def update_card(card_id, desc, api_key, token):
-    url = f"https://api.trello.com/1/cards/{card_id}"
-    data = {'key': api_key, 'token': token, 'desc': desc}
-    make_request('PUT', url, data=data)
-    return card_id
-
-def create_card(list_id, name, desc, api_key, token):
-    url = f"https://api.trello.com/1/cards"
-    data = {'key': api_key, 'token': token, 'idList': list_id, 'name': name, 'desc': desc}
-    response = make_request('POST', url, data=data)
-    return response.json()['id']
\ No newline at end of file
+# Function to read the post ids a card holds, whether it is a consolidated card or a per-post one; None for other cards
+def card_post_ids(desc):
+    post_ids = parse_post_ids(desc)
+    if post_ids is not None:
+        return post_ids
+    match = POST_ID_PATTERN.search(desc or '')
+    return None if match is None else {int(match.group(1))}
@@ -0,0 +1,167 @@
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def load_pipeline_state(file_path):
+    if not os.path.exists(file_path):
+        return {'stages': {}, 'file_hashes': {}}
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable pipeline state {file_path}: {e}")
+        return {'stages': {}, 'file_hashes': {}}
+    state.setdefault('stages', {})
+    state.setdefault('file_hashes', {})
+    return state
+
+def save_pipeline_state(state, file_path):
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, file_path)
+
+def hash_file(file_path, file_hashes):
+    # Content hash of a file, reusing the cached hash while its size and mtime are unchanged
+    stat = os.stat(file_path)
+    cached = file_hashes.get(file_path)
+    if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    digest = hasher.hexdigest()
+    file_hashes[file_path] = [stat.st_size, stat.st_mtime_ns, digest]
+    return digest
+
+def fingerprint_directory(dir_path):
+    # Directory trees such as the media archive are too large to hash, so fingerprint their
+    # listing instead: every file's relative path, size and mtime
+    hasher = hashlib.sha256()
+    for subdir, dirs, files in os.walk(dir_path):
+        dirs.sort()
+        for file in sorted(files):
+            file_path = os.path.join(subdir, file)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            hasher.update(f"{os.path.relpath(file_path, dir_path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+    return hasher.hexdigest()
+
+def expand_paths(patterns):
+    # Expand glob patterns, keeping patterns that match nothing so they show up as missing
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        paths.extend(matches if matches else [pattern])
+    return paths
+
+def fingerprint_stage(stage, file_hashes):
+    # Combine the fingerprints of a stage's code, inputs and mode variables into one digest
+    hasher = hashlib.sha256()
+    for path in expand_paths(stage.get('code', []) + stage.get('inputs', [])):
+        if os.path.isdir(path):
+            digest = 'dir:' + fingerprint_directory(path)
+        elif os.path.isfile(path):
+            digest = hash_file(path, file_hashes)
+        else:
+            digest = 'missing'
+        hasher.update(f"{path}\0{digest}\n".encode('utf-8'))
+    for name in stage.get('env', []):
+        hasher.update(f"${name}\0{os.environ.get(name, '')}\n".encode('utf-8'))
+    return hasher.hexdigest()
+
+def outputs_exist(stage):
+    # An output may be a list of alternative patterns, any one of which is enough (e.g. single file or shard manifest)
+    return all(any(glob.glob(alternative) for alternative in ([pattern] if isinstance(pattern, str) else pattern))
+               for pattern in stage.get('outputs', []))
+
+def run_stage(stage, log_dir):
+    # Run a stage's script in its own interpreter, since the scripts do their work at import time
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f"{stage['name']}.log")
+    started = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log_file:
+        result = subprocess.run([sys.executable, stage['script']], stdout=log_file, stderr=subprocess.STDOUT)
+    return result.returncode, time.perf_counter() - started, log_path
+
+def run_pipeline(stages, state, state_file, log_dir, force=False, max_workers=4, dry_run=False):
+    # Run stages as soon as their dependencies have finished, skipping any stage whose code and
+    # inputs match the fingerprint of its last successful run and whose outputs are still present.
+    # Returns {stage name: status}.
+    stages_by_name = {stage['name']: stage for stage in stages}
+    statuses = {}
+    file_hashes = state['file_hashes']
+
+    def ready_stages():
+        ready = []
+        for stage in stages:
+            name = stage['name']
+            if name in statuses:
+                continue
+            deps = [dep for dep in stage.get('deps', []) if dep in stages_by_name]
+            if any(statuses.get(dep) in ('failed', 'blocked') for dep in deps):
+                statuses[name] = 'blocked'
+                print(f"[{name}] blocked by a failed dependency")
+                continue
+            if all(statuses.get(dep) in ('succeeded', 'skipped') for dep in deps):
+                ready.append(stage)
+        return ready
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while True:
+            # Resolving one stage (for example by skipping it) can make its dependents ready
+            ready = ready_stages()
+            while ready:
+                for stage in ready:
+                    name = stage['name']
+                    fingerprint = fingerprint_stage(stage, file_hashes)
+                    previous = state['stages'].get(name, {})
+                    if not force and previous.get('fingerprint') == fingerprint and outputs_exist(stage):
+                        statuses[name] = 'skipped'
+                        print(f"[{name}] unchanged, skipping")
+                        continue
+                    if dry_run:
+                        statuses[name] = 'succeeded'
+                        print(f"[{name}] would run")
+                        continue
+                    print(f"[{name}] running {stage['script']}")
+                    statuses[name] = 'running'
+                    running[executor.submit(run_stage, stage, log_dir)] = (stage, fingerprint)
+                ready = ready_stages()
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, fingerprint = running.pop(future)
+                name = stage['name']
+                try:
+                    returncode, elapsed, log_path = future.result()
+                except OSError as e:
+                    returncode, elapsed, log_path = None, 0, None
+                    print(f"[{name}] could not start: {e}")
+                if returncode == 0:
+                    statuses[name] = 'succeeded'
+                    state['stages'][name] = {'fingerprint': fingerprint, 'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'seconds': round(elapsed, 3)}
+                    print(f"[{name}] finished in {elapsed:.1f}s (log: {log_path})")
+                else:
+                    statuses[name] = 'failed'
+                    state['stages'].pop(name, None)
+                    print(f"[{name}] failed with exit code {returncode} (log: {log_path})")
+                if not dry_run:
+                    save_pipeline_state(state, state_file)
+
+    return statuses
@@ -0,0 +1,121 @@
+import argparse
+import incremental_export_utils
+import pipeline_utils
+import sharded_output_utils
+
+PIPELINE_STATE_FILE = 'exported_data/pipeline_state.json'
+PIPELINE_LOG_DIR = 'exported_data/pipeline_logs'
+
+# Each stage declares the code it runs, the inputs it reads and the outputs it writes.
+# An output given as a list is satisfied by any one of its patterns (single files or a shard manifest).
+# The values of the environment variables listed in env are part of the fingerprint, so changing a mode reruns the stage.
+# Stages listed in deps must finish first; everything else runs concurrently.
+# The Trello syncs share one API token and rate budget, so they run one after the other.
+
+# JOURNAL_INCREMENTAL_EXPORT=1 makes mythredz_to_csvjson.py keep un-timestamped files instead of writing new ones
+if incremental_export_utils.incremental_export_enabled() and not sharded_output_utils.sharded_output_mode():
+    MYTHREDZ_OUTPUTS = ['exported_data/Combined_JoeregercomBlog-and-Mythredz.json', 'exported_data/Combined_JoeregercomBlog-and-Mythredz.csv',
+                        'exported_data/Combined_JoeregercomBlog-and-Mythredz.sqlite', 'exported_data/Mythredz.json', 'exported_data/Mythredz.csv']
+else:
+    MYTHREDZ_OUTPUTS = [['exported_data/Combined_JoeregercomBlog-and-Mythredz_*.json', 'exported_data/Combined_JoeregercomBlog-and-Mythredz_*/manifest.json'],
+                        'exported_data/Combined_JoeregercomBlog-and-Mythredz_*.sqlite',
+                        ['exported_data/Mythredz_*.json', 'exported_data/Mythredz_*/manifest.json']]
+
+STAGES = [
+    {
+        'name': 'mysql_dump',
+        'script': 'mysql_dump.py',
+        'code': ['mysql_dump.py', 'serialization_utils.py'],
+        'inputs': [],
+        'outputs': ['mysql_data_exported/mythredz/*.json'],
+        'env': ['JOURNAL_JSON_BACKEND', 'JOURNAL_JSON_COMPACT'],
+        'deps': []
+    },
+    {
+        'name': 'blog_to_csvjson',
+        'script': 'blog_to_csvjson.py',
+        'code': ['blog_to_csvjson.py', 'blog_csvjson_utils.py', 'sqlite_export_utils.py', 'sharded_output_utils.py', 'table_record_utils.py',
+                 'serialization_utils.py'],
+        'inputs': ['mysql_data_exported/event.json', 'mysql_data_exported/megalog.json', 'mysql_data_exported/image.json'],
+        'outputs': [['exported_data/JoeregercomBlog_*.json', 'exported_data/JoeregercomBlog_*/manifest.json'], 'exported_data/JoeregercomBlog_*.sqlite'],
+        'env': ['JOURNAL_OUTPUT_SHARDS', 'JOURNAL_JSON_BACKEND', 'JOURNAL_JSON_COMPACT'],
+        'deps': []
+    },
+    {
+        'name': 'mythredz_to_csvjson',
+        'script': 'mythredz_to_csvjson.py',
+        'code': ['mythredz_to_csvjson.py', 'mythredz_csvjson_utils.py', 'sqlite_export_utils.py', 'sharded_output_utils.py', 'table_record_utils.py',
+                 'incremental_export_utils.py', 'serialization_utils.py'],
+        'inputs': ['mysql_data_exported/mythredz/thred.json', 'mysql_data_exported/mythredz/post.json', 'exported_data/joeregerposts_20240721105155.json'],
+        'outputs': MYTHREDZ_OUTPUTS,
+        'env': ['JOURNAL_INCREMENTAL_EXPORT', 'JOURNAL_OUTPUT_SHARDS', 'JOURNAL_JSON_BACKEND', 'JOURNAL_JSON_COMPACT'],
+        'deps': ['mysql_dump']
+    },
+    {
+        'name': 'mediaarchive_to_csvjson',
+        'script': 'mediaarchive_to_csvjson.py',
+        'code': ['mediaarchive_to_csvjson.py', 'mediaarchive_csvjson_utils.py', 'mediaarchive_capture_date_utils.py', 'mediaarchive_dedup_utils.py',
+                 'sharded_output_utils.py', 'serialization_utils.py'],
+        'inputs': ['source_data/mediaarchive'],
+        'outputs': [['exported_data/MediaArchive_output_*.json', 'exported_data/MediaArchive_output_*/manifest.json']],
+        'env': ['JOURNAL_OUTPUT_SHARDS', 'JOURNAL_JSON_BACKEND', 'JOURNAL_JSON_COMPACT'],
+        'deps': []
+    },
+    {
+        'name': 'blog_to_trello',
+        'script': 'blog_to_trello.py',
+        'code': ['blog_to_trello.py', 'blog_sync_utils.py', 'blog_trello_utils.py', 'trello_client_utils.py', 'trello_mirror_utils.py', 'table_record_utils.py',
+                 'export_tables_utils.py', 'trello_board_utils.py'],
+        'inputs': ['mysql_data_exported/event.json', 'mysql_data_exported/megalog.json', 'mysql_data_exported/image.json',
+                   'source_data/joeregercomlivedata/uploadimages/files/50'],
+        'outputs': [],
+        'deps': []
+    },
+    {
+        'name': 'mythredz_to_trello',
+        'script': 'mythredz_to_trello.py',
+        'code': ['mythredz_to_trello.py', 'mythredz_sync_utils.py', 'mythredz_trello_utils.py', 'trello_client_utils.py', 'trello_mirror_utils.py', 'table_record_utils.py',
+                 'export_tables_utils.py', 'trello_board_utils.py'],
+        'inputs': ['mysql_data_exported/mythredz/thred.json', 'mysql_data_exported/mythredz/post.json'],
+        'outputs': [],
+        'env': ['MYTHREDZ_TRELLO_CONSOLIDATE'],
+        'deps': ['mysql_dump', 'blog_to_trello']
+    },
+    {
+        'name': 'mediaarchive_to_trello',
+        'script': 'mediaarchive_to_trello.py',
+        'code': ['mediaarchive_to_trello.py', 'mediaarchive_trello_utils.py', 'sharded_output_utils.py', 'trello_client_utils.py', 'trello_board_utils.py',
+                 'trello_mirror_utils.py'],
+        'inputs': ['exported_data/MediaArchive_output_*.json', 'exported_data/MediaArchive_output_*/manifest.json'],
+        'outputs': [],
+        'deps': ['mediaarchive_to_csvjson', 'mythredz_to_trello']
+    }
+]
+
+def main():
+    stage_names = [stage['name'] for stage in STAGES]
+    parser = argparse.ArgumentParser(
+        description="Run the export and sync scripts as a pipeline, skipping stages whose code and inputs are unchanged. "
+                    "mysql_dump has no file inputs, so after its first run it only reruns with --force.")
+    parser.add_argument('--only', nargs='+', choices=stage_names, help="Run only these stages")
+    parser.add_argument('--skip', nargs='+', choices=stage_names, default=[], help="Leave these stages out")
+    parser.add_argument('--force', action='store_true', help="Run stages even if their fingerprints are unchanged")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would run without running anything")
+    parser.add_argument('--workers', type=int, default=4, help="Maximum number of stages to run at once")
+    args = parser.parse_args()
+
+    stages = [stage for stage in STAGES
+              if (not args.only or stage['name'] in args.only) and stage['name'] not in args.skip]
+
+    state = pipeline_utils.load_pipeline_state(PIPELINE_STATE_FILE)
+    statuses = pipeline_utils.run_pipeline(stages, state, PIPELINE_STATE_FILE, PIPELINE_LOG_DIR,
+                                           force=args.force, max_workers=args.workers, dry_run=args.dry_run)
+
+    print("\nPipeline summary:")
+    for name, status in statuses.items():
+        print(f"  {name}: {status}")
+    if any(status in ('failed', 'blocked') for status in statuses.values()):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import csv
+import json
+import os
+from itertools import islice
+from operator import itemgetter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JOURNAL_JSON_BACKEND picks the JSON encoder: stdlib (default), orjson, or auto (orjson when installed).
+# orjson only pretty-prints with a two-space indent, so its pretty output uses indent=2 whatever the writer asks for.
+JSON_BACKENDS = ('stdlib', 'orjson', 'auto')
+
+# JOURNAL_JSON_COMPACT=1 writes JSON without indentation or spaces after separators
+CSV_BATCH_SIZE = 10000
+
+def json_backend():
+    backend = os.environ.get('JOURNAL_JSON_BACKEND', 'stdlib').strip().lower() or 'stdlib'
+    if backend not in JSON_BACKENDS:
+        raise ValueError(f"JOURNAL_JSON_BACKEND must be one of {', '.join(JSON_BACKENDS)}, not {backend!r}")
+    if backend == 'auto':
+        return 'orjson' if orjson is not None else 'stdlib'
+    if backend == 'orjson' and orjson is None:
+        raise ImportError("JOURNAL_JSON_BACKEND=orjson but orjson is not installed (pip install orjson)")
+    return backend
+
+def json_compact():
+    return os.environ.get('JOURNAL_JSON_COMPACT', '').strip().lower() in ('1', 'true', 'yes')
+
+def _orjson_option(indent):
+    option = orjson.OPT_NON_STR_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return option
+
+def dumps(obj, indent=None, ensure_ascii=True, default=None):
+    # Encode one value to str with the selected backend; honours JOURNAL_JSON_COMPACT
+    if json_compact():
+        indent = None
+    if json_backend() == 'orjson':
+        return orjson.dumps(obj, default=default, option=_orjson_option(indent)).decode('utf-8')
+    separators = (',', ':') if indent is None else None
+    return json.dumps(obj, indent=indent, ensure_ascii=ensure_ascii, default=default, separators=separators)
+
+# Function to write a whole document to a JSON file with the selected backend
+def save_json(obj, file_path, indent=4, ensure_ascii=True, default=None, encoding=None):
+    if json_compact():
+        indent = None
+    if json_backend() == 'orjson':
+        # orjson produces UTF-8 bytes in one call, which is where most of its speed comes from
+        with open(file_path, 'wb') as f:
+            f.write(orjson.dumps(obj, default=default, option=_orjson_option(indent)))
+        return
+    separators = (',', ':') if indent is None else None
+    with open(file_path, 'w', encoding=encoding) as f:
+        json.dump(obj, f, indent=indent, ensure_ascii=ensure_ascii, default=default, separators=separators)
+
+def row_getter(fieldnames):
+    # Map a dict to a tuple in field order; itemgetter does this in C for rows that have every field,
+    # and missing fields are written empty like DictWriter's restval
+    getter = itemgetter(*fieldnames)
+    single = len(fieldnames) == 1
+    def values(row):
+        try:
+            value = getter(row)
+        except KeyError:
+            return tuple(row.get(field, '') for field in fieldnames)
+        return (value,) if single else value
+    return values
+
+# Function to write rows (dicts) to CSV with a precomputed field order, in batches through writerows
+def save_csv(rows, file_path, fieldnames, quoting=csv.QUOTE_ALL, transform=None, encoding='utf-8', batch_size=CSV_BATCH_SIZE):
+    with open(file_path, 'w', newline='', encoding=encoding) as csvfile:
+        return write_csv_rows(csvfile, rows, fieldnames, quoting=quoting, transform=transform, batch_size=batch_size)
+
+def write_csv_rows(csvfile, rows, fieldnames, quoting=csv.QUOTE_ALL, transform=None, batch_size=CSV_BATCH_SIZE, header=True):
+    writer = csv.writer(csvfile, quoting=quoting)
+    if header:
+        writer.writerow(fieldnames)
+    values = map(row_getter(fieldnames), map(transform, rows) if transform else rows)
+    count = 0
+    while True:
+        batch = list(islice(values, batch_size))
+        if not batch:
+            return count
+        writer.writerows(batch)
+        count += len(batch)
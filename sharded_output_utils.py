@@ -0,0 +1,155 @@
+import csv
+import gzip
+import hashlib
+import json
+import os
+from contextlib import ExitStack
+from datetime import datetime
+import serialization_utils
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# JOURNAL_OUTPUT_SHARDS=plain or gzip switches the CSV/JSON exports to per-year shards
+SHARD_MODES = ('plain', 'gzip')
+
+def sharded_output_mode():
+    mode = os.environ.get('JOURNAL_OUTPUT_SHARDS', '').strip().lower()
+    if mode and mode not in SHARD_MODES:
+        raise ValueError(f"JOURNAL_OUTPUT_SHARDS must be one of {', '.join(SHARD_MODES)}, not {mode!r}")
+    return mode or None
+
+def shard_label(date):
+    # Same partitioning as the "Out with the Old" Trello boards: one shard per year from 2000, one per decade before
+    year = str(date or '')[:4]
+    if not year.isdigit():
+        return 'undated'
+    if int(year) < 2000:
+        return f"{year[:3]}0s"
+    return year
+
+def _open_shard(path, compress):
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=6)
+    return open(path, 'w', encoding='utf-8', newline='')
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Function to stream entries into one JSON (and optionally CSV) file per shard plus a manifest.
+# JSON shards hold one compact record per line inside a top-level array. Input does not need to be sorted;
+# a file is kept open per shard seen. Returns the manifest.
+def save_sharded_entries(entries, output_dir, prefix, csv_fieldnames=None, csv_row=None, csv_quoting=csv.QUOTE_ALL, compress=False):
+    os.makedirs(output_dir, exist_ok=True)
+    extension = '.gz' if compress else ''
+    shards = {}
+    csv_values = serialization_utils.row_getter(csv_fieldnames) if csv_fieldnames else None
+
+    with ExitStack() as stack:
+        for entry in entries:
+            label = shard_label(entry.get('date'))
+            shard = shards.get(label)
+            if shard is None:
+                json_name = f"{prefix}_{label}.json{extension}"
+                json_file = stack.enter_context(_open_shard(os.path.join(output_dir, json_name), compress))
+                json_file.write('[')
+                shard = shards[label] = {'label': label, 'json_name': json_name, 'json_file': json_file,
+                                         'csv_name': None, 'csv_writer': None, 'count': 0,
+                                         'first_date': entry.get('date'), 'last_date': entry.get('date')}
+                if csv_fieldnames:
+                    shard['csv_name'] = f"{prefix}_{label}.csv{extension}"
+                    csv_file = stack.enter_context(_open_shard(os.path.join(output_dir, shard['csv_name']), compress))
+                    shard['csv_writer'] = csv.writer(csv_file, quoting=csv_quoting)
+                    shard['csv_writer'].writerow(csv_fieldnames)
+
+            shard['json_file'].write('\n' if shard['count'] == 0 else ',\n')
+            shard['json_file'].write(serialization_utils.dumps(entry, ensure_ascii=False))
+            if shard['csv_writer']:
+                shard['csv_writer'].writerow(csv_values(csv_row(entry) if csv_row else entry))
+            shard['count'] += 1
+            date = entry.get('date')
+            if date is not None:
+                # Dates are ISO strings, so string comparison orders them
+                if shard['first_date'] is None or str(date) < str(shard['first_date']):
+                    shard['first_date'] = date
+                if shard['last_date'] is None or str(date) > str(shard['last_date']):
+                    shard['last_date'] = date
+
+        for shard in shards.values():
+            shard['json_file'].write('\n]\n')
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'prefix': prefix,
+        'compressed': compress,
+        'count': sum(shard['count'] for shard in shards.values()),
+        'shards': []
+    }
+    for label in sorted(shards):
+        shard = shards[label]
+        files = {'json': shard['json_name']}
+        if shard['csv_name']:
+            files['csv'] = shard['csv_name']
+        manifest['shards'].append({
+            'shard': label,
+            'first_date': shard['first_date'],
+            'last_date': shard['last_date'],
+            'count': shard['count'],
+            'files': {
+                file_format: {
+                    'name': name,
+                    'bytes': os.path.getsize(os.path.join(output_dir, name)),
+                    'sha256': _file_sha256(os.path.join(output_dir, name))
+                }
+                for file_format, name in files.items()
+            }
+        })
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(f"{manifest_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    return manifest
+
+def load_manifest(output_dir):
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+# Function to select the shards whose date range overlaps [start, end] (ISO date strings, either may be None)
+def select_shards(manifest, start=None, end=None):
+    selected = []
+    for shard in manifest['shards']:
+        if start is not None and shard['last_date'] is not None and str(shard['last_date']) < start:
+            continue
+        # Compare against the date prefix so an end of '2005-03-31' still includes '2005-03-31T18:00:00'
+        if end is not None and shard['first_date'] is not None and str(shard['first_date'])[:len(end)] > end:
+            continue
+        selected.append(shard)
+    return selected
+
+# Function to read entries back from the shards overlapping [start, end], verifying each file's checksum first
+def iter_sharded_entries(output_dir, start=None, end=None, verify=True):
+    manifest = load_manifest(output_dir)
+    for shard in select_shards(manifest, start, end):
+        shard_file = shard['files']['json']
+        path = os.path.join(output_dir, shard_file['name'])
+        if verify and _file_sha256(path) != shard_file['sha256']:
+            raise ValueError(f"Checksum mismatch for shard {path}")
+        opener = gzip.open if manifest['compressed'] else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                line = line.rstrip('\n').rstrip(',')
+                if line in ('[', ']', ''):
+                    continue
+                entry = json.loads(line)
+                date = str(entry.get('date') or '')
+                if start is not None and date < start:
+                    continue
+                if end is not None and date[:len(end)] > end:
+                    continue
+                yield entry
@@ -0,0 +1,144 @@
+import json
+import os
+import sqlite3
+from itertools import islice
+
+# Rows inserted per executemany call; the whole load is one transaction
+SQLITE_BATCH_SIZE = 50000
+
+# Entry keys and the columns they are stored in. Blog events only carry the first seven.
+SQLITE_COLUMNS = [
+    ('date', 'date', 'TEXT'),
+    ('category', 'category', 'TEXT'),
+    ('title', 'title', 'TEXT'),
+    ('body', 'body', 'TEXT'),
+    ('datablogging.eventid', 'eventid', 'INTEGER'),
+    ('datablogging.logid', 'logid', 'INTEGER'),
+    ('images', 'images', 'TEXT'),
+    ('source', 'source', 'TEXT'),
+    ('thred.thredid', 'thredid', 'INTEGER'),
+    ('thred.name', 'thred_name', 'TEXT'),
+    ('post.postid', 'postid', 'INTEGER')
+]
+
+SQLITE_INDEXES = {
+    'entries_date': 'date',
+    'entries_category': 'category',
+    'entries_thredid': 'thredid',
+    'entries_eventid': 'eventid',
+    'entries_postid': 'postid'
+}
+
+def _create_schema(conn):
+    columns = ', '.join(f"{column} {column_type}" for _, column, column_type in SQLITE_COLUMNS)
+    conn.execute(f"CREATE TABLE entries (id INTEGER PRIMARY KEY, {columns})")
+    # External-content FTS table: the text lives once, in entries, and is indexed here
+    conn.execute("CREATE VIRTUAL TABLE entries_fts USING fts5(title, body, content='entries', content_rowid='id')")
+
+def _column_value(value):
+    # The JSON exports use '' for fields that do not apply to an entry; store those as NULL
+    if value == '':
+        return None
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+def _entry_row(entry):
+    return tuple(_column_value(entry.get(key, '')) for key, _, _ in SQLITE_COLUMNS)
+
+# Function to save entries to a new SQLite database with indexes and a full-text index over title and body
+def save_entries_to_sqlite(entries, file_path, batch_size=SQLITE_BATCH_SIZE):
+    # Build into a temporary file with journaling off, then swap it in so readers never see a half-built database
+    temp_path = f"{file_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    conn = sqlite3.connect(temp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA cache_size = -65536")
+        _create_schema(conn)
+
+        placeholders = ', '.join('?' for _ in SQLITE_COLUMNS)
+        column_names = ', '.join(column for _, column, _ in SQLITE_COLUMNS)
+        insert_sql = f"INSERT INTO entries ({column_names}) VALUES ({placeholders})"
+        rows = map(_entry_row, entries)
+        entry_count = 0
+        with conn:
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                conn.executemany(insert_sql, batch)
+                entry_count += len(batch)
+
+            # Indexes are built once after the bulk load, which is much faster than maintaining them per insert
+            for index_name, column in SQLITE_INDEXES.items():
+                conn.execute(f"CREATE INDEX {index_name} ON entries ({column})")
+            conn.execute("INSERT INTO entries_fts (entries_fts) VALUES ('rebuild')")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+    os.replace(temp_path, file_path)
+    return entry_count
+
+def _find_entry_id(conn, entry):
+    # Same identity as incremental_export_utils.entry_key: postid, then eventid, then date and title
+    if entry.get('post.postid') not in (None, ''):
+        row = conn.execute("SELECT id FROM entries WHERE postid = ?", (entry['post.postid'],)).fetchone()
+    elif entry.get('datablogging.eventid') not in (None, ''):
+        row = conn.execute("SELECT id FROM entries WHERE eventid = ? AND postid IS NULL", (entry['datablogging.eventid'],)).fetchone()
+    else:
+        row = conn.execute("SELECT id FROM entries WHERE date = ? AND title = ?", (entry.get('date'), entry.get('title'))).fetchone()
+    return row[0] if row else None
+
+# Function to insert or replace entries in an existing export database, keeping the full-text index in step.
+# Creates the database with save_entries_to_sqlite when it does not exist yet, from the given entries only,
+# so callers passing just the new or changed entries should build a missing database from the full set instead.
+def upsert_entries_to_sqlite(entries, file_path):
+    if not os.path.exists(file_path):
+        return save_entries_to_sqlite(entries, file_path)
+
+    column_names = [column for _, column, _ in SQLITE_COLUMNS]
+    insert_sql = f"INSERT INTO entries ({', '.join(column_names)}) VALUES ({', '.join('?' for _ in column_names)})"
+    update_sql = f"UPDATE entries SET {', '.join(f'{column} = ?' for column in column_names)} WHERE id = ?"
+    title_index = column_names.index('title')
+    body_index = column_names.index('body')
+
+    conn = sqlite3.connect(file_path)
+    entry_count = 0
+    try:
+        with conn:
+            for index_name, column in SQLITE_INDEXES.items():
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON entries ({column})")
+            for entry in entries:
+                row = _entry_row(entry)
+                entry_id = _find_entry_id(conn, entry)
+                if entry_id is None:
+                    entry_id = conn.execute(insert_sql, row).lastrowid
+                else:
+                    # External-content FTS rows are removed by passing the old values back with 'delete'
+                    old_title, old_body = conn.execute("SELECT title, body FROM entries WHERE id = ?", (entry_id,)).fetchone()
+                    conn.execute("INSERT INTO entries_fts (entries_fts, rowid, title, body) VALUES ('delete', ?, ?, ?)",
+                                 (entry_id, old_title, old_body))
+                    conn.execute(update_sql, row + (entry_id,))
+                conn.execute("INSERT INTO entries_fts (rowid, title, body) VALUES (?, ?, ?)",
+                             (entry_id, row[title_index], row[body_index]))
+                entry_count += 1
+    finally:
+        conn.close()
+    return entry_count
+
+# Function to run a full-text query (FTS5 syntax) against an exported database, best matches first
+def search_entries(file_path, query, limit=50):
+    conn = sqlite3.connect(f"file:{file_path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(
+            "SELECT entries.* FROM entries_fts JOIN entries ON entries.id = entries_fts.rowid "
+            "WHERE entries_fts MATCH ? ORDER BY entries_fts.rank LIMIT ?", (query, limit)).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+import blog_sync_utils
+import metrics_utils
+import mythredz_sync_utils
+import mythredz_trello_utils
+import trello_client_utils
+import trello_mirror_utils
+
+# Fingerprints of what was last pushed per record, so a restarted daemon does not resync everything
+DAEMON_STATE_FILE = 'exported_data/sync_daemon_state.json'
+DEFAULT_INTERVAL = 300  # seconds between scheduled syncs
+SYNCS = ('blog', 'mythredz')
+
+class SyncDaemon:
+    # Keeps the parsed tables, their indexes and one Trello mirror in memory across syncs. Each cycle
+    # reloads only export files that changed and pushes only records whose cards would look different.
+    # Both syncs go through trello_client_utils.make_request, so they share one rate budget.
+    def __init__(self, api_key, token, syncs=SYNCS, mythredz_mode='off', state_file=DAEMON_STATE_FILE, rehydrate_every=0):
+        self.syncs = syncs
+        self.mythredz_mode = mythredz_mode
+        self.state_file = state_file
+        self.rehydrate_every = rehydrate_every
+        self.blog = blog_sync_utils.BlogData()
+        self.mythredz = mythredz_sync_utils.MythredzData()
+        self.mirror = trello_mirror_utils.TrelloMirror(trello_client_utils.make_request, trello_client_utils.TRELLO_API_BASE_URL, api_key, token)
+        self.state = self._load_state()
+        # Syncs with failures are rescanned next cycle even if their export files did not change
+        self.retry = set(syncs)
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+        self.status = {'cycles': 0, 'last_cycle': None, 'running': False}
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = {}
+        # Consolidated and per-post cards are keyed differently, so a mode change starts the mythredz side over
+        if state.get('mythredz_mode') != self.mythredz_mode:
+            state['mythredz'] = {}
+        state['mythredz_mode'] = self.mythredz_mode
+        state.setdefault('blog', {})
+        state.setdefault('mythredz', {})
+        return state
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+        with open(f"{self.state_file}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.state, f)
+        os.replace(f"{self.state_file}.tmp", self.state_file)
+
+    def _sync_changed(self, name, units, plan, fingerprint, push):
+        # Push the units whose plan fingerprint differs from the last pushed one; returns (pushed, failed)
+        known = self.state[name]
+        pushed = failed = 0
+        for key, unit in units:
+            unit_plan = plan(unit)
+            if unit_plan is None:
+                continue
+            digest = fingerprint(unit_plan)
+            if known.get(str(key)) == digest:
+                continue
+            try:
+                push(unit, unit_plan)
+            except requests.RequestException as e:
+                print(f"[{name}] sync failed for {key}: {e}")
+                failed += 1
+                continue
+            known[str(key)] = digest
+            pushed += 1
+        return pushed, failed
+
+    def _sync_blog(self):
+        data = self.blog
+        return self._sync_changed('blog', blog_sync_utils.sync_units(data),
+                                  lambda event: blog_sync_utils.plan_event_cards(event, data),
+                                  blog_sync_utils.plan_fingerprint,
+                                  lambda event, plan: blog_sync_utils.sync_event(event, data, self.mirror, plan=plan))
+
+    def _sync_mythredz(self):
+        data, mode = self.mythredz, self.mythredz_mode
+        return self._sync_changed('mythredz', mythredz_sync_utils.sync_units(data, mode),
+                                  lambda posts: mythredz_sync_utils.plan_unit_cards(posts, data, mode),
+                                  mythredz_sync_utils.plan_fingerprint,
+                                  lambda posts, plan: mythredz_sync_utils.sync_unit(posts, data, self.mirror, mode, plan=plan))
+
+    def run_cycle(self):
+        # Any error in one sync is logged and that sync is retried next cycle; what was pushed before it is kept
+        with self.lock:
+            self.status['running'] = True
+            started = time.perf_counter()
+            results = {}
+            try:
+                if self.rehydrate_every and self.status['cycles'] and self.status['cycles'] % self.rehydrate_every == 0:
+                    # Drop the mirror now and then to pick up boards, lists and cards changed by hand on Trello
+                    self.mirror.clear()
+                with metrics_utils.stage_timer('sync_cycle'):
+                    for name, data, sync in (('blog', self.blog, self._sync_blog), ('mythredz', self.mythredz, self._sync_mythredz)):
+                        if name not in self.syncs:
+                            continue
+                        try:
+                            with metrics_utils.stage_timer(f"refresh_{name}"):
+                                reloaded = data.refresh()
+                            if not reloaded and name not in self.retry:
+                                results[name] = {'reloaded': [], 'pushed': 0, 'failed': 0}
+                                continue
+                            with metrics_utils.stage_timer(f"sync_{name}"):
+                                pushed, failed = sync()
+                        except Exception as e:
+                            print(f"[{name}] sync cycle failed: {e!r}")
+                            self.retry.add(name)
+                            results[name] = {'reloaded': [], 'pushed': 0, 'failed': 0, 'error': repr(e)}
+                            continue
+                        self.retry.discard(name)
+                        if failed:
+                            self.retry.add(name)
+                        results[name] = {'reloaded': reloaded, 'pushed': pushed, 'failed': failed}
+            finally:
+                self.status.update(cycles=self.status['cycles'] + 1, running=False, last_cycle={
+                    'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'seconds': round(time.perf_counter() - started, 3),
+                    'results': results, 'mirror': self.mirror.stats()})
+                self._save_state()
+        print(f"Sync cycle {self.status['cycles']} finished in {self.status['last_cycle']['seconds']:.1f}s: " +
+              ', '.join(f"{name} {result['pushed']} pushed, {result['failed']} failed"
+                        + (f" (reloaded {', '.join(result['reloaded'])})" if result['reloaded'] else '')
+                        + (f" (error: {result['error']})" if 'error' in result else '')
+                        for name, result in results.items()))
+
+    def request_sync(self):
+        self.wake.set()
+
+    def stop(self):
+        self.stopping.set()
+        self.wake.set()
+
+    def run_forever(self, interval):
+        # Sync now, then every interval seconds or whenever request_sync() is called, until stop()
+        while not self.stopping.is_set():
+            try:
+                self.run_cycle()
+            except Exception as e:
+                # run_cycle keeps its own errors per sync; this covers the rest (say, the state file), so the daemon stays up
+                print(f"Sync cycle failed: {e!r}")
+            self.wake.wait(interval)
+            self.wake.clear()
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    # POST /sync runs a sync now; GET /status reports the last cycle; GET /metrics serves Prometheus text
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/json; charset=utf-8'):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/status':
+            return self._send(200, json.dumps(self.server.sync_daemon.status))
+        if self.path == '/metrics':
+            return self._send(200, metrics_utils.format_prometheus(metrics_utils.snapshot()), 'text/plain; version=0.0.4')
+        self._send(404, json.dumps({'error': 'not found'}))
+
+    def do_POST(self):
+        if self.path == '/sync':
+            self.server.sync_daemon.request_sync()
+            return self._send(202, json.dumps({'queued': True}))
+        self._send(404, json.dumps({'error': 'not found'}))
+
+def start_control_server(daemon, port, host='127.0.0.1'):
+    server = ThreadingHTTPServer((host, port), DaemonRequestHandler)
+    server.daemon_threads = True
+    server.sync_daemon = daemon
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the blog and mythredz Trello syncs resident, pushing new and changed records "
+                                                 "on a schedule or on demand without reloading everything each time")
+    parser.add_argument('--syncs', nargs='+', choices=SYNCS, default=list(SYNCS))
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help="Seconds between scheduled syncs")
+    parser.add_argument('--once', action='store_true', help="Run one sync cycle and exit")
+    parser.add_argument('--port', type=int, help="Serve POST /sync, GET /status and GET /metrics on this local port")
+    parser.add_argument('--rehydrate-every', type=int, default=0,
+                        help="Re-read boards, lists and cards from Trello every N cycles (0: only at start)")
+    parser.add_argument('--state-file', default=DAEMON_STATE_FILE)
+    args = parser.parse_args()
+
+    api_keys = trello_client_utils.load_api_keys('api_keys_and_tokens.txt')
+    daemon = SyncDaemon(api_keys['trello_api_key'], api_keys['trello_token'], syncs=args.syncs,
+                        mythredz_mode=mythredz_trello_utils.consolidation_mode(), state_file=args.state_file,
+                        rehydrate_every=args.rehydrate_every)
+
+    if args.once:
+        daemon.run_cycle()
+        metrics_utils.dump_metrics('sync_daemon')
+        return
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    if hasattr(signal, 'SIGUSR1'):
+        # kill -USR1 <pid> asks for a sync without waiting for the schedule
+        signal.signal(signal.SIGUSR1, lambda signum, frame: daemon.request_sync())
+    if args.port:
+        start_control_server(daemon, args.port)
+        print(f"Control server on http://127.0.0.1:{args.port} (POST /sync, GET /status, GET /metrics)")
+
+    print(f"Syncing {', '.join(args.syncs)} every {args.interval:g}s; pid {os.getpid()}")
+    try:
+        daemon.run_forever(args.interval)
+    except KeyboardInterrupt:
+        pass
+    metrics_utils.dump_metrics('sync_daemon')
+
+if __name__ == "__main__":
+    main()
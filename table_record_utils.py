@@ -0,0 +1,148 @@
+import json
+import sys
+
+# Columns each script actually reads from the MySQL exports; everything else is dropped on load
+TABLE_FIELDS = {
+    'event': ('eventid', 'logid', 'accountid', 'date', 'title', 'comments'),
+    'megalog': ('logid', 'name'),
+    'image': ('imageid', 'eventid', 'filename', 'description', 'imageorder'),
+    'thred': ('thredid', 'userid', 'name'),
+    'post': ('postid', 'thredid', 'date', 'contents')
+}
+
+# Long text columns kept as UTF-8 bytes and only decoded when read
+LAZY_TEXT_FIELDS = {
+    'event': ('comments',),
+    'image': ('description',)
+}
+
+# Category names repeat across every entry that uses them, so one shared string is kept per name
+INTERNED_FIELDS = {
+    'megalog': ('name',),
+    'thred': ('name',)
+}
+
+JSON_CHUNK_SIZE = 1024 * 1024
+
+class TableRecord:
+    # A row with only the projected columns, stored in __slots__. It supports the read-only dict access
+    # the scripts use (record['date'], record.get('description', '')), so it can stand in for a loaded row.
+    # Columns missing from a row are left unset and behave like a missing key.
+    __slots__ = ()
+    _fields = ()
+    _field_set = frozenset()
+    _lazy_fields = frozenset()
+
+    def __getitem__(self, key):
+        if key not in self._field_set:
+            raise KeyError(key)
+        try:
+            value = getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+        if key in self._lazy_fields and value is not None:
+            return value.decode('utf-8', 'surrogatepass')
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in self._field_set and hasattr(self, key)
+
+    def keys(self):
+        return [field for field in self._fields if hasattr(self, field)]
+
+    def items(self):
+        return [(field, self[field]) for field in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+_record_types = {}
+
+def record_type(table):
+    # One TableRecord subclass per table, created on first use
+    if table not in _record_types:
+        fields = TABLE_FIELDS[table]
+        _record_types[table] = type(f"{table.title()}Record", (TableRecord,), {
+            '__slots__': fields,
+            '_fields': fields,
+            '_field_set': frozenset(fields),
+            '_lazy_fields': frozenset(LAZY_TEXT_FIELDS.get(table, ()))
+        })
+    return _record_types[table]
+
+def _record_builder(table):
+    cls = record_type(table)
+    fields = TABLE_FIELDS[table]
+    lazy_fields = set(LAZY_TEXT_FIELDS.get(table, ()))
+    interned_fields = set(INTERNED_FIELDS.get(table, ()))
+
+    def build(row):
+        record = cls.__new__(cls)
+        for field in fields:
+            if field not in row:
+                continue
+            value = row[field]
+            if isinstance(value, str):
+                if field in lazy_fields:
+                    value = value.encode('utf-8', 'surrogatepass')
+                elif field in interned_fields:
+                    value = sys.intern(value)
+            setattr(record, field, value)
+        return record
+    return build
+
+# Function to yield the objects of a top-level JSON array one at a time, reading the file in chunks,
+# so only one row is ever held as a full dict
+def iter_json_array(file_path, chunk_size=JSON_CHUNK_SIZE):
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        position = 0
+        started = False
+        at_eof = False
+        while True:
+            # Skip whitespace, the opening bracket and separators, reading more when the buffer runs out
+            while position < len(buffer) and (buffer[position].isspace() or buffer[position] == ',' or
+                                              (not started and buffer[position] == '[')):
+                started = started or buffer[position] == '['
+                position += 1
+            if position < len(buffer) and not started:
+                raise ValueError(f"{file_path} does not contain a JSON array")
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            if position >= len(buffer) or not started:
+                if at_eof:
+                    if started:
+                        raise ValueError(f"Unexpected end of JSON array in {file_path}")
+                    return
+                chunk = f.read(chunk_size)
+                at_eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            try:
+                value, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The next object runs past the end of the buffer
+                if at_eof:
+                    raise
+                chunk = f.read(chunk_size)
+                at_eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield value
+
+# Function to load a MySQL export table as compact records holding only the columns the scripts use
+def load_table(file_path, table):
+    build = _record_builder(table)
+    return [build(row) for row in iter_json_array(file_path)]
@@ -0,0 +1,33 @@
+from datetime import datetime
+
+# Function to pick the "Out with the Old" board for a date, with the base date and span its list positions
+# are measured against: one board per year from 2000, one per decade before that
+def board_for_date(event_date):
+    if event_date.year < 2000:
+        if event_date.year < 1980:
+            board_name = "Out with the Old 1970s Edition"
+            base_date = datetime(1970, 1, 1)
+        elif event_date.year < 1990:
+            board_name = "Out with the Old 1980s Edition"
+            base_date = datetime(1980, 1, 1)
+        else:
+            board_name = "Out with the Old 1990s Edition"
+            base_date = datetime(1990, 1, 1)
+        total_units = (datetime(base_date.year + 10, 1, 1) - base_date).days
+    else:
+        board_name = f"Out with the Old {event_date.year} Edition"
+        base_date = datetime(event_date.year, 1, 1)
+        total_units = (datetime(event_date.year + 1, 1, 1) - base_date).days
+    return board_name, base_date, total_units
+
+# Function to name the day list for a date (without zero-padding the day); decade boards add the year
+def list_name_for_date(event_date):
+    list_name = event_date.strftime('%a %b').upper() + f" {event_date.day}"
+    if event_date.year < 2000:
+        list_name += f" {event_date.year}"
+    return list_name
+
+# Function to calculate a deterministic position based on the event date
+def calculate_pos(event_date, base_date, total_units):
+    days_since_start = (event_date - base_date).days
+    return (1 - (days_since_start / total_units)) * 1000  # Inverse and normalize to Trello pos range
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from ratelimit import limits, sleep_and_retry
+import metrics_utils
+
+# Trello rate limits; one budget shared by every sync, backup and upload thread in the process
+TRELLO_RATE_LIMIT = 100  # number of requests
+TRELLO_RATE_LIMIT_PERIOD = 10  # seconds
+
+# Trello API base URL; point TRELLO_API_BASE_URL at trello_emulator.py to run syncs offline
+TRELLO_API_BASE_URL = os.environ.get('TRELLO_API_BASE_URL', 'https://api.trello.com/1').rstrip('/')
+
+# Connections kept open to Trello; the media uploads and the backup run up to this many threads
+POOL_SIZE = 16
+
+# Responses retried by make_request. Each retry goes through the rate limiter again, and a 429 waits for Retry-After.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_METHODS = ('HEAD', 'GET', 'OPTIONS', 'POST', 'PUT')
+MAX_RETRIES = 5
+RETRY_BACKOFF = 1  # seconds, doubled on every retry
+
+# Function to create a requests session with retry strategy
+def create_session_with_retries(pool_size=POOL_SIZE):
+    session = requests.Session()
+    # urllib3 only retries connections that fail; status codes are retried by make_request, so they count against the budget
+    retries = Retry(total=MAX_RETRIES, backoff_factor=RETRY_BACKOFF, status_forcelist=[], allowed_methods=RETRY_METHODS)
+    adapter = HTTPAdapter(max_retries=retries, pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+# The session is created on first use, so importing this module opens no connections
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session_with_retries()
+    return _session
+
+# Rate limiting decorator; blocks until the next request fits in Trello's rate budget (thread safe)
+@sleep_and_retry
+@limits(calls=TRELLO_RATE_LIMIT, period=TRELLO_RATE_LIMIT_PERIOD)
+def acquire_rate_limit():
+    pass
+
+def _retry_delay(response, attempt):
+    retry_after = response.headers.get('Retry-After')
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+    return RETRY_BACKOFF * 2 ** attempt
+
+def _rewind_files(files):
+    # An upload that is sent again has to start from the beginning of its file
+    for value in (files or {}).values():
+        file_obj = value[1] if isinstance(value, tuple) else value
+        if hasattr(file_obj, 'seek'):
+            file_obj.seek(0)
+
+# Function to make a rate limited request, retrying 429 and 5xx responses, and recording wait time,
+# latency, retries and upload size
+def make_request(method, url, **kwargs):
+    bytes_uploaded = metrics_utils.upload_size(kwargs.get('files'))
+    for attempt in range(MAX_RETRIES + 1):
+        wait_started = time.perf_counter()
+        acquire_rate_limit()
+        metrics_utils.record_rate_limit_wait(time.perf_counter() - wait_started)
+
+        started = time.perf_counter()
+        try:
+            response = get_session().request(method, url, **kwargs)
+        except requests.RequestException:
+            metrics_utils.record_request(method, url, time.perf_counter() - started)
+            raise
+        metrics_utils.record_request(method, url, time.perf_counter() - started, response.status_code,
+                                     metrics_utils.retry_count(response) + (1 if attempt else 0), bytes_uploaded)
+        if (response.status_code not in RETRY_STATUSES or method.upper() not in RETRY_METHODS
+                or attempt == MAX_RETRIES):
+            break
+        metrics_utils.timed_sleep(_retry_delay(response, attempt), 'trello_retry')
+        _rewind_files(kwargs.get('files'))
+    response.raise_for_status()
+    return response
+
+# Function to load API keys and tokens from a text file
+def load_api_keys(file_path):
+    api_keys = {}
+    with open(file_path, 'r') as file:
+        for line in file:
+            key, value = line.strip().split('=')
+            api_keys[key] = value
+    return api_keys
@@ -0,0 +1,420 @@
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Trello's documented limits: 100 requests per 10 seconds per token and 300 per 10 seconds per API key
+DEFAULT_TOKEN_LIMIT = 100
+DEFAULT_KEY_LIMIT = 300
+DEFAULT_LIMIT_WINDOW = 10
+MAX_DESC_LENGTH = 16384
+
+# Route table: (method, path pattern, handler name). Ids in reported endpoints are replaced with {id}.
+ROUTES = [
+    ('GET', r'/1/members/me/boards', 'get_member_boards'),
+    ('POST', r'/1/boards/?', 'create_board'),
+    ('GET', r'/1/boards/(?P<board_id>\w+)/lists', 'get_board_lists'),
+    ('GET', r'/1/boards/(?P<board_id>\w+)/cards', 'get_board_cards'),
+    ('GET', r'/1/boards/(?P<board_id>\w+)/actions', 'get_board_actions'),
+    ('POST', r'/1/lists', 'create_list'),
+    ('PUT', r'/1/lists/(?P<list_id>\w+)', 'update_list'),
+    ('GET', r'/1/lists/(?P<list_id>\w+)/cards', 'get_list_cards'),
+    ('POST', r'/1/cards', 'create_card'),
+    ('PUT', r'/1/cards/(?P<card_id>\w+)', 'update_card'),
+    ('GET', r'/1/cards/(?P<card_id>\w+)/attachments', 'get_card_attachments'),
+    ('POST', r'/1/cards/(?P<card_id>\w+)/attachments', 'create_card_attachment'),
+    ('POST', r'/1/cards/(?P<card_id>\w+)/actions/comments', 'create_card_comment')
+]
+COMPILED_ROUTES = [(method, re.compile(pattern + r'$'), handler) for method, pattern, handler in ROUTES]
+ENDPOINT_LABELS = {handler: f"{method} " + re.sub(r'\(\?P<\w+>[^)]*\)', '{id}', pattern.replace('/?', ''))
+                   for method, pattern, handler in ROUTES}
+
+class EmulatorError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def new_emulator_state(config):
+    return {
+        'config': config,
+        'lock': threading.Lock(),
+        'ids': itertools.count(1),
+        'boards': {},
+        'lists': {},
+        'cards': {},
+        'attachments': {},
+        'comments': {},
+        # Secondary indexes so list and card lookups stay cheap on boards with tens of thousands of cards
+        'board_lists': {},
+        'list_cards': {},
+        'request_times': {},
+        'random': random.Random(config['seed']),
+        'stats': new_emulator_stats()
+    }
+
+def new_emulator_stats():
+    return {'requests': 0, 'requests_by_endpoint': {}, 'rate_limited': 0, 'injected_errors': 0,
+            'bytes_uploaded': 0, 'started_at': time.time()}
+
+def _new_id(state):
+    # Trello ids are 24 hex digits that sort by creation time; a zero-padded counter has the same property
+    return f"{next(state['ids']):024x}"
+
+def _select_fields(obj, fields):
+    if not fields or fields == 'all':
+        return dict(obj)
+    selected = {'id': obj['id']}
+    for field in fields.split(','):
+        if field in obj:
+            selected[field] = obj[field]
+    return selected
+
+def _require(params, name):
+    value = params.get(name)
+    if value is None or value == '':
+        raise EmulatorError(400, f"invalid value for {name}")
+    return value
+
+def _lookup(collection, object_id, kind):
+    if object_id not in collection:
+        raise EmulatorError(404, f"The requested {kind} resource was not found.")
+    return collection[object_id]
+
+def _parse_pos(value, existing_positions):
+    if value in (None, '', 'bottom'):
+        return max(existing_positions, default=0) + 16384
+    if value == 'top':
+        return min(existing_positions, default=16384) / 2
+    try:
+        return float(value)
+    except ValueError:
+        raise EmulatorError(400, "invalid value for pos")
+
+def get_member_boards(state, params, files):
+    return [_select_fields(board, params.get('fields')) for board in state['boards'].values() if not board['closed']]
+
+def create_board(state, params, files):
+    board = {'id': _new_id(state), 'name': _require(params, 'name'), 'desc': '', 'closed': False,
+             'prefs': {'permissionLevel': params.get('prefs_permissionLevel', 'private')}}
+    state['boards'][board['id']] = board
+    return board
+
+def get_board_lists(state, params, files, board_id):
+    _lookup(state['boards'], board_id, 'board')
+    lists = [state['lists'][list_id] for list_id in state['board_lists'].get(board_id, [])]
+    lists = [lst for lst in lists if not lst['closed']]
+    lists.sort(key=lambda lst: lst['pos'])
+    return [_select_fields(lst, params.get('fields')) for lst in lists]
+
+def create_list(state, params, files):
+    board_id = _require(params, 'idBoard')
+    _lookup(state['boards'], board_id, 'board')
+    positions = [state['lists'][list_id]['pos'] for list_id in state['board_lists'].get(board_id, [])]
+    lst = {'id': _new_id(state), 'name': _require(params, 'name'), 'idBoard': board_id, 'closed': False,
+           'pos': _parse_pos(params.get('pos'), positions)}
+    state['lists'][lst['id']] = lst
+    state['board_lists'].setdefault(board_id, []).append(lst['id'])
+    return lst
+
+def update_list(state, params, files, list_id):
+    lst = _lookup(state['lists'], list_id, 'list')
+    if 'name' in params:
+        lst['name'] = _require(params, 'name')
+    if 'pos' in params:
+        positions = [state['lists'][other_id]['pos'] for other_id in state['board_lists'].get(lst['idBoard'], [])]
+        lst['pos'] = _parse_pos(params['pos'], positions)
+    return lst
+
+def _page(items, params, default_limit=1000):
+    # Paged requests come back newest first, and 'before' pages towards older items
+    items.sort(key=lambda item: item['id'], reverse=True)
+    if params.get('before'):
+        items = [item for item in items if item['id'] < params['before']]
+    return items[:min(int(params.get('limit') or default_limit), 1000)]
+
+def _card_fields(state, card, params):
+    selected = _select_fields(card, params.get('fields'))
+    if params.get('attachments') == 'true':
+        selected['attachments'] = [_select_fields(attachment, params.get('attachment_fields'))
+                                   for attachment in state['attachments'].get(card['id'], [])]
+    return selected
+
+def get_list_cards(state, params, files, list_id):
+    _lookup(state['lists'], list_id, 'list')
+    cards = [state['cards'][card_id] for card_id in state['list_cards'].get(list_id, [])]
+    cards = [card for card in cards if not card['closed']]
+    if 'limit' in params or 'before' in params:
+        cards = _page(cards, params)
+    else:
+        cards.sort(key=lambda card: card['pos'])
+    return [_card_fields(state, card, params) for card in cards]
+
+def get_board_cards(state, params, files, board_id):
+    _lookup(state['boards'], board_id, 'board')
+    card_filter = params.get('filter', 'open')
+    cards = [card for list_id in state['board_lists'].get(board_id, []) for card in
+             (state['cards'][card_id] for card_id in state['list_cards'].get(list_id, []))
+             if card_filter == 'all' or card['closed'] == (card_filter == 'closed')]
+    if 'limit' in params or 'before' in params:
+        cards = _page(cards, params)
+    return [_card_fields(state, card, params) for card in cards]
+
+def get_board_actions(state, params, files, board_id):
+    # Only comment actions are recorded, so any other filter matches nothing
+    _lookup(state['boards'], board_id, 'board')
+    action_filters = params.get('filter', 'all').split(',')
+    if 'all' not in action_filters and 'commentCard' not in action_filters:
+        return []
+    actions = [action for card_id, comments in state['comments'].items()
+               if state['cards'][card_id]['idBoard'] == board_id for action in comments]
+    return _page(actions, params, default_limit=50)
+
+def create_card(state, params, files):
+    list_id = _require(params, 'idList')
+    lst = _lookup(state['lists'], list_id, 'list')
+    desc = params.get('desc', '')
+    if len(desc) > MAX_DESC_LENGTH:
+        raise EmulatorError(400, "invalid value for desc")
+    positions = [state['cards'][card_id]['pos'] for card_id in state['list_cards'].get(list_id, [])]
+    card = {'id': _new_id(state), 'name': params.get('name', ''), 'desc': desc, 'idList': list_id,
+            'idBoard': lst['idBoard'], 'closed': False, 'pos': _parse_pos(params.get('pos'), positions)}
+    state['cards'][card['id']] = card
+    state['list_cards'].setdefault(list_id, []).append(card['id'])
+    return card
+
+def update_card(state, params, files, card_id):
+    card = _lookup(state['cards'], card_id, 'card')
+    if 'desc' in params:
+        if len(params['desc']) > MAX_DESC_LENGTH:
+            raise EmulatorError(400, "invalid value for desc")
+        card['desc'] = params['desc']
+    if 'name' in params:
+        card['name'] = params['name']
+    if 'idList' in params and params['idList'] != card['idList']:
+        new_list = _lookup(state['lists'], params['idList'], 'list')
+        state['list_cards'][card['idList']].remove(card_id)
+        state['list_cards'].setdefault(new_list['id'], []).append(card_id)
+        card['idList'] = new_list['id']
+        card['idBoard'] = new_list['idBoard']
+    if 'closed' in params:
+        card['closed'] = str(params['closed']).lower() == 'true'
+    return card
+
+def get_card_attachments(state, params, files, card_id):
+    _lookup(state['cards'], card_id, 'card')
+    return [_select_fields(attachment, params.get('fields')) for attachment in state['attachments'].get(card_id, [])]
+
+def create_card_attachment(state, params, files, card_id):
+    _lookup(state['cards'], card_id, 'card')
+    upload = files.get('file')
+    if upload is None and not params.get('url'):
+        raise EmulatorError(400, "invalid value for file")
+    name, content = upload if upload else (params['url'].rsplit('/', 1)[-1], b'')
+    attachment = {'id': _new_id(state), 'name': params.get('name') or name, 'bytes': len(content),
+                  'date': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime()), 'isUpload': upload is not None,
+                  'url': params.get('url') or f"https://trello.example/attachments/{card_id}/{name}"}
+    state['attachments'].setdefault(card_id, []).append(attachment)
+    state['stats']['bytes_uploaded'] += len(content)
+    return attachment
+
+def create_card_comment(state, params, files, card_id):
+    card = _lookup(state['cards'], card_id, 'card')
+    action = {'id': _new_id(state), 'type': 'commentCard',
+              'data': {'text': _require(params, 'text'), 'card': {'id': card_id, 'name': card['name']}, 'board': {'id': card['idBoard']}},
+              'date': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime())}
+    state['comments'].setdefault(card_id, []).append(action)
+    return action
+
+def _over_limit(state, bucket, limit, now):
+    # Sliding-window limiter; records the request when it is allowed
+    window = state['config']['limit_window']
+    times = state['request_times'].setdefault(bucket, deque())
+    while times and times[0] <= now - window:
+        times.popleft()
+    if limit and len(times) >= limit:
+        return True
+    times.append(now)
+    return False
+
+def endpoint_label(method, path):
+    for route_method, pattern, handler_name in COMPILED_ROUTES:
+        if route_method == method and pattern.match(path):
+            return ENDPOINT_LABELS[handler_name]
+    return f"{method} {path}"
+
+def handle_request(state, method, path, params, files):
+    # Returns (status, payload) for one API call, applying rate limits and error injection first
+    config = state['config']
+    label = endpoint_label(method, path)
+    with state['lock']:
+        stats = state['stats']
+        stats['requests'] += 1
+        stats['requests_by_endpoint'][label] = stats['requests_by_endpoint'].get(label, 0) + 1
+
+        key = params.get('key')
+        token = params.get('token')
+        if not key or not token:
+            return 401, 'invalid key'
+
+        now = time.monotonic()
+        if _over_limit(state, ('token', token), config['token_limit'], now):
+            stats['rate_limited'] += 1
+            return 429, {'error': 'API_TOKEN_LIMIT_EXCEEDED', 'message': 'Rate limit exceeded for this token'}
+        if _over_limit(state, ('key', key), config['key_limit'], now):
+            stats['rate_limited'] += 1
+            return 429, {'error': 'API_KEY_LIMIT_EXCEEDED', 'message': 'Rate limit exceeded for this API key'}
+
+        if config['error_rate'] and state['random'].random() < config['error_rate']:
+            stats['injected_errors'] += 1
+            return config['error_status'], {'message': 'Injected error'}
+
+        for route_method, pattern, handler_name in COMPILED_ROUTES:
+            match = pattern.match(path)
+            if match and route_method == method:
+                try:
+                    return 200, globals()[handler_name](state, params, files, **match.groupdict())
+                except EmulatorError as e:
+                    return e.status, e.message
+        return 404, 'Cannot ' + f"{method} {path}"
+
+def _parse_multipart(content_type, body):
+    params = {}
+    files = {}
+    message = BytesParser(policy=policy.default).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body)
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        filename = part.get_filename()
+        content = part.get_payload(decode=True) or b''
+        if filename is not None:
+            files[name] = (filename, content)
+        else:
+            params[name] = content.decode('utf-8')
+    return params, files
+
+class TrelloEmulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.state['config']['verbose']:
+            super().log_message(format, *args)
+
+    def _read_request(self):
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query, keep_blank_values=True).items()}
+        files = {}
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        content_type = self.headers.get('Content-Type', '')
+        if body and content_type.startswith('multipart/form-data'):
+            form, files = _parse_multipart(content_type, body)
+            params.update(form)
+        elif body and content_type.startswith('application/x-www-form-urlencoded'):
+            params.update({name: values[-1] for name, values in parse_qs(body.decode('utf-8'), keep_blank_values=True).items()})
+        elif body and content_type.startswith('application/json'):
+            params.update({name: str(value) for name, value in json.loads(body).items()})
+        return url.path, params, files
+
+    def _send(self, status, payload, headers=None):
+        if isinstance(payload, str):
+            body = payload.encode('utf-8')
+            content_type = 'text/plain; charset=utf-8'
+        else:
+            body = json.dumps(payload).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, method):
+        path, params, files = self._read_request()
+        state = self.server.state
+        if path == '/_emulator/stats':
+            with state['lock']:
+                stats = dict(state['stats'], boards=len(state['boards']), lists=len(state['lists']), cards=len(state['cards']),
+                             elapsed_seconds=round(time.time() - state['stats']['started_at'], 3))
+            return self._send(200, stats)
+        if path == '/_emulator/reset' and method == 'POST':
+            with state['lock']:
+                state['stats'] = new_emulator_stats()
+                state['request_times'].clear()
+                if params.get('data') == 'true':
+                    for collection in ('boards', 'lists', 'cards', 'attachments', 'comments', 'board_lists', 'list_cards'):
+                        state[collection].clear()
+            return self._send(200, {'reset': True})
+
+        config = state['config']
+        if config['latency_ms'] or config['jitter_ms']:
+            time.sleep(max(0.0, config['latency_ms'] + random.uniform(-config['jitter_ms'], config['jitter_ms'])) / 1000)
+
+        status, payload = handle_request(state, method, path, params, files)
+        headers = {'Retry-After': str(config['limit_window'])} if status == 429 else None
+        self._send(status, payload, headers)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+def emulator_config(latency_ms=0, jitter_ms=0, token_limit=DEFAULT_TOKEN_LIMIT, key_limit=DEFAULT_KEY_LIMIT,
+                    limit_window=DEFAULT_LIMIT_WINDOW, error_rate=0.0, error_status=500, verbose=False, seed=None):
+    return {'latency_ms': latency_ms, 'jitter_ms': jitter_ms, 'token_limit': token_limit, 'key_limit': key_limit,
+            'limit_window': limit_window, 'error_rate': error_rate, 'error_status': error_status, 'verbose': verbose,
+            'seed': seed}
+
+def start_emulator(host='127.0.0.1', port=0, **config):
+    # Start the emulator on a background thread; returns the server, whose base_url points at the /1 API root
+    config = emulator_config(**config)
+    server = ThreadingHTTPServer((host, port), TrelloEmulatorHandler)
+    server.daemon_threads = True
+    server.state = new_emulator_state(config)
+    server.base_url = f"http://{host}:{server.server_address[1]}/1"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Trello REST API used by the sync scripts")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0, help="Added latency per request")
+    parser.add_argument('--jitter-ms', type=float, default=0, help="Random +/- variation on the latency")
+    parser.add_argument('--token-limit', type=int, default=DEFAULT_TOKEN_LIMIT, help="Requests per window per token (0 disables)")
+    parser.add_argument('--key-limit', type=int, default=DEFAULT_KEY_LIMIT, help="Requests per window per API key (0 disables)")
+    parser.add_argument('--limit-window', type=float, default=DEFAULT_LIMIT_WINDOW, help="Rate limit window in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with an injected error")
+    parser.add_argument('--error-status', type=int, default=500, help="HTTP status for injected errors")
+    parser.add_argument('--seed', type=int, help="Seed for error injection")
+    parser.add_argument('--verbose', action='store_true', help="Log every request")
+    args = parser.parse_args()
+
+    server = start_emulator(args.host, args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                            token_limit=args.token_limit, key_limit=args.key_limit, limit_window=args.limit_window,
+                            error_rate=args.error_rate, error_status=args.error_status, verbose=args.verbose, seed=args.seed)
+    print(f"Trello emulator listening; set TRELLO_API_BASE_URL={server.base_url}")
+    print(f"Request statistics: http://{args.host}:{server.server_address[1]}/_emulator/stats")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import re
+import time
+import serialization_utils
+# The backup threads share the one Trello client, with its rate budget and connection pool
+from trello_client_utils import TRELLO_API_BASE_URL, make_request
+
+# Boards backed up at once; each one pages through its cards and comments on its own thread
+BACKUP_WORKERS = 8
+
+# Trello returns at most 1000 cards or actions per request; older ones are paged with 'before'
+TRELLO_PAGE_LIMIT = 1000
+
+# Boards the sync scripts create; the backup covers only these unless asked for every board
+BOARD_NAME_PREFIX = 'Out with the Old'
+
+MANIFEST_NAME = 'manifest.json'
+BACKUP_FORMAT_VERSION = 1
+
+BOARD_FIELDS = 'name,desc,closed,url,dateLastActivity'
+LIST_FIELDS = 'name,pos,closed,idBoard'
+CARD_FIELDS = 'name,desc,idList,idBoard,pos,closed,due,labels,url,dateLastActivity'
+ATTACHMENT_FIELDS = 'name,bytes,date,mimeType,isUpload,url'
+
+# Function to get the member's open boards, optionally only the "Out with the Old" ones
+def get_boards(api_key, token, all_boards=False):
+    url = f"{TRELLO_API_BASE_URL}/members/me/boards"
+    query = {'key': api_key, 'token': token, 'fields': BOARD_FIELDS}
+    boards = make_request('GET', url, params=query).json()
+    if all_boards:
+        return boards
+    return [board for board in boards if board['name'].startswith(BOARD_NAME_PREFIX)]
+
+# Function to get every list on a board, archived ones included
+def get_board_lists(board_id, api_key, token):
+    url = f"{TRELLO_API_BASE_URL}/boards/{board_id}/lists"
+    query = {'key': api_key, 'token': token, 'filter': 'all', 'fields': LIST_FIELDS}
+    return make_request('GET', url, params=query).json()
+
+# Function to yield pages of a board collection, newest first, until a short page shows the oldest was reached
+def iter_pages(url, query):
+    before = None
+    while True:
+        params = dict(query, limit=TRELLO_PAGE_LIMIT)
+        if before:
+            params['before'] = before
+        page = make_request('GET', url, params=params).json()
+        if page:
+            yield page
+        if len(page) < TRELLO_PAGE_LIMIT:
+            return
+        # Trello ids sort by creation time, so the smallest id on the page is where the next page starts
+        before = min(item['id'] for item in page)
+
+# Function to page through every card on a board, archived ones included, with attachment metadata inline
+def iter_board_cards(board_id, api_key, token):
+    url = f"{TRELLO_API_BASE_URL}/boards/{board_id}/cards"
+    query = {'key': api_key, 'token': token, 'filter': 'all', 'fields': CARD_FIELDS,
+             'attachments': 'true', 'attachment_fields': ATTACHMENT_FIELDS}
+    return iter_pages(url, query)
+
+# Function to page through the comment actions on a board
+def iter_board_comments(board_id, api_key, token):
+    url = f"{TRELLO_API_BASE_URL}/boards/{board_id}/actions"
+    query = {'key': api_key, 'token': token, 'filter': 'commentCard'}
+    return iter_pages(url, query)
+
+# Function to turn a board name into a file name
+def board_file_name(board):
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', board['name']).strip('_') or 'board'
+    return f"{slug}_{board['id']}.jsonl"
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _write_record(f, record_type, obj):
+    f.write(serialization_utils.dumps(dict(obj, record=record_type), ensure_ascii=False))
+    f.write('\n')
+
+# Function to back up one board into a JSON Lines file: a board record, then its lists, cards
+# (with attachment metadata) and comments, one record per line tagged by 'record'.
+# Pages are written as they arrive, so memory stays flat on large boards. Returns the board's manifest item.
+def backup_board(board, output_dir, api_key, token):
+    file_name = board_file_name(board)
+    file_path = os.path.join(output_dir, file_name)
+    counts = {'lists': 0, 'cards': 0, 'attachments': 0, 'comments': 0}
+    with open(f"{file_path}.tmp", 'w', encoding='utf-8', newline='\n') as f:
+        _write_record(f, 'board', board)
+        for lst in get_board_lists(board['id'], api_key, token):
+            _write_record(f, 'list', lst)
+            counts['lists'] += 1
+        for page in iter_board_cards(board['id'], api_key, token):
+            for card in page:
+                _write_record(f, 'card', card)
+                counts['cards'] += 1
+                counts['attachments'] += len(card.get('attachments', ()))
+        for page in iter_board_comments(board['id'], api_key, token):
+            for action in page:
+                _write_record(f, 'comment', action)
+                counts['comments'] += 1
+    # Only a board that was read to the end replaces an earlier file of the same name
+    os.replace(f"{file_path}.tmp", file_path)
+    return dict({'id': board['id'], 'name': board['name'], 'file': file_name,
+                 'bytes': os.path.getsize(file_path), 'sha256': _file_sha256(file_path)}, **counts)
+
+def save_backup_manifest(boards, output_dir):
+    manifest = {
+        'version': BACKUP_FORMAT_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'boards': sorted(boards, key=lambda board: board['name'])
+    }
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(f"{manifest_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    return manifest
+
+# Function to read the records of a board backup file, optionally only one record type
+def iter_backup_records(file_path, record_type=None):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if record_type is None or record['record'] == record_type:
+                yield record
@@ -0,0 +1,142 @@
+import os
+
+# Trello returns at most 1000 cards per request; older ones are paged with 'before'
+TRELLO_PAGE_LIMIT = 1000
+
+class TrelloMirror:
+    # Local copy of the board, list, card and attachment ids the syncs have seen. Each board's lists,
+    # each list's cards and each card's attachments are fetched once, on first use, and kept up to date
+    # as the sync creates things, so repeated lookups cost no requests. make_request is the rate-limited
+    # request function to use, normally trello_client_utils.make_request.
+    # Write methods return the id of the list, card, attachment or comment they wrote.
+    def __init__(self, make_request, base_url, api_key, token):
+        self.make_request = make_request
+        self.base_url = base_url
+        self.api_key = api_key
+        self.token = token
+        self.clear()
+
+    def clear(self):
+        # Forget everything, so the next lookups re-read Trello (picks up changes made outside the syncs)
+        self.boards = None
+        self.board_lists = {}
+        self.list_cards = {}
+        self.card_attachments = {}
+
+    def _auth(self, **params):
+        return dict(params, key=self.api_key, token=self.token)
+
+    def stats(self):
+        return {'boards': len(self.boards or ()), 'lists': sum(map(len, self.board_lists.values())),
+                'cards': sum(map(len, self.list_cards.values())), 'attachment_sets': len(self.card_attachments)}
+
+    def board_id(self, board_name):
+        # Returns the board's id, creating the board if it does not exist
+        if self.boards is None:
+            response = self.make_request('GET', f"{self.base_url}/members/me/boards", params=self._auth(fields='name'))
+            self.boards = {}
+            for board in response.json():
+                self.boards.setdefault(board['name'], board['id'])
+        if board_name not in self.boards:
+            query = self._auth(name=board_name, defaultLists='false', prefs_permissionLevel='private')
+            response = self.make_request('POST', f"{self.base_url}/boards/", params=query)
+            self.boards[board_name] = response.json()['id']
+            # A new board has no lists yet
+            self.board_lists[self.boards[board_name]] = {}
+            print(f"Created new board: {board_name} (ID: {self.boards[board_name]})")
+        return self.boards[board_name]
+
+    def _lists(self, board_id):
+        if board_id not in self.board_lists:
+            response = self.make_request('GET', f"{self.base_url}/boards/{board_id}/lists", params=self._auth(fields='name,pos'))
+            self.board_lists[board_id] = {}
+            for lst in response.json():
+                self.board_lists[board_id].setdefault(lst['name'], {'id': lst['id'], 'pos': lst['pos']})
+        return self.board_lists[board_id]
+
+    def list_id(self, board_id, list_name, pos, update_pos=False):
+        # Returns the list id. A missing list is created at pos; with update_pos an existing list is moved
+        # to pos when it is somewhere else.
+        lists = self._lists(board_id)
+        lst = lists.get(list_name)
+        if lst is None:
+            url = f"{self.base_url}/lists"
+            query = self._auth(name=list_name, idBoard=board_id, pos=pos)
+            response = self.make_request('POST', url, params=query)
+            lst = lists[list_name] = {'id': response.json()['id'], 'pos': pos}
+            self.list_cards[lst['id']] = {}
+            return lst['id']
+        if update_pos and lst['pos'] != pos:
+            url = f"{self.base_url}/lists/{lst['id']}"
+            query = self._auth(pos=pos)
+            self.make_request('PUT', url, params=query)
+            lst['pos'] = pos
+        return lst['id']
+
+    def cards(self, list_id):
+        # Returns {name: {'id', 'desc'}} for the open cards of a list, paging through lists over 1000 cards
+        if list_id not in self.list_cards:
+            url = f"{self.base_url}/lists/{list_id}/cards"
+            query = self._auth(fields='name,desc', limit=TRELLO_PAGE_LIMIT)
+            cards = []
+            while True:
+                page = self.make_request('GET', url, params=query).json()
+                cards.extend(page)
+                if len(page) < TRELLO_PAGE_LIMIT:
+                    break
+                query['before'] = min(card['id'] for card in page)
+            self.list_cards[list_id] = {}
+            # Paged results come newest first; the oldest card of a name is the one the syncs created first
+            for card in sorted(cards, key=lambda card: card['id']):
+                self.list_cards[list_id].setdefault(card['name'], {'id': card['id'], 'desc': card.get('desc', '')})
+        return self.list_cards[list_id]
+
+    def create_card(self, list_id, name, desc):
+        url = f"{self.base_url}/cards"
+        data = self._auth(idList=list_id, name=name, desc=desc)
+        response = self.make_request('POST', url, data=data)
+        card_id = response.json()['id']
+        self.cards(list_id)[name] = {'id': card_id, 'desc': desc}
+        self.card_attachments[card_id] = set()
+        return card_id
+
+    def update_card(self, list_id, name, desc):
+        # Returns the card id; a card whose description already matches is left alone
+        card = self.cards(list_id)[name]
+        if card['desc'] == desc:
+            return card['id']
+        url = f"{self.base_url}/cards/{card['id']}"
+        data = self._auth(desc=desc)
+        self.make_request('PUT', url, data=data)
+        card['desc'] = desc
+        return card['id']
+
+    def archive_card(self, list_id, name):
+        # Closes the card, which drops it from the list's open cards
+        card = self.cards(list_id).pop(name)
+        url = f"{self.base_url}/cards/{card['id']}"
+        data = self._auth(closed='true')
+        self.make_request('PUT', url, data=data)
+        self.card_attachments.pop(card['id'], None)
+        return card['id']
+
+    def attachments(self, card_id):
+        # Returns the set of (name, size) of the card's attachments
+        if card_id not in self.card_attachments:
+            response = self.make_request('GET', f"{self.base_url}/cards/{card_id}/attachments", params=self._auth(fields='name,bytes'))
+            self.card_attachments[card_id] = {(attachment['name'], attachment['bytes']) for attachment in response.json()}
+        return self.card_attachments[card_id]
+
+    def upload_attachment(self, card_id, file_path):
+        url = f"{self.base_url}/cards/{card_id}/attachments"
+        query = self._auth()
+        with open(file_path, 'rb') as file:
+            response = self.make_request('POST', url, params=query, files={'file': file})
+        self.attachments(card_id).add((os.path.basename(file_path), os.path.getsize(file_path)))
+        return response.json()['id']
+
+    def add_comment(self, card_id, text):
+        url = f"{self.base_url}/cards/{card_id}/actions/comments"
+        query = self._auth(text=text)
+        response = self.make_request('POST', url, params=query)
+        return response.json()['id']
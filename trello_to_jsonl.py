@@ -0,0 +1,55 @@
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+import requests
+import metrics_utils
+import trello_client_utils
+import trello_jsonl_utils
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up the Trello boards (lists, cards, comments and attachment metadata) "
+                                                 "into one JSON Lines file per board")
+    parser.add_argument('--output-dir', help="Backup directory (default: exported_data/TrelloBackup_<timestamp>)")
+    parser.add_argument('--workers', type=int, default=trello_jsonl_utils.BACKUP_WORKERS, help="Boards backed up at once")
+    parser.add_argument('--all-boards', action='store_true',
+                        help=f"Back up every open board, not only the \"{trello_jsonl_utils.BOARD_NAME_PREFIX}\" ones")
+    args = parser.parse_args()
+
+    api_keys = trello_client_utils.load_api_keys('api_keys_and_tokens.txt')
+    api_key = api_keys['trello_api_key']
+    token = api_keys['trello_token']
+
+    output_dir = args.output_dir or f"exported_data/TrelloBackup_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    os.makedirs(output_dir, exist_ok=True)
+
+    boards = trello_jsonl_utils.get_boards(api_key, token, all_boards=args.all_boards)
+    print(f"Backing up {len(boards)} boards to {output_dir}")
+
+    backed_up = []
+    failed = []
+    progress = metrics_utils.start_progress('trello_to_jsonl', len(boards))
+    with metrics_utils.stage_timer('backup_boards'), ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(trello_jsonl_utils.backup_board, board, output_dir, api_key, token): board for board in boards}
+        for future in as_completed(futures):
+            board = futures[future]
+            metrics_utils.update_progress(progress)
+            try:
+                summary = future.result()
+            except (requests.RequestException, OSError) as e:
+                print(f"Backup failed for {board['name']}: {e}")
+                failed.append(board['name'])
+                continue
+            backed_up.append(summary)
+            print(f"{summary['name']}: {summary['lists']} lists, {summary['cards']} cards, "
+                  f"{summary['attachments']} attachments, {summary['comments']} comments")
+    metrics_utils.update_progress(progress, done=0, force=True)
+
+    trello_jsonl_utils.save_backup_manifest(backed_up, output_dir)
+    print(f"Backed up {len(backed_up)} boards ({sum(board['cards'] for board in backed_up)} cards) to {output_dir}")
+    if failed:
+        print(f"Failed boards, run again to retry: {', '.join(sorted(failed))}")
+    metrics_utils.dump_metrics('trello_to_jsonl')
+
+if __name__ == "__main__":
+    main()